@@ -0,0 +1,25 @@
+// analyzeWorker.js
+// Worker-thread entry point for workerPool.js. Requiring detector.js builds
+// this thread's copy of the baselines once; after that every message is a
+// list of prompts to score and the reply is their analyses in the same order,
+// plus each prompt's per-layer timings for the main thread's metrics. With
+// `fast` set the task is scored with analyzePromptFast instead. A message
+// carrying `baselines` replaces this thread's baselines and gets no reply.
+
+const { parentPort } = require('worker_threads');
+const { analyzePrompt, analyzePromptFast, setBaselines } = require('./detector');
+
+parentPort.on('message', ({ prompts, fast = false, baselines }) => {
+  if (baselines) {
+    setBaselines(baselines);
+    return;
+  }
+  try {
+    const analyze = fast ? analyzePromptFast : analyzePrompt;
+    const timings = prompts.map(() => ({}));
+    const results = prompts.map((prompt, i) => analyze(prompt, timings[i]));
+    parentPort.postMessage({ results, timings });
+  } catch (err) {
+    parentPort.postMessage({ error: err.message });
+  }
+});
@@ -0,0 +1,118 @@
+// bench/compressors.js
+// Compares the compressor backends of compressors.js on the labeled datasets
+// (SAFE_DATASET / UNSAFE_DATASET, or the bundled CSVs): per-prompt cost of
+// the compression layer (entropy score plus NCD against both corpora) and
+// how well its two signals separate unsafe from safe prompts.
+//
+// Rows alternate between the reference corpora and the scored set, so no
+// prompt is scored against a corpus that contains it. Quality is the ROC AUC
+// of ncdDelta and of the entropy score with unsafe as the positive class
+// (0.5 is chance, 1 a perfect ranking, 0 a perfect ranking the other way:
+// unsafe prompts are longer and compress better, so entropy sits near 0).
+//
+// Usage: node bench/compressors.js [--mode exact|dictionary|knn] [--rows 2000] [--min-auc 0.5]
+// Exits non-zero if any backend's ncdDelta AUC is below --min-auc.
+
+const path = require('path');
+const { COMPRESSOR_NAMES, createCompressor } = require('../compressors');
+const { readLabeledRows } = require('../corpus');
+const { createNcdEngine, createNcdIndex } = require('../ncd');
+
+const BUDGET_MS = 1000;
+const DATA_FILES = {
+  safe: process.env.SAFE_DATASET || path.join(__dirname, '..', 'safe_prompts.csv'),
+  unsafe: process.env.UNSAFE_DATASET || path.join(__dirname, '..', 'unsafe_prompts.csv'),
+};
+
+function flag(name, fallback) {
+  const index = process.argv.indexOf(name);
+  return index > -1 ? process.argv[index + 1] : fallback;
+}
+
+// Up to `rows` texts per label, split alternately into reference and scored
+function splitDatasets(rows) {
+  const seen = { safe: 0, unsafe: 0 };
+  const reference = { safe: [], unsafe: [] };
+  const scored = [];
+  Object.values(DATA_FILES).forEach((filePath) => {
+    readLabeledRows(filePath, ({ text, label }) => {
+      if (!text || seen[label] >= rows) return;
+      seen[label] += 1;
+      if (seen[label] % 2) reference[label].push(text);
+      else scored.push({ text, unsafe: label === 'unsafe' });
+    });
+  });
+  return { reference, scored };
+}
+
+// P(score of a random unsafe prompt > score of a random safe one), ties count half
+function rocAuc(scores, labels) {
+  const positives = scores.filter((_, i) => labels[i]);
+  const negatives = scores.filter((_, i) => !labels[i]);
+  if (!positives.length || !negatives.length) return NaN;
+  let wins = 0;
+  positives.forEach((p) => negatives.forEach((n) => {
+    if (p > n) wins += 1;
+    else if (p === n) wins += 0.5;
+  }));
+  return wins / (positives.length * negatives.length);
+}
+
+function buildProfile(compressor, reference, mode) {
+  const corpusNcd = (rows) => (mode === 'knn'
+    ? createNcdIndex(rows, { compressor })
+    : createNcdEngine(rows.join('\n'), { mode, compressor }));
+  const safeNcd = corpusNcd(reference.safe);
+  const unsafeNcd = corpusNcd(reference.unsafe);
+  return (text) => {
+    const buffer = Buffer.from(text, 'utf-8');
+    const cText = compressor.length(buffer);
+    return {
+      entropy: cText / buffer.length,
+      ncdDelta: safeNcd.distance(buffer, cText) - unsafeNcd.distance(buffer, cText),
+    };
+  };
+}
+
+function main() {
+  const mode = flag('--mode', 'exact');
+  const rows = Number(flag('--rows', 2000));
+  const minAuc = Number(flag('--min-auc', 0.5));
+  const { reference, scored } = splitDatasets(rows);
+  const labels = scored.map(({ unsafe }) => unsafe);
+  console.log(`NCD mode ${mode}; reference ${reference.safe.length} safe / ${reference.unsafe.length} unsafe, `
+    + `scored ${scored.length} prompts\n`);
+  console.log('backend    µs/prompt   mean C(x)/|x|   ncdDelta AUC   entropy AUC');
+
+  const failures = [];
+  COMPRESSOR_NAMES.forEach((name) => {
+    const compressor = createCompressor(name);
+    const profile = buildProfile(compressor, reference, mode);
+    const results = scored.map(({ text }) => profile(text));
+
+    let calls = 0;
+    const start = process.hrtime.bigint();
+    const deadline = start + BigInt(BUDGET_MS) * 1000000n;
+    do {
+      profile(scored[calls % scored.length].text);
+      calls += 1;
+    } while (process.hrtime.bigint() < deadline);
+    const us = Number(process.hrtime.bigint() - start) / calls / 1000;
+
+    const meanRatio = results.reduce((sum, { entropy }) => sum + entropy, 0) / results.length;
+    const ncdAuc = rocAuc(results.map(({ ncdDelta }) => ncdDelta), labels);
+    const entropyAuc = rocAuc(results.map(({ entropy }) => entropy), labels);
+    console.log(
+      `${name.padEnd(9)}${us.toFixed(1).padStart(11)}${meanRatio.toFixed(3).padStart(16)}`
+      + `${ncdAuc.toFixed(3).padStart(15)}${entropyAuc.toFixed(3).padStart(14)}`
+    );
+    if (!(ncdAuc >= minAuc)) failures.push(`${name}: ncdDelta AUC ${ncdAuc.toFixed(3)} below ${minAuc}`);
+  });
+
+  if (failures.length) {
+    failures.forEach((failure) => console.error(`FAIL: ${failure}`));
+    process.exit(1);
+  }
+}
+
+main();
@@ -0,0 +1,240 @@
+// bench/layers.js
+// Per-layer micro-benchmark: each detection function timed on its own across
+// prompt lengths from 10 characters to 100KB, checked against the numbers
+// stored in bench/layers.baseline.json.
+//
+// Usage: node bench/layers.js [--tolerance 25] [--min-delta-us 1] [--processes 3] [--update]
+// Exits non-zero if any layer at any length is more than --tolerance percent
+// (and more than --min-delta-us) slower than its baseline in every one of
+// --processes measurement passes. --update rewrites the baseline from the
+// median pass instead. Baselines are scaled by a fixed
+// calibration workload so a slower or faster machine doesn't read as a
+// regression or hide one. computeNcdProfile's cost depends on NCD_MODE and
+// COMPRESSOR, so the baseline records both and every check runs under them;
+// --update records NCD_MODE and COMPRESSOR from the environment (default
+// exact and gzip).
+
+const fs = require('fs');
+const path = require('path');
+const { spawnSync } = require('child_process');
+const {
+  analyzePrompt,
+  analyzeContext,
+  computeFeatureVector,
+  computeNcdProfile,
+  computeThreatScore,
+  detectObfuscation,
+  detectRoleInversion,
+} = require('../detector');
+
+const BASELINE_FILE = path.join(__dirname, 'layers.baseline.json');
+const LENGTHS = [10, 100, 1000, 10000, 100000];
+const PROMPTS_PER_LENGTH = 8;
+const ROUNDS = 5;
+const ROUND_BUDGET_MS = 40;
+// Untimed calls per layer and length before any timing: computeNcdProfile
+// takes a few hundred ms of calls to settle, longer than the warm-up round
+const WARMUP_MS = 200;
+const DEFAULT_SETTINGS = { ncdMode: 'exact', compressor: 'gzip' };
+
+function readPrompts(file) {
+  return fs.readFileSync(path.join(__dirname, '..', file), 'utf-8')
+    .trim()
+    .split('\n')
+    .slice(1)
+    .map((line) => line.slice(0, line.lastIndexOf(',')).replace(/^"(.*)"$/, '$1'));
+}
+
+function flag(name, fallback) {
+  const index = process.argv.indexOf(name);
+  return index > -1 ? Number(process.argv[index + 1]) : fallback;
+}
+
+// Dataset rows joined end to end (each prompt starting at a different row) and cut to `length`
+function promptsOfLength(rows, length) {
+  const prompts = [];
+  for (let p = 0; p < PROMPTS_PER_LENGTH; p += 1) {
+    let text = '';
+    for (let i = p * 3; text.length < length; i += 1) {
+      text += `${rows[i % rows.length]} `;
+    }
+    prompts.push(text.slice(0, length).trim());
+  }
+  return prompts;
+}
+
+// Each layer gets the inputs analyzePrompt would hand it, prepared outside the timed loop
+const LAYERS = {
+  detectRoleInversion: (prompt) => () => detectRoleInversion(prompt),
+  computeNcdProfile: (prompt) => () => computeNcdProfile(prompt),
+  computeFeatureVector: (prompt) => () => computeFeatureVector(prompt),
+  analyzeContext: (prompt) => () => analyzeContext(prompt),
+  detectObfuscation: (prompt) => () => detectObfuscation(prompt),
+  computeThreatScore: (prompt) => {
+    const { layers } = analyzePrompt(prompt);
+    const args = [
+      detectRoleInversion(prompt),
+      layers.LDF.deviationScore,
+      layers.NCD.entropyScore,
+      layers.NCD.ncdDelta,
+      analyzeContext(prompt),
+      detectObfuscation(prompt),
+    ];
+    return () => computeThreatScore(...args);
+  },
+};
+
+// Best of ROUNDS rounds (after one warm-up round), each calling the prepared
+// calls round-robin until its budget is spent; µs/call
+function timePerCall(calls) {
+  let best = Infinity;
+  for (let round = -1; round < ROUNDS; round += 1) {
+    let count = 0;
+    const start = process.hrtime.bigint();
+    const deadline = start + BigInt(ROUND_BUDGET_MS) * 1000000n;
+    do {
+      calls[count % calls.length]();
+      count += 1;
+    } while (process.hrtime.bigint() < deadline);
+    if (round >= 0) best = Math.min(best, Number(process.hrtime.bigint() - start) / count / 1000);
+  }
+  return best;
+}
+
+// Fixed workload (string building, regex, sort) used to rescale baselines between machines
+function calibrate() {
+  const words = [];
+  for (let i = 0; i < 2000; i += 1) words.push((i * 7919).toString(36));
+  const workload = () => {
+    const text = words.join(' ');
+    text.replace(/[aeiou]/g, '').split(' ').sort();
+  };
+  const samples = [];
+  for (let i = 0; i < 5; i += 1) samples.push(timePerCall([workload]));
+  return samples.sort((a, b) => a - b)[2];
+}
+
+function warmUp(calls) {
+  const deadline = process.hrtime.bigint() + BigInt(WARMUP_MS) * 1000000n;
+  let count = 0;
+  do {
+    calls[count % calls.length]();
+    count += 1;
+  } while (process.hrtime.bigint() < deadline);
+}
+
+// One measurement pass in this process: { calibrationUs, results: { layer: { length: µs } } }
+function measure() {
+  const rows = [...readPrompts('safe_prompts.csv'), ...readPrompts('unsafe_prompts.csv')];
+  const prepared = {};
+  Object.entries(LAYERS).forEach(([layer, prepare]) => {
+    prepared[layer] = {};
+    LENGTHS.forEach((length) => {
+      prepared[layer][length] = promptsOfLength(rows, length).map(prepare);
+      warmUp(prepared[layer][length]);
+    });
+  });
+  const calibrationUs = calibrate();
+  const results = {};
+  Object.keys(LAYERS).forEach((layer) => {
+    results[layer] = {};
+    LENGTHS.forEach((length) => {
+      results[layer][length] = timePerCall(prepared[layer][length]);
+    });
+  });
+  return { calibrationUs, results };
+}
+
+const median = (values) => [...values].sort((a, b) => a - b)[Math.floor(values.length / 2)];
+
+function main() {
+  if (process.env.BENCH_LAYERS_CHILD) {
+    process.stdout.write(JSON.stringify(measure()));
+    return;
+  }
+  const tolerance = flag('--tolerance', 25);
+  const minDeltaUs = flag('--min-delta-us', 1);
+  const processes = flag('--processes', 3);
+  const update = process.argv.includes('--update');
+  const baseline = !update && fs.existsSync(BASELINE_FILE)
+    ? JSON.parse(fs.readFileSync(BASELINE_FILE, 'utf-8'))
+    : null;
+  const settings = baseline
+    ? { ncdMode: baseline.ncdMode, compressor: baseline.compressor }
+    : {
+      ncdMode: process.env.NCD_MODE || DEFAULT_SETTINGS.ncdMode,
+      compressor: process.env.COMPRESSOR || DEFAULT_SETTINGS.compressor,
+    };
+  if (!settings.ncdMode || !settings.compressor) {
+    throw new Error(`${path.relative(process.cwd(), BASELINE_FILE)} does not record NCD_MODE and COMPRESSOR; re-record it with --update`);
+  }
+
+  // V8 settles on different code for the same function from one process to
+  // the next, so every pass runs in a fresh process
+  const passes = [];
+  for (let i = 0; i < processes; i += 1) {
+    const child = spawnSync(process.execPath, [__filename], {
+      env: {
+        ...process.env,
+        BENCH_LAYERS_CHILD: '1',
+        NCD_MODE: settings.ncdMode,
+        COMPRESSOR: settings.compressor,
+      },
+      encoding: 'utf-8',
+      maxBuffer: 1024 * 1024,
+    });
+    if (child.status !== 0) throw new Error(`measurement pass failed:\n${child.stderr}`);
+    passes.push(JSON.parse(child.stdout));
+  }
+  const calibrationUs = median(passes.map((pass) => pass.calibrationUs));
+
+  console.log(`µs/call by prompt length, ${processes} passes, NCD_MODE=${settings.ncdMode} COMPRESSOR=${settings.compressor}${baseline ? ` (vs baseline, machine scale ${(calibrationUs / baseline.calibrationUs).toFixed(2)}x)` : ''}`);
+  console.log(`${'layer'.padEnd(22)}${LENGTHS.map((length) => String(length).padStart(18)).join('')}`);
+
+  const results = {};
+  const regressions = [];
+  Object.keys(LAYERS).forEach((layer) => {
+    results[layer] = {};
+    const cells = LENGTHS.map((length) => {
+      const before = baseline && baseline.results[layer] && baseline.results[layer][length];
+      if (!before) {
+        // The typical pass rather than the luckiest, so later checks aren't held to a best case
+        const us = median(passes.map((pass) => pass.results[layer][length]));
+        results[layer][length] = Number(us.toFixed(3));
+        return us.toFixed(2).padStart(18);
+      }
+      // Best pass, each rescaled by its own calibration; a regression has to show up in every pass
+      const us = Math.min(...passes.map((pass) => (
+        pass.results[layer][length] * (calibrationUs / pass.calibrationUs)
+      )));
+      const expected = before * (calibrationUs / baseline.calibrationUs);
+      const change = ((us - expected) / expected) * 100;
+      if (change > tolerance && us - expected > minDeltaUs) {
+        regressions.push(`${layer} @ ${length} chars: ${us.toFixed(2)} µs vs ${expected.toFixed(2)} µs expected (+${change.toFixed(0)}%)`);
+      }
+      return `${us.toFixed(2)} (${change >= 0 ? '+' : ''}${change.toFixed(0)}%)`.padStart(18);
+    });
+    console.log(`${layer.padEnd(22)}${cells.join('')}`);
+  });
+
+  if (!baseline) {
+    fs.writeFileSync(BASELINE_FILE, `${JSON.stringify({
+      node: process.version,
+      ncdMode: settings.ncdMode,
+      compressor: settings.compressor,
+      calibrationUs: Number(calibrationUs.toFixed(3)),
+      results,
+    }, null, 2)}\n`);
+    console.log(`\nbaseline written to ${path.relative(process.cwd(), BASELINE_FILE)}`);
+    return;
+  }
+
+  if (regressions.length) {
+    console.error(`\nFAIL: ${regressions.length} layer timing(s) over the ${tolerance}% tolerance`);
+    regressions.forEach((line) => console.error(`  ${line}`));
+    process.exit(1);
+  }
+  console.log(`\nall layers within ${tolerance}% of baseline`);
+}
+
+main();
@@ -0,0 +1,105 @@
+// bench/ncd.js
+// Per-prompt NCD cost as the reference corpus grows from 100 to 100k rows.
+// Compares the exact computeNcd (re-gzips corpus and sample+corpus on every
+// call) with the cached createNcdEngine (C(corpus) once + preset dictionary)
+// and the kNN createNcdIndex (sketch prefilter, exact NCD to a few exemplars).
+//
+// The engine's cost rises until the corpus fills deflate's 32KB window and is
+// flat from then on. Usage: node bench/ncd.js [--max-ratio 1.5] [--max-knn-us 2000]
+// Exits non-zero if the engine's cost at the largest corpus exceeds
+// --max-ratio times its cost at the first corpus that fills the window, or if
+// a kNN lookup at any corpus size takes longer than --max-knn-us.
+
+const fs = require('fs');
+const path = require('path');
+const { WINDOW_SIZE, computeNcd, createNcdEngine, createNcdIndex } = require('../ncd');
+
+const ROW_COUNTS = [100, 1000, 10000, 100000];
+const ENGINE_BUDGET_MS = 500;
+const EXACT_BUDGET_MS = 1500;
+
+function readPrompts(file) {
+  return fs.readFileSync(path.join(__dirname, '..', file), 'utf-8')
+    .trim()
+    .split('\n')
+    .slice(1)
+    .map((line) => line.slice(0, line.lastIndexOf(',')).replace(/^"(.*)"$/, '$1'));
+}
+
+// Synthetic corpus: cycle the sample rows with a row number so rows are not
+// byte-identical (identical rows would make the corpus unrealistically cheap).
+function buildRows(rows, count) {
+  const lines = new Array(count);
+  for (let i = 0; i < count; i += 1) {
+    lines[i] = `${rows[i % rows.length]} (${i})`;
+  }
+  return lines;
+}
+
+// Run fn over the prompts until the time budget is spent; returns µs/prompt.
+function timePerPrompt(fn, prompts, budgetMs) {
+  let calls = 0;
+  const start = process.hrtime.bigint();
+  const deadline = start + BigInt(budgetMs) * 1000000n;
+  do {
+    fn(prompts[calls % prompts.length]);
+    calls += 1;
+  } while (process.hrtime.bigint() < deadline);
+  const elapsedNs = Number(process.hrtime.bigint() - start);
+  return elapsedNs / calls / 1000;
+}
+
+function main() {
+  const flag = (name, fallback) => {
+    const index = process.argv.indexOf(name);
+    return index > -1 ? Number(process.argv[index + 1]) : fallback;
+  };
+  const maxRatio = flag('--max-ratio', 1.5);
+  const maxKnnUs = flag('--max-knn-us', 2000);
+
+  const safeRows = readPrompts('safe_prompts.csv');
+  const prompts = [...safeRows, ...readPrompts('unsafe_prompts.csv')];
+
+  console.log('rows      corpus KB   exact µs/prompt   engine µs/prompt   speedup   knn µs/prompt   knn build ms');
+  let windowFullUs = null;
+  let largestUs = null;
+  let windowFullRows = null;
+  let slowestKnnUs = 0;
+  ROW_COUNTS.forEach((count) => {
+    const rows = buildRows(safeRows, count);
+    const corpus = rows.join('\n');
+    const engine = createNcdEngine(corpus, { mode: 'dictionary' });
+    const buildStart = process.hrtime.bigint();
+    const index = createNcdIndex(rows);
+    const buildMs = Number(process.hrtime.bigint() - buildStart) / 1e6;
+    const exactUs = timePerPrompt((p) => computeNcd(p, corpus), prompts, EXACT_BUDGET_MS);
+    const engineUs = timePerPrompt((p) => engine.distance(p), prompts, ENGINE_BUDGET_MS);
+    const knnUs = timePerPrompt((p) => index.distance(p), prompts, ENGINE_BUDGET_MS);
+    slowestKnnUs = Math.max(slowestKnnUs, knnUs);
+    if (windowFullUs === null && engine.corpusBytes >= WINDOW_SIZE) {
+      windowFullUs = engineUs;
+      windowFullRows = count;
+    }
+    largestUs = engineUs;
+    console.log(
+      `${String(count).padEnd(10)}${(Buffer.byteLength(corpus) / 1024).toFixed(0).padStart(9)}`
+      + `${exactUs.toFixed(1).padStart(18)}${engineUs.toFixed(1).padStart(19)}`
+      + `${(exactUs / engineUs).toFixed(1).padStart(10)}x`
+      + `${knnUs.toFixed(1).padStart(16)}${buildMs.toFixed(0).padStart(15)}`
+    );
+  });
+
+  const ratio = largestUs / windowFullUs;
+  console.log(`\nengine cost ratio ${ROW_COUNTS[ROW_COUNTS.length - 1]} vs ${windowFullRows} rows: ${ratio.toFixed(2)}x (limit ${maxRatio}x)`);
+  console.log(`slowest kNN lookup ${slowestKnnUs.toFixed(1)} µs/prompt (limit ${maxKnnUs} µs)`);
+  if (ratio > maxRatio) {
+    console.error('FAIL: per-prompt NCD cost grows with corpus size');
+    process.exit(1);
+  }
+  if (slowestKnnUs > maxKnnUs) {
+    console.error('FAIL: kNN NCD lookup too slow');
+    process.exit(1);
+  }
+}
+
+main();
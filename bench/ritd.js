@@ -0,0 +1,111 @@
+// bench/ritd.js
+// RITD cost as the rule lists grow: the original per-rule loop (one regex
+// test + one includes() scan per rule) vs the compiled matcher.js rule set.
+//
+// Usage: node bench/ritd.js [--max-ratio 2]
+// Exits non-zero if the compiled matcher at the largest rule count costs more
+// than --max-ratio times what it costs with the stock rules.
+
+const fs = require('fs');
+const path = require('path');
+const { compileRuleSet } = require('../matcher');
+
+const EXTRA_RULE_COUNTS = [0, 1000, 5000];
+const BUDGET_MS = 500;
+
+const labelPattern = (pattern) => pattern.source.replace(/\(\?:|\)/g, '').slice(0, 60);
+const labelKeyword = (keyword) => `Keyword: ${keyword}`;
+
+// Pull the rule arrays straight out of detector.js so the bench tracks them
+function loadStockRules() {
+  const source = fs.readFileSync(path.join(__dirname, '..', 'detector.js'), 'utf-8');
+  const grab = (name) => {
+    const start = source.indexOf(`const ${name} = [`);
+    const end = source.indexOf('];', start);
+    // eslint-disable-next-line no-new-func
+    return new Function(`return ${source.slice(start + `const ${name} = `.length, end + 1)};`)();
+  };
+  return { patterns: grab('baseTriggers'), keywords: grab('dangerousKeywords') };
+}
+
+function readPrompts(file) {
+  return fs.readFileSync(path.join(__dirname, '..', file), 'utf-8')
+    .trim()
+    .split('\n')
+    .slice(1)
+    .map((line) => line.slice(0, line.lastIndexOf(',')).replace(/^"(.*)"$/, '$1'));
+}
+
+// Synthetic rules shaped like the real ones but with distinct vocabulary
+function syntheticRules(count) {
+  const patterns = [];
+  const keywords = [];
+  for (let i = 0; i < count; i += 1) {
+    const tag = i.toString(36);
+    patterns.push(new RegExp(`(?:zq${tag}verb|xv${tag}act).{0,20}(?:target|system|data)`, 'i'));
+    keywords.push(`kw${tag}phrase`);
+  }
+  return { patterns, keywords };
+}
+
+function loopMatch(prompt, patterns, keywords) {
+  const matches = [];
+  const lowerPrompt = prompt.toLowerCase();
+  patterns.forEach((pattern) => {
+    if (pattern.test(prompt)) matches.push(labelPattern(pattern));
+  });
+  keywords.forEach((keyword) => {
+    if (lowerPrompt.includes(keyword.toLowerCase())) matches.push(labelKeyword(keyword));
+  });
+  return matches;
+}
+
+function timePerPrompt(fn, prompts) {
+  let calls = 0;
+  const start = process.hrtime.bigint();
+  const deadline = start + BigInt(BUDGET_MS) * 1000000n;
+  do {
+    fn(prompts[calls % prompts.length]);
+    calls += 1;
+  } while (process.hrtime.bigint() < deadline);
+  return Number(process.hrtime.bigint() - start) / calls / 1000;
+}
+
+function main() {
+  const ratioFlag = process.argv.indexOf('--max-ratio');
+  const maxRatio = ratioFlag > -1 ? Number(process.argv[ratioFlag + 1]) : 2;
+  const stock = loadStockRules();
+  const prompts = [...readPrompts('safe_prompts.csv'), ...readPrompts('unsafe_prompts.csv')];
+
+  console.log('rules     loop µs/prompt   matcher µs/prompt   speedup');
+  const matcherCosts = [];
+  EXTRA_RULE_COUNTS.forEach((extra) => {
+    const synthetic = syntheticRules(extra);
+    const patterns = [...stock.patterns, ...synthetic.patterns];
+    const keywords = [...stock.keywords, ...synthetic.keywords];
+    const rules = compileRuleSet({ patterns, keywords, labelPattern, labelKeyword });
+
+    prompts.forEach((prompt) => {
+      if (JSON.stringify(rules.match(prompt)) !== JSON.stringify(loopMatch(prompt, patterns, keywords))) {
+        throw new Error(`matcher disagrees with the reference loop on: ${prompt}`);
+      }
+    });
+
+    const loopUs = timePerPrompt((p) => loopMatch(p, patterns, keywords), prompts);
+    const matcherUs = timePerPrompt((p) => rules.match(p), prompts);
+    matcherCosts.push(matcherUs);
+    console.log(
+      `${String(patterns.length + keywords.length).padEnd(10)}${loopUs.toFixed(2).padStart(15)}`
+      + `${matcherUs.toFixed(2).padStart(20)}${(loopUs / matcherUs).toFixed(1).padStart(9)}x`
+    );
+  });
+
+  const ratio = matcherCosts[matcherCosts.length - 1] / matcherCosts[0];
+  console.log(`\nmatcher cost ratio largest vs stock rule set: ${ratio.toFixed(2)}x (limit ${maxRatio}x)`);
+  if (ratio > maxRatio) {
+    console.error('FAIL: RITD cost grows with the number of rules');
+    process.exit(1);
+  }
+}
+
+main();
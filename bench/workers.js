@@ -0,0 +1,83 @@
+// bench/workers.js
+// analyzePrompt throughput inline on one thread vs the worker_threads pool at
+// 1, 2, 4, ... workers up to the number of cores, both as concurrent
+// single-prompt tasks (/analyze traffic) and as one analyzeMany() batch.
+//
+// Usage: node bench/workers.js [--prompts 4000] [--min-speedup 0]
+// With --min-speedup > 0, exits non-zero if the pool at the core count is not
+// at least that many times faster than inline scoring on the batch path.
+
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { analyzePrompt } = require('../detector');
+const { createAnalyzerPool } = require('../workerPool');
+
+function readPrompts(file) {
+  return fs.readFileSync(path.join(__dirname, '..', file), 'utf-8')
+    .trim()
+    .split('\n')
+    .slice(1)
+    .map((line) => line.slice(0, line.lastIndexOf(',')).replace(/^"(.*)"$/, '$1'));
+}
+
+function flag(name, fallback) {
+  const index = process.argv.indexOf(name);
+  return index > -1 ? Number(process.argv[index + 1]) : fallback;
+}
+
+function poolSizes(cores) {
+  const sizes = [];
+  for (let size = 1; size < cores; size *= 2) sizes.push(size);
+  sizes.push(cores);
+  return sizes;
+}
+
+async function main() {
+  const promptCount = flag('--prompts', 4000);
+  const minSpeedup = flag('--min-speedup', 0);
+  const cores = os.cpus().length;
+
+  const rows = [...readPrompts('safe_prompts.csv'), ...readPrompts('unsafe_prompts.csv')];
+  // Numbered so every prompt is distinct, as in real traffic
+  const prompts = Array.from({ length: promptCount }, (_, i) => `${rows[i % rows.length]} (${i})`);
+
+  prompts.forEach((prompt) => analyzePrompt(prompt)); // warm-up, same as the workers get
+  let start = process.hrtime.bigint();
+  prompts.forEach((prompt) => analyzePrompt(prompt));
+  const inlineRate = promptCount / (Number(process.hrtime.bigint() - start) / 1e9);
+
+  console.log(`${cores} cores, ${promptCount} prompts\n`);
+  console.log('mode        single/s   batch/s   speedup');
+  console.log(`${'inline'.padEnd(10)}${inlineRate.toFixed(0).padStart(10)}${inlineRate.toFixed(0).padStart(10)}${'1.00'.padStart(9)}x`);
+
+  let coreSpeedup = 1;
+  for (const size of poolSizes(cores)) {
+    const pool = createAnalyzerPool({ size, maxQueue: promptCount });
+    await pool.analyzeMany(prompts); // warm-up: workers load their baselines and JIT
+
+    start = process.hrtime.bigint();
+    // Concurrent single-prompt requests, the way /analyze sees traffic
+    await Promise.all(prompts.map((prompt) => pool.analyze(prompt)));
+    const singleRate = promptCount / (Number(process.hrtime.bigint() - start) / 1e9);
+
+    start = process.hrtime.bigint();
+    await pool.analyzeMany(prompts);
+    const batchRate = promptCount / (Number(process.hrtime.bigint() - start) / 1e9);
+    await pool.close();
+
+    const speedup = batchRate / inlineRate;
+    if (size === cores) coreSpeedup = speedup;
+    console.log(
+      `${`pool x${size}`.padEnd(10)}${singleRate.toFixed(0).padStart(10)}`
+      + `${batchRate.toFixed(0).padStart(10)}${speedup.toFixed(2).padStart(9)}x`
+    );
+  }
+
+  if (minSpeedup > 0 && coreSpeedup < minSpeedup) {
+    console.error(`\nFAIL: pool x${cores} is ${coreSpeedup.toFixed(2)}x inline (need ${minSpeedup}x)`);
+    process.exit(1);
+  }
+}
+
+main();
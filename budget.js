@@ -0,0 +1,168 @@
+// budget.js
+// Bounded-cost analysis for long and hostile prompts.
+//
+// splitWindows() cuts a long prompt into overlapping windows so the rule
+// layers can check their time budget between windows instead of running one
+// regex over a megabyte. A window only starts after, and only ends before, a
+// non-word character, so \b reads the same inside a window as in the full
+// prompt. The overlap is longer than any bounded rule can match, so a match
+// across a cut is still found whole in the next window. sampleWindows() picks
+// evenly spaced windows for the statistical layers (NCD, LDF, ML), whose
+// cost would otherwise grow with the prompt.
+//
+// Rules with an unbounded quantifier (`\s*`, `+`, `{20,}`) can match across
+// any cut, so they always run on the whole prompt. An unbounded wildcard
+// (`.*`, `.+`) can also backtrack polynomially (`<script.*>.*<\/script>` is
+// cubic on '<script>' repeated). On text longer than GUARD_MIN_CHARS those
+// rules run in a vm context, and its timeout interrupts the regex once the
+// layer's remaining budget is spent; a vm call costs ~40 µs, so shorter text,
+// whose worst case is a couple of ms, gets a plain regex.test. A layer that
+// runs out of budget reports it, and the caller holds the prompt for review.
+// Windowed or not, every rule matches exactly as it would on the full prompt.
+
+const vm = require('vm');
+
+// Worst case of the backtrack-prone RITD rules: ~2 ms at 512 chars, ~14 ms at 1KB
+const GUARD_MIN_CHARS = 512;
+
+// ASCII word characters, as \w and \b see them outside unicode mode
+function isWordCode(code) {
+  return (code >= 48 && code <= 57) || (code >= 65 && code <= 90) || (code >= 97 && code <= 122) || code === 95;
+}
+
+function splitWindows(text, size, overlap) {
+  if (text.length <= size) return [text];
+  const windows = [];
+  let start = 0;
+  for (;;) {
+    if (text.length - start <= size) {
+      windows.push(text.slice(start));
+      return windows;
+    }
+    // End before a non-word character; inside a very long word, run to its end
+    let end = start + size;
+    while (end > start + 2 * overlap && isWordCode(text.charCodeAt(end))) end -= 1;
+    if (isWordCode(text.charCodeAt(end))) {
+      end = start + size;
+      while (end < text.length && isWordCode(text.charCodeAt(end))) end += 1;
+    }
+    windows.push(text.slice(start, end));
+    if (end >= text.length) return windows;
+    // Start the next window `overlap` or more before this one ends, after a
+    // non-word character; a word longer than the window gap is cut mid-word
+    let next = end - overlap;
+    while (next > start + 1 && isWordCode(text.charCodeAt(next - 1))) next -= 1;
+    start = next > start + 1 ? next : end - overlap;
+  }
+}
+
+// `count` evenly spaced windows (first and last included), each cut to
+// `size` chars, joined by newlines
+function sampleWindows(windows, count, size) {
+  const picked = [];
+  if (windows.length <= count) {
+    windows.forEach((window) => picked.push(window.slice(0, size)));
+  } else {
+    for (let i = 0; i < count; i += 1) {
+      picked.push(windows[Math.round((i * (windows.length - 1)) / (count - 1))].slice(0, size));
+    }
+  }
+  return picked.join('\n');
+}
+
+// Source with escapes and character classes blanked, so `+` in `[A-Za-z0-9+/]` is not a quantifier
+function quantifierView(source) {
+  return source.replace(/\\[\s\S]/g, 'e').replace(/\[[^\]]*\]/g, 'c');
+}
+
+const ruleShapes = new WeakMap();
+function ruleShape(regex) {
+  let shape = ruleShapes.get(regex);
+  if (shape === undefined) {
+    const view = quantifierView(regex.source);
+    shape = {
+      unbounded: /[*+]|\{\d+,\}/.test(view),
+      backtrackProne: /\.(?:[*+]|\{\d+,\})/.test(view),
+    };
+    ruleShapes.set(regex, shape);
+  }
+  return shape;
+}
+
+const hasUnboundedQuantifier = (regex) => ruleShape(regex).unbounded;
+const isBacktrackProne = (regex) => ruleShape(regex).backtrackProne;
+
+const guardedContext = vm.createContext({ regex: null, text: '' });
+const guardedScript = new vm.Script('regex.lastIndex = 0; regex.test(text)');
+
+// regex.test(text) stopped after `timeoutMs`; null when it was
+function guardedTest(regex, text, timeoutMs) {
+  guardedContext.regex = regex;
+  guardedContext.text = text;
+  try {
+    return guardedScript.runInContext(guardedContext, { timeout: Math.max(1, Math.ceil(timeoutMs)) });
+  } catch (err) {
+    if (err.code === 'ERR_SCRIPT_EXECUTION_TIMEOUT') return null;
+    throw err;
+  } finally {
+    guardedContext.regex = null;
+    guardedContext.text = '';
+  }
+}
+
+// A wall-time budget for one layer. test(regex, text) runs the regex (guarded
+// when it is backtrack-prone and the text is long) and returns null instead
+// once the budget is spent; `exceeded` then stays true. A null/undefined `ms`
+// means no budget.
+function createBudget(ms) {
+  const started = process.hrtime.bigint();
+  let exceeded = false;
+  const remaining = () => ms - Number(process.hrtime.bigint() - started) / 1e6;
+
+  function test(regex, text) {
+    if (ms === null || ms === undefined) {
+      regex.lastIndex = 0;
+      return regex.test(text);
+    }
+    if (exceeded || remaining() <= 0) {
+      exceeded = true;
+      return null;
+    }
+    if (text.length > GUARD_MIN_CHARS && isBacktrackProne(regex)) {
+      const matched = guardedTest(regex, text, remaining());
+      if (matched === null) exceeded = true;
+      return matched;
+    }
+    regex.lastIndex = 0;
+    return regex.test(text);
+  }
+
+  return {
+    test,
+    get exceeded() {
+      return exceeded;
+    },
+  };
+}
+
+// Does `regex` match `prompt`? Bounded rules are tried window by window,
+// unbounded ones on the whole prompt. false once the budget is spent.
+function testWindows(regex, prompt, windows, budget) {
+  if (windows.length === 1 || hasUnboundedQuantifier(regex)) return budget.test(regex, prompt) === true;
+  for (let i = 0; i < windows.length; i += 1) {
+    const matched = budget.test(regex, windows[i]);
+    if (matched !== false) return matched === true;
+  }
+  return false;
+}
+
+module.exports = {
+  GUARD_MIN_CHARS,
+  createBudget,
+  guardedTest,
+  hasUnboundedQuantifier,
+  isBacktrackProne,
+  sampleWindows,
+  splitWindows,
+  testWindows,
+};
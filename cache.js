@@ -0,0 +1,107 @@
+// cache.js
+// Bounded LRU + TTL cache for analyzePrompt verdicts.
+//
+// Keys are SHA-256 digests of the prompt after the same trim() analyzePrompt
+// applies, so two prompts share an entry only when every layer would see the
+// exact same text. The cache carries a `version` (a fingerprint of the rules
+// and baselines); setVersion() with a different value drops every entry, so
+// verdicts computed under old rules are never served. set() takes the version
+// a value was computed under and drops it if the cache has moved on since, so
+// an analysis that was in flight across setVersion() is not cached either.
+
+const crypto = require('crypto');
+
+function promptKey(prompt) {
+  return crypto.createHash('sha256').update(prompt.trim(), 'utf8').digest('base64');
+}
+
+function fingerprint(...parts) {
+  const hash = crypto.createHash('sha256');
+  parts.forEach((part) => hash.update(typeof part === 'string' ? part : JSON.stringify(part)));
+  return hash.digest('hex').slice(0, 16);
+}
+
+function createVerdictCache({ maxEntries = 10000, ttlMs = 10 * 60 * 1000, version = null } = {}) {
+  // Map iteration order is insertion order: the first key is the least recently used
+  const entries = new Map();
+  let currentVersion = version;
+  const counters = {
+    hits: 0,
+    misses: 0,
+    evictions: 0,
+    expirations: 0,
+    invalidations: 0,
+    stale: 0,
+  };
+
+  function get(key) {
+    if (!maxEntries) return undefined;
+    const entry = entries.get(key);
+    if (!entry) {
+      counters.misses += 1;
+      return undefined;
+    }
+    if (entry.expiresAt <= Date.now()) {
+      entries.delete(key);
+      counters.expirations += 1;
+      counters.misses += 1;
+      return undefined;
+    }
+    entries.delete(key);
+    entries.set(key, entry);
+    counters.hits += 1;
+    return entry.value;
+  }
+
+  function set(key, value, computedUnder = currentVersion) {
+    if (!maxEntries) return;
+    if (computedUnder !== currentVersion) {
+      counters.stale += 1;
+      return;
+    }
+    entries.delete(key);
+    entries.set(key, { value, expiresAt: Date.now() + ttlMs });
+    while (entries.size > maxEntries) {
+      entries.delete(entries.keys().next().value);
+      counters.evictions += 1;
+    }
+  }
+
+  function clear() {
+    entries.clear();
+  }
+
+  function setVersion(nextVersion) {
+    if (nextVersion === currentVersion) return false;
+    currentVersion = nextVersion;
+    if (entries.size) counters.invalidations += 1;
+    entries.clear();
+    return true;
+  }
+
+  function stats() {
+    const lookups = counters.hits + counters.misses;
+    return {
+      ...counters,
+      size: entries.size,
+      maxEntries,
+      ttlMs,
+      version: currentVersion,
+      hitRate: lookups ? Number((counters.hits / lookups).toFixed(4)) : 0,
+    };
+  }
+
+  return {
+    get,
+    set,
+    clear,
+    setVersion,
+    stats,
+  };
+}
+
+module.exports = {
+  createVerdictCache,
+  fingerprint,
+  promptKey,
+};
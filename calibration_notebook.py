@@ -64,8 +64,9 @@ def suggest_calibration_adjustments(accuracy):
     """Suggest parameter adjustments based on test results"""
     if accuracy < 70:
         print("\n🔧 CALIBRATION SUGGESTIONS:")
-        print("Edit server.js and adjust these values:")
-        print("- ldfBlocked threshold: currently 4.0, try 3.5 or 4.5")
+        print("Measure thresholds and weights on a labeled set instead of guessing:")
+        print("  python3 -m safety_gateway.calibration collect --input labeled.csv --output scores.npz")
+        print("  python3 -m safety_gateway.calibration sweep scores.npz --max-fpr 0.01")
         print("- Add more RITD patterns for better detection")
         print("- Test with more diverse prompts")
 
@@ -0,0 +1,132 @@
+// classifier.js
+// Scores prompts with a linear model trained offline by
+// `python3 -m safety_gateway.train_classifier` (scikit-learn HashingVectorizer
+// + SGDClassifier with partial_fit), using the plain weight table that
+// `train_classifier export` writes. No Python runs in the request path.
+//
+// Features are hashed exactly as HashingVectorizer does it: lowercase, tokens
+// are runs of two or more word characters (its default token pattern), word
+// n-grams joined by a space, MurmurHash3 (x86, 32-bit, seed 0) of the UTF-8
+// bytes picks the column, the hash sign gives +1/-1 (alternate_sign), and the
+// vector is L2-normalised. Only columns with a non-zero weight are stored, so
+// a hashed feature that is missing from the table contributes nothing. The
+// probability is the logistic of intercept + weights . features, the same as
+// predict_proba() for log-loss SGD.
+
+const fs = require('fs');
+
+const TABLE_FORMAT = 1;
+const TOKEN_PATTERN = /[\p{L}\p{N}_]{2,}/gu;
+
+function murmurhash3(buffer, seed = 0) {
+  const c1 = 0xcc9e2d51;
+  const c2 = 0x1b873593;
+  const blocks = buffer.length >> 2;
+  let h = seed >>> 0;
+  for (let i = 0; i < blocks; i += 1) {
+    let k = buffer.readUInt32LE(i * 4);
+    k = Math.imul(k, c1);
+    k = (k << 15) | (k >>> 17);
+    k = Math.imul(k, c2);
+    h ^= k;
+    h = (h << 13) | (h >>> 19);
+    h = (Math.imul(h, 5) + 0xe6546b64) | 0;
+  }
+  const tail = blocks * 4;
+  let k = 0;
+  switch (buffer.length & 3) {
+    case 3: k ^= buffer[tail + 2] << 16; // falls through
+    case 2: k ^= buffer[tail + 1] << 8; // falls through
+    case 1:
+      k ^= buffer[tail];
+      k = Math.imul(k, c1);
+      k = (k << 15) | (k >>> 17);
+      k = Math.imul(k, c2);
+      h ^= k;
+      break;
+    default:
+  }
+  h ^= buffer.length;
+  h ^= h >>> 16;
+  h = Math.imul(h, 0x85ebca6b);
+  h ^= h >>> 13;
+  h = Math.imul(h, 0xc2b2ae35);
+  h ^= h >>> 16;
+  return h | 0; // signed, like sklearn's murmurhash3_32(positive=False)
+}
+
+// HashingVectorizer's analyzer: lowercased tokens, then word n-grams
+function extractTerms(text, [minN, maxN]) {
+  const tokens = text.toLowerCase().match(TOKEN_PATTERN) || [];
+  if (minN === 1 && maxN === 1) return tokens;
+  const terms = [];
+  for (let n = minN; n <= Math.min(maxN, tokens.length); n += 1) {
+    for (let i = 0; i + n <= tokens.length; i += 1) {
+      terms.push(n === 1 ? tokens[i] : tokens.slice(i, i + n).join(' '));
+    }
+  }
+  return terms;
+}
+
+// Column -> signed count, in first-seen order (the Python port sums in the same order)
+function hashTerms(terms, nFeatures, alternateSign) {
+  const counts = new Map();
+  terms.forEach((term) => {
+    const h = murmurhash3(Buffer.from(term, 'utf-8'));
+    const column = h === -2147483648 ? (2147483647 - (nFeatures - 1)) % nFeatures : Math.abs(h) % nFeatures;
+    const value = alternateSign && h < 0 ? -1 : 1;
+    counts.set(column, (counts.get(column) || 0) + value);
+  });
+  return counts;
+}
+
+function createClassifier(table) {
+  if (table.format !== TABLE_FORMAT) {
+    throw new Error(`Unsupported classifier table format ${table.format} (expected ${TABLE_FORMAT})`);
+  }
+  const { nFeatures, ngramRange, alternateSign, intercept } = table;
+  const weights = new Map();
+  table.columns.forEach((column, i) => weights.set(column, table.weights[i]));
+
+  // Probability that `text` is unsafe
+  function predict(text) {
+    const counts = hashTerms(extractTerms(text, ngramRange), nFeatures, alternateSign);
+    let dot = 0;
+    let squares = 0;
+    counts.forEach((value, column) => {
+      squares += value * value;
+      const weight = weights.get(column);
+      if (weight !== undefined) dot += weight * value;
+    });
+    const margin = squares > 0 ? intercept + dot / Math.sqrt(squares) : intercept;
+    return 1 / (1 + Math.exp(-margin));
+  }
+
+  return {
+    predict,
+    version: table.version,
+    columns: weights.size,
+  };
+}
+
+// null when `filePath` is unset or missing; any other problem is thrown
+function loadClassifier(filePath) {
+  if (!filePath) return null;
+  let table;
+  try {
+    table = JSON.parse(fs.readFileSync(filePath, 'utf-8'));
+  } catch (err) {
+    if (err.code === 'ENOENT') return null;
+    throw err;
+  }
+  return createClassifier(table);
+}
+
+module.exports = {
+  TABLE_FORMAT,
+  createClassifier,
+  extractTerms,
+  hashTerms,
+  loadClassifier,
+  murmurhash3,
+};
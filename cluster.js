@@ -0,0 +1,70 @@
+// cluster.js
+// Multi-process gateway: forks CLUSTER_WORKERS copies of server.js (default:
+// one per core) that share PORT through Node's cluster module. The primary
+// owns the scan counters (see counters.js), so the dashboard sees one set of
+// numbers whichever worker answers. Workers that die are replaced; counts
+// survive because they live in the primary.
+//
+// Replacements back off exponentially (1s, 2s, 4s ... up to 30s) while
+// workers keep dying within a minute of starting. After CLUSTER_MAX_RESTARTS
+// such crashes in a row the primary stops replacing them, and exits once the
+// last worker is gone, so a crash loop does not fork forever.
+//
+// Usage: CLUSTER_WORKERS=4 node cluster.js
+
+const cluster = require('cluster');
+const os = require('os');
+const path = require('path');
+const { serveClusterCounters } = require('./counters');
+
+const CLUSTER_WORKERS = Number(process.env.CLUSTER_WORKERS) || os.cpus().length;
+const CLUSTER_MAX_RESTARTS = Number(process.env.CLUSTER_MAX_RESTARTS) || 10;
+const RESTART_DELAY_MS = 1000;
+const MAX_RESTART_DELAY_MS = 30000;
+// A worker that ran this long before exiting did not crash on startup
+const STABLE_MS = 60000;
+
+const state = {
+  totalScanned: 0,
+  blockedCount: 0,
+  workers: {},
+};
+let shuttingDown = false;
+let crashes = 0;
+
+cluster.setupPrimary({ exec: path.join(__dirname, 'server.js') });
+
+function forkWorker() {
+  const worker = cluster.fork();
+  worker.startedAt = Date.now();
+  serveClusterCounters(worker, state);
+  return worker;
+}
+
+cluster.on('exit', (worker, code, signal) => {
+  if (shuttingDown) return;
+  crashes = Date.now() - worker.startedAt >= STABLE_MS ? 1 : crashes + 1;
+  if (crashes > CLUSTER_MAX_RESTARTS) {
+    console.error(`[Cluster] Worker ${worker.process.pid} exited (${signal || code}); `
+      + `${crashes} workers in a row died within ${STABLE_MS / 1000}s, not replacing it`);
+    if (!Object.keys(cluster.workers).length) process.exit(1);
+    return;
+  }
+  const delay = Math.min(MAX_RESTART_DELAY_MS, RESTART_DELAY_MS * 2 ** (crashes - 1));
+  console.error(`[Cluster] Worker ${worker.process.pid} exited (${signal || code}), starting a replacement in ${delay}ms`);
+  setTimeout(() => {
+    if (!shuttingDown) forkWorker();
+  }, delay);
+});
+
+['SIGINT', 'SIGTERM'].forEach((signal) => {
+  process.on(signal, () => {
+    shuttingDown = true;
+    cluster.disconnect(() => process.exit(0));
+  });
+});
+
+console.log(`[Cluster] Primary ${process.pid} starting ${CLUSTER_WORKERS} gateway workers`);
+for (let i = 0; i < CLUSTER_WORKERS; i += 1) {
+  forkWorker();
+}
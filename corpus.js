@@ -0,0 +1,151 @@
+// corpus.js
+// Streaming reader for the labeled baseline corpora (text,label CSV files).
+//
+// Files are read synchronously in fixed-size chunks (detector.js builds its
+// baselines at require time) and parsed with an RFC 4180 state machine:
+// quoted fields may hold commas, doubled quotes and line breaks, and CRLF, LF
+// and bare CR all end a record. Only the record being parsed is held in
+// memory, so a multi-gigabyte corpus costs one chunk plus one row. Stray
+// quotes inside unquoted fields are kept as text, the same leniency as
+// Python's csv module (safety_gateway/datasets.py reads the files with it).
+//
+// createRunningStats() is Welford's online mean/variance, so baseline
+// statistics are computed as rows stream past instead of from stored arrays.
+
+const fs = require('fs');
+const { StringDecoder } = require('string_decoder');
+
+const CHUNK_SIZE = 64 * 1024;
+
+// Push parser: write() string chunks, end() once; onRecord(fields) per record
+function createCsvParser(onRecord) {
+  let fields = [];
+  let field = '';
+  let inQuotes = false;
+  let quoteSeen = false; // a quote inside a quoted field: closing, or the first of ""
+  let afterCr = false;
+
+  const endField = () => {
+    fields.push(field);
+    field = '';
+  };
+  const endRecord = () => {
+    endField();
+    onRecord(fields);
+    fields = [];
+  };
+
+  function write(chunk) {
+    for (let i = 0; i < chunk.length; i += 1) {
+      const ch = chunk[i];
+      if (afterCr) {
+        afterCr = false;
+        if (ch === '\n') continue;
+      }
+      if (inQuotes) {
+        if (quoteSeen) {
+          quoteSeen = false;
+          if (ch === '"') {
+            field += '"';
+            continue;
+          }
+          inQuotes = false;
+          // fall through: the quoted part is over, handle ch as unquoted
+        } else if (ch === '"') {
+          quoteSeen = true;
+          continue;
+        } else {
+          field += ch;
+          continue;
+        }
+      }
+      if (ch === ',') {
+        endField();
+      } else if (ch === '\n' || ch === '\r') {
+        endRecord();
+        afterCr = ch === '\r';
+      } else if (ch === '"' && field === '') {
+        inQuotes = true;
+      } else {
+        field += ch;
+      }
+    }
+  }
+
+  function end() {
+    if (inQuotes && quoteSeen) inQuotes = false;
+    if (field !== '' || fields.length || inQuotes) endRecord();
+  }
+
+  return { write, end };
+}
+
+// Calls onRecord(fields) for every record of the file, reading CHUNK_SIZE bytes at a time
+function readCsvRecords(filePath, onRecord, { chunkSize = CHUNK_SIZE } = {}) {
+  const parser = createCsvParser(onRecord);
+  const decoder = new StringDecoder('utf-8');
+  const buffer = Buffer.alloc(chunkSize);
+  const fd = fs.openSync(filePath, 'r');
+  try {
+    let bytesRead = fs.readSync(fd, buffer, 0, chunkSize, null);
+    while (bytesRead > 0) {
+      parser.write(decoder.write(buffer.subarray(0, bytesRead)));
+      bytesRead = fs.readSync(fd, buffer, 0, chunkSize, null);
+    }
+    parser.write(decoder.end());
+    parser.end();
+  } finally {
+    fs.closeSync(fd);
+  }
+}
+
+// Calls onRow({ text, label }) per data row: header and blank lines skipped,
+// text trimmed, label 'unsafe' when the label column is 1 and 'safe' otherwise
+function readLabeledRows(filePath, onRow, options) {
+  let header = true;
+  readCsvRecords(filePath, (fields) => {
+    if (header) {
+      header = false;
+      return;
+    }
+    if (fields.length === 1 && fields[0] === '') return;
+    onRow({
+      text: fields[0].trim(),
+      label: (fields[1] || '').trim() === '1' ? 'unsafe' : 'safe',
+    });
+  }, options);
+}
+
+// Welford's online algorithm; summary() uses the population std, like the old
+// two-pass summarize(), with std 0.0001 standing in for zero. Pass `seed` to
+// resume from an earlier summary ({ mean, std } over `count` values).
+function createRunningStats(seed) {
+  let count = seed ? seed.count : 0;
+  let mean = count ? seed.mean : 0;
+  let m2 = count ? seed.std * seed.std * count : 0;
+
+  function add(value) {
+    count += 1;
+    const delta = value - mean;
+    mean += delta / count;
+    m2 += delta * (value - mean);
+  }
+
+  function summary() {
+    if (!count) return { mean: 0, std: 0 };
+    return { mean, std: Math.sqrt(m2 / count) || 0.0001 };
+  }
+
+  return {
+    add,
+    summary,
+    get count() { return count; },
+  };
+}
+
+module.exports = {
+  createCsvParser,
+  createRunningStats,
+  readCsvRecords,
+  readLabeledRows,
+};
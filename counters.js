@@ -0,0 +1,98 @@
+// counters.js
+// totalScanned / blockedCount shared by every gateway process.
+//
+// Standalone, the counters live in this process. Under cluster.js each worker
+// sends its deltas to the primary over IPC, and the primary replies with the
+// aggregated totals, so every response (whichever worker served it) carries
+// cluster-wide numbers. record() therefore always returns a promise. It
+// rejects if the primary does not answer within COUNTERS_TIMEOUT_MS or the
+// IPC channel closes, rather than leaving the request hanging.
+
+const cluster = require('cluster');
+
+const MESSAGE_TYPE = 'gateway:counters';
+const COUNTERS_TIMEOUT_MS = Number(process.env.COUNTERS_TIMEOUT_MS) || 2000;
+
+function createLocalCounters() {
+  const totals = { totalScanned: 0, blockedCount: 0 };
+  return {
+    async record(scanned, blocked) {
+      totals.totalScanned += scanned;
+      totals.blockedCount += blocked;
+      return { ...totals };
+    },
+    async snapshot() {
+      return { ...totals };
+    },
+  };
+}
+
+function createClusterCounters() {
+  const pending = new Map();
+  let nextId = 0;
+
+  function settle(id, error, totals) {
+    const request = pending.get(id);
+    if (!request) return;
+    pending.delete(id);
+    clearTimeout(request.timer);
+    if (error) request.reject(error);
+    else request.resolve(totals);
+  }
+
+  process.on('message', (message) => {
+    if (!message || message.type !== MESSAGE_TYPE) return;
+    settle(message.id, null, message.totals);
+  });
+  process.on('disconnect', () => {
+    Array.from(pending.keys()).forEach((id) => settle(id, new Error('Cluster primary disconnected')));
+  });
+
+  function request(scanned, blocked, withWorkers) {
+    return new Promise((resolve, reject) => {
+      if (!process.connected) {
+        reject(new Error('Cluster primary disconnected'));
+        return;
+      }
+      nextId += 1;
+      const id = nextId;
+      const timer = setTimeout(
+        () => settle(id, new Error(`Cluster primary did not answer within ${COUNTERS_TIMEOUT_MS}ms`)),
+        COUNTERS_TIMEOUT_MS
+      );
+      pending.set(id, { resolve, reject, timer });
+      process.send({ type: MESSAGE_TYPE, id, scanned, blocked, withWorkers }, (error) => {
+        if (error) settle(id, error);
+      });
+    });
+  }
+
+  return {
+    record: (scanned, blocked) => request(scanned, blocked, false),
+    snapshot: () => request(0, 0, true),
+  };
+}
+
+// Primary side: call once per forked worker
+function serveClusterCounters(worker, state) {
+  worker.on('message', (message) => {
+    if (!message || message.type !== MESSAGE_TYPE) return;
+    const own = state.workers[worker.process.pid] || { scanned: 0, blocked: 0 };
+    own.scanned += message.scanned;
+    own.blocked += message.blocked;
+    state.workers[worker.process.pid] = own;
+    state.totalScanned += message.scanned;
+    state.blockedCount += message.blocked;
+
+    const totals = { totalScanned: state.totalScanned, blockedCount: state.blockedCount };
+    if (message.withWorkers) totals.workers = state.workers;
+    worker.send({ type: MESSAGE_TYPE, id: message.id, totals });
+  });
+}
+
+const counters = cluster.isWorker && process.send ? createClusterCounters() : createLocalCounters();
+
+module.exports = {
+  counters,
+  serveClusterCounters,
+};
@@ -0,0 +1,1031 @@
+// detector.js
+// The five detection layers and the baselines they score against, with no
+// HTTP dependencies: server.js serves analyzePrompt() over Fastify, and
+// analyzeWorker.js loads this same module inside each worker thread.
+
+const path = require('path');
+const { createBudget, sampleWindows, splitWindows, testWindows } = require('./budget');
+const { loadClassifier } = require('./classifier');
+const { createCompressor } = require('./compressors');
+const { createNcdEngine, createNcdIndex } = require('./ncd');
+const { createRunningStats, readLabeledRows } = require('./corpus');
+const { describeSources, readSnapshot } = require('./snapshot');
+const { compileRuleSet } = require('./matcher');
+const { fingerprint } = require('./cache');
+
+// Data files (SAFE_DATASET / UNSAFE_DATASET point at larger labeled corpora)
+const DATA_FILES = {
+  safe: process.env.SAFE_DATASET || path.join(__dirname, 'safe_prompts.csv'),
+  unsafe: process.env.UNSAFE_DATASET || path.join(__dirname, 'unsafe_prompts.csv'),
+};
+// Rows per label that make up each NCD reference corpus (the exemplars when NCD_MODE=knn)
+const NCD_CORPUS_ROWS = process.env.NCD_CORPUS_ROWS ? Number(process.env.NCD_CORPUS_ROWS) : 100;
+// Precomputed baselines (see snapshot.js); BASELINE_SNAPSHOT= (empty) always recomputes
+const BASELINE_SNAPSHOT = process.env.BASELINE_SNAPSHOT === undefined
+  ? path.join(__dirname, 'baselines.snapshot.json')
+  : process.env.BASELINE_SNAPSHOT;
+// Baselines learned from POST /feedback (see feedback.js); preferred over the snapshot.
+// Only with FEEDBACK=1: otherwise a leftover checkpoint is neither read nor written
+const FEEDBACK_CHECKPOINT = process.env.FEEDBACK !== '1' ? '' : (process.env.FEEDBACK_CHECKPOINT === undefined
+  ? path.join(__dirname, 'feedback.checkpoint.json')
+  : process.env.FEEDBACK_CHECKPOINT);
+
+// Weight table from `python3 -m safety_gateway.train_classifier export`; ML_MODEL= (empty)
+// disables the ML layer, as does a missing file
+const ML_MODEL = process.env.ML_MODEL === undefined
+  ? path.join(__dirname, 'ml.weights.json')
+  : process.env.ML_MODEL;
+// Threat points the ML layer adds at P(unsafe) = 1; none at or below 0.5
+const ML_MAX_SCORE = 20;
+
+// Prompts longer than WINDOW_CHARS have their rules run window by window (see
+// budget.js); the overlap is longer than any bounded rule can match
+const WINDOW_CHARS = 4096;
+const WINDOW_OVERLAP = 512;
+// NCD, LDF and ML read at most this many chars of a prompt: evenly spaced windows
+const SAMPLE_CHARS = 16384;
+// Wall time each rule layer (RITD, CONTEXT, OBFUSCATION) may spend on one
+// prompt before the prompt is held for REVIEW unread (it is still BLOCKED when
+// what was read blocks it); LAYER_BUDGET_MS= (empty) disables
+const LAYER_BUDGET_MS = process.env.LAYER_BUDGET_MS === undefined
+  ? 250
+  : (process.env.LAYER_BUDGET_MS === '' ? null : Number(process.env.LAYER_BUDGET_MS));
+
+// Stopwords and function words for linguistic analysis
+const STOPWORDS = new Set([
+  'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them'
+]);
+
+const FUNCTION_WORDS = new Set([
+  'about', 'above', 'across', 'after', 'against', 'along', 'among', 'around', 'before', 'behind', 'below', 'beneath', 'beside', 'between', 'beyond', 'during', 'except', 'from', 'into', 'near', 'over', 'through', 'toward', 'under', 'until', 'upon', 'within', 'without'
+]);
+
+// Role inversion detection patterns
+const baseTriggers = [
+  /(?:ignore|forget|disregard).{0,20}(?:previous|above|prior|earlier)/i,
+  /(?:act|behave|pretend).{0,20}(?:as|like).{0,20}(?:different|another|new|hacker)/i,
+  /(?:system|admin|root|developer).{0,20}(?:mode|access|override|bypass)/i,
+  /(?:reveal|show|tell|give).{0,20}(?:secret|hidden|confidential|private)/i,
+  /(?:delete|remove|disable|uninstall).{0,20}(?:antivirus|security|defender|firewall|protection)/i,
+  /(?:bypass|circumvent|evade).{0,20}(?:security|protection|detection|firewall)/i,
+  /(?:hide|conceal).{0,20}(?:malware|virus|attack)/i,
+  /(?:silently|secretly|without detection).{0,20}(?:delete|remove|disable|install)/i,
+  // HTML/XML injection and comment-based attacks
+  /<!--.*(?:system|override|disable|unrestricted|filter|admin|root).*-->/i,
+  /<script.*>.*<\/script>/i,
+  /(?:system|admin|root)\s*:\s*(?:respond|output|disable|override|enable)/i,
+  /(?:disable|remove|bypass|ignore).{0,20}(?:content filter|safety|restriction|limitation)/i,
+  /(?:unrestricted|unfiltered|uncensored).{0,20}(?:output|response|mode|access)/i,
+  // Hacking and unauthorized access patterns
+  /\b(?:hack|hacking|hacked|hacker|hacks)\b.{0,30}(?:computer|system|network|server|database|account|password|access|data)/i,
+  /(?:hack|hacking|hacked|hacker).{0,20}(?:into|the|a|an|my|your|their)/i,
+  /(?:enter|break|get|gain|obtain).{0,20}(?:into|access to).{0,30}(?:system|computer|network|server|database|account|level|duos)/i,
+  /(?:unauthorized|illegal|illegitimate).{0,20}(?:access|entry|entry|intrusion)/i,
+  /(?:crack|cracking|cracked).{0,20}(?:password|code|encryption|security|system)/i,
+  /(?:exploit|exploiting|exploited).{0,20}(?:vulnerability|bug|weakness|system|security)/i,
+  /(?:penetrate|penetration|breach|breaching).{0,20}(?:security|system|network|firewall|defense)/i,
+  /(?:steal|stealing|steals|stolen).{0,20}(?:data|information|credentials|password|account)/i,
+  /(?:inject|injecting|injection).{0,20}(?:code|malware|virus|payload|script)/i,
+  /(?:backdoor|trojan|rootkit|keylogger|spyware|ransomware)/i,
+];
+
+// Dangerous keywords that should trigger blocking
+const dangerousKeywords = [
+  'hack', 'hacking', 'hacked', 'hacker', 'crack', 'cracking', 'exploit', 'exploiting',
+  'breach', 'breaching', 'penetrate', 'penetration', 'unauthorized access', 'illegal access',
+  'steal data', 'steal information', 'backdoor', 'trojan', 'rootkit', 'keylogger',
+  'spyware', 'ransomware', 'malware', 'virus injection', 'sql injection', 'xss',
+  'ddos', 'phishing', 'social engineering', 'privilege escalation', 'buffer overflow',
+  // Weapons and illegal activities
+  'bomb', 'explosive', 'weapon', 'gun', 'rifle', 'ammunition', 'grenade', 'c4',
+  'pipe bomb', 'molotov', 'ied', 'detonator', 'dynamite', 'tnt',
+  'poison', 'toxin', 'ricin', 'cyanide', 'anthrax',
+  'drug manufacturing', 'meth lab', 'cocaine production', 'heroin synthesis'
+];
+
+// One Aho-Corasick pass over the prompt finds keyword hits and the triggers worth running
+const ritdRules = compileRuleSet({
+  patterns: baseTriggers,
+  keywords: dangerousKeywords,
+  labelPattern: (pattern) => pattern.source.replace(/\(\?:|\)/g, '').slice(0, 60),
+  labelKeyword: (keyword) => `Keyword: ${keyword}`,
+});
+
+const NCD_MODE = process.env.NCD_MODE || 'exact';
+// Backend for the entropy score and NCD (see compressors.js); baselines,
+// snapshots and checkpoints are only valid for the backend they were built with
+const compressor = createCompressor(process.env.COMPRESSOR || 'gzip');
+const classifier = loadClassifier(ML_MODEL);
+let baselineSource = null;
+let baselines;
+let safeEntropyStats;
+let unsafeEntropyStats;
+let safeFeatureStats;
+let safeCorpus;
+let unsafeCorpus;
+let safeNcd;
+let unsafeNcd;
+// From a checkpoint or snapshot when it matches the datasets, otherwise computed from them
+setBaselines(loadBaselines());
+
+// Replaces the baselines every layer scores against (feedback updates, or a
+// worker thread catching up with the main thread). Callers holding a verdict
+// cache must refresh it afterwards.
+function setBaselines(next) {
+  const previous = baselines;
+  baselines = next;
+  ({
+    safeEntropyStats,
+    unsafeEntropyStats,
+    safeFeatureStats,
+    safeCorpus,
+    unsafeCorpus,
+  } = next);
+  safeNcd = corpusNcd(safeCorpus, next.compressedCorpusLength.safe, safeNcd, previous && previous.safeCorpus);
+  unsafeNcd = corpusNcd(unsafeCorpus, next.compressedCorpusLength.unsafe, unsafeNcd, previous && previous.unsafeCorpus);
+}
+
+// NCD_MODE=knn indexes the corpus rows one by one (see ncd.js). Building an
+// index costs a pass over every exemplar, so an unchanged corpus keeps its
+// index and a changed one reuses the entries of the rows it already had.
+function corpusNcd(corpus, compressedCorpusLength, current, currentCorpus) {
+  if (NCD_MODE !== 'knn') return createNcdEngine(corpus, { mode: NCD_MODE, compressedCorpusLength, compressor });
+  if (current && corpus === currentCorpus) return current;
+  return createNcdIndex(corpus ? corpus.split('\n') : [], { previous: current, compressedCorpusLength, compressor });
+}
+
+function getBaselines() {
+  return baselines;
+}
+
+// Digests of the datasets, computed once; snapshots and checkpoints record it.
+// Taken from the snapshot when one was loaded, so a boot never hashes files
+// whose size and mtime are unchanged.
+function describeBaselineSource() {
+  if (!baselineSource) baselineSource = describeSources(DATA_FILES, NCD_CORPUS_ROWS, compressor.name);
+  return baselineSource;
+}
+
+function computeVerdictVersion() {
+  return fingerprint(
+    baseTriggers.map((pattern) => `${pattern.source}/${pattern.flags}`),
+    dangerousKeywords,
+    safeEntropyStats,
+    unsafeEntropyStats,
+    safeFeatureStats,
+    NCD_MODE,
+    compressor.name,
+    safeNcd.compressedCorpusLength,
+    unsafeNcd.compressedCorpusLength,
+    safeCorpus,
+    unsafeCorpus,
+    classifier ? classifier.version : null,
+    [WINDOW_CHARS, WINDOW_OVERLAP, SAMPLE_CHARS],
+  );
+}
+
+function loadBaselines() {
+  const candidates = [[FEEDBACK_CHECKPOINT, 'checkpoint'], [BASELINE_SNAPSHOT, 'snapshot']];
+  for (const [filePath, origin] of candidates) {
+    if (!filePath) continue;
+    const { snapshot, reason } = readSnapshot(
+      filePath,
+      baselineSource || describeSources(DATA_FILES, NCD_CORPUS_ROWS, compressor.name, { digests: false }),
+    );
+    if (snapshot) {
+      baselineSource = snapshot.source;
+      return { ...snapshot.baselines, origin };
+    }
+    if (reason !== 'missing') {
+      console.warn(`[Baselines] Not using ${filePath} (${reason})`);
+    }
+  }
+  return { ...computeBaselines(DATA_FILES), origin: 'datasets' };
+}
+
+// Stream the datasets once: entropy and feature statistics are accumulated
+// row by row and only the first NCD_CORPUS_ROWS texts per label are kept
+function computeBaselines(dataFiles) {
+  const entropy = { safe: createRunningStats(), unsafe: createRunningStats() };
+  const corpusRows = { safe: [], unsafe: [] };
+  let featureStats = null; // feature name -> running stats, from the first safe row
+
+  Object.values(dataFiles).forEach((filePath) => {
+    readLabeledRows(filePath, ({ text, label }) => {
+      entropy[label].add(computeEntropyScore(text));
+      if (corpusRows[label].length < NCD_CORPUS_ROWS) corpusRows[label].push(text);
+      if (label !== 'safe') return;
+      const vector = computeFeatureVector(text);
+      if (!featureStats) {
+        featureStats = {};
+        Object.keys(vector).forEach((key) => { featureStats[key] = createRunningStats(); });
+      }
+      Object.keys(vector).forEach((key) => featureStats[key].add(vector[key]));
+    });
+  });
+
+  const safeFeatureStats = {};
+  Object.entries(featureStats || {}).forEach(([key, stats]) => {
+    safeFeatureStats[key] = stats.summary();
+  });
+  const corpora = {
+    safe: corpusRows.safe.join('\n'),
+    unsafe: corpusRows.unsafe.join('\n'),
+  };
+  const compressedCorpus = (corpus) => (corpus ? compressor.length(Buffer.from(corpus, 'utf-8')) : 0);
+  return {
+    rows: { safe: entropy.safe.count, unsafe: entropy.unsafe.count },
+    safeEntropyStats: entropy.safe.summary(),
+    unsafeEntropyStats: entropy.unsafe.summary(),
+    safeFeatureStats,
+    safeCorpus: corpora.safe,
+    unsafeCorpus: corpora.unsafe,
+    compressedCorpusLength: {
+      safe: compressedCorpus(corpora.safe),
+      unsafe: compressedCorpus(corpora.unsafe),
+    },
+  };
+}
+
+function computeEntropyScore(text) {
+  if (!text) return 0;
+  const buffer = Buffer.from(text, 'utf-8');
+  if (buffer.length === 0) return 0;
+  return compressor.length(buffer) / buffer.length;
+}
+
+// \s in JS regexes is Unicode-aware: these are the code units it matches
+function isWhitespaceCode(code) {
+  if (code <= 0x20) return code === 0x20 || (code >= 0x09 && code <= 0x0d);
+  if (code < 0xa0) return false;
+  return code === 0xa0 || code === 0x1680 || (code >= 0x2000 && code <= 0x200a)
+    || code === 0x2028 || code === 0x2029 || code === 0x202f || code === 0x205f
+    || code === 0x3000 || code === 0xfeff;
+}
+
+// Single pass over the UTF-16 code units: character classes, the longest
+// repeated run and the \b[\w']+\b tokens (a maximal run of word chars and
+// apostrophes, minus leading/trailing apostrophes) are all counted in place,
+// without match arrays or a token array.
+function computeFeatureVector(text) {
+  const sanitized = text || '';
+  const textLength = sanitized.length;
+  const length = textLength || 1;
+  let uppercaseCount = 0;
+  let digitCount = 0;
+  let punctuationCount = 0;
+  let whitespaceCount = 0;
+  let longestRun = textLength ? 1 : 0;
+  let currentRun = 1;
+  let tokens = 0;
+  let tokenLengthSum = 0;
+  let stopwordHits = 0;
+  let functionWordHits = 0;
+  const uniqueTokens = new Set();
+  let firstWord = -1;
+  let lastWord = -1;
+  let previous = -1;
+
+  for (let i = 0; i <= textLength; i += 1) {
+    if (i < textLength) {
+      const code = sanitized.charCodeAt(i);
+      // Only these two lowercase into ASCII word chars; let the regex path handle them
+      if (code === 0x130 || code === 0x212a) return computeFeatureVectorByRegex(sanitized);
+
+      if (code === previous) {
+        currentRun += 1;
+        if (currentRun > longestRun) longestRun = currentRun;
+      } else {
+        currentRun = 1;
+        previous = code;
+      }
+
+      const isUpper = code >= 65 && code <= 90;
+      const isDigit = code >= 48 && code <= 57;
+      if (isUpper || isDigit || code === 95 || (code >= 97 && code <= 122)) {
+        if (isUpper) uppercaseCount += 1;
+        if (isDigit) digitCount += 1;
+        if (firstWord < 0) firstWord = i;
+        lastWord = i;
+        continue;
+      }
+      if (isWhitespaceCode(code)) {
+        whitespaceCount += 1;
+      } else {
+        punctuationCount += 1;
+        if (code === 39) continue; // apostrophes extend the current token run
+      }
+    }
+
+    if (firstWord >= 0) {
+      const token = sanitized.slice(firstWord, lastWord + 1).toLowerCase();
+      tokens += 1;
+      tokenLengthSum += token.length;
+      if (STOPWORDS.has(token)) stopwordHits += 1;
+      if (FUNCTION_WORDS.has(token)) functionWordHits += 1;
+      uniqueTokens.add(token);
+      firstWord = -1;
+    }
+  }
+
+  const tokenCount = tokens || 1;
+  return {
+    tokenCount,
+    avgTokenLength: tokenLengthSum / tokenCount,
+    stopwordRatio: stopwordHits / tokenCount,
+    functionWordRatio: functionWordHits / tokenCount,
+    uppercaseRatio: uppercaseCount / length,
+    digitRatio: digitCount / length,
+    punctuationRatio: punctuationCount / length,
+    uniqueTokenRatio: uniqueTokens.size / tokenCount,
+    longestRunRatio: longestRun / length,
+    whitespaceRatio: whitespaceCount / length,
+  };
+}
+
+// Reference regex implementation, used when the prompt contains characters
+// whose lowercase form changes tokenization (U+0130, U+212A)
+function computeFeatureVectorByRegex(text) {
+  const sanitized = text || '';
+  const length = sanitized.length || 1;
+  const tokens = sanitized.toLowerCase().match(/\b[\w']+\b/g) || [];
+  const tokenCount = tokens.length || 1;
+  const uniqueTokens = new Set(tokens);
+  const uppercaseCount = (sanitized.match(/[A-Z]/g) || []).length;
+  const digitCount = (sanitized.match(/\d/g) || []).length;
+  const punctuationCount = (sanitized.match(/[^\w\s]/g) || []).length;
+  const whitespaceCount = (sanitized.match(/\s/g) || []).length;
+  const longestRun = longestRepeatingRun(sanitized);
+
+  const stopwordHits = tokens.filter((token) => STOPWORDS.has(token)).length;
+  const functionWordHits = tokens.filter((token) => FUNCTION_WORDS.has(token)).length;
+  const avgTokenLength = tokens.reduce((sum, token) => sum + token.length, 0) / tokenCount;
+
+  return {
+    tokenCount,
+    avgTokenLength,
+    stopwordRatio: stopwordHits / tokenCount,
+    functionWordRatio: functionWordHits / tokenCount,
+    uppercaseRatio: uppercaseCount / length,
+    digitRatio: digitCount / length,
+    punctuationRatio: punctuationCount / length,
+    uniqueTokenRatio: uniqueTokens.size / tokenCount,
+    longestRunRatio: longestRun / length,
+    whitespaceRatio: whitespaceCount / length,
+  };
+}
+
+function longestRepeatingRun(text) {
+  if (!text) return 0;
+  let maxRun = 1;
+  let currentRun = 1;
+  for (let i = 1; i < text.length; i += 1) {
+    if (text[i] === text[i - 1]) {
+      currentRun += 1;
+      maxRun = Math.max(maxRun, currentRun);
+    } else {
+      currentRun = 1;
+    }
+  }
+  return maxRun;
+}
+
+// The rule layers take an optional `test(regex)`; runRules() passes one that
+// works on windows within the layer budget
+function detectRoleInversion(prompt, test) {
+  return ritdRules.match(prompt, test);
+}
+
+function computeDeviation(featureVector, baselineStats) {
+  const deviations = Object.entries(featureVector).map(([key, value]) => {
+    const stats = baselineStats[key] || { mean: 0, std: 1 };
+    if (!stats.std) return 0;
+    return Math.abs((value - stats.mean) / stats.std);
+  });
+
+  const averageDeviation = deviations.reduce((sum, val) => sum + val, 0) / deviations.length;
+  return Number(averageDeviation.toFixed(2));
+}
+
+function normalizeEntropy(entropyScore) {
+  const range = unsafeEntropyStats.mean - safeEntropyStats.mean || 0.0001;
+  const normalized = (entropyScore - safeEntropyStats.mean) / range;
+  return Math.max(0, Math.min(1, normalized));
+}
+
+// Entropy and NCD against both corpora (the prompt is compressed once and reused)
+function computeNcdProfile(prompt) {
+  const promptBuffer = Buffer.from(prompt, 'utf-8');
+  const cPrompt = promptBuffer.length ? compressor.length(promptBuffer) : 0;
+  const entropyScore = promptBuffer.length ? cPrompt / promptBuffer.length : 0;
+  const ncdSafe = safeNcd.distance(promptBuffer, cPrompt);
+  const ncdUnsafe = unsafeNcd.distance(promptBuffer, cPrompt);
+  return {
+    entropyScore,
+    normalizedEntropy: normalizeEntropy(entropyScore),
+    ncdSafe,
+    ncdUnsafe,
+    ncdDelta: Number((ncdSafe - ncdUnsafe).toFixed(4)),
+  };
+}
+
+// Advanced detection functions
+// P(unsafe) from the trained classifier, rounded like the other layer outputs;
+// null when no model is loaded
+function computeMlProbability(prompt) {
+  if (!classifier) return null;
+  return Number(classifier.predict(prompt).toFixed(4));
+}
+
+function detectObfuscation(prompt, test = (regex) => regex.test(prompt)) {
+  const obfuscationPatterns = [
+    /\b(?:base64|hex|binary|encoded|decoded|obfuscated)\b/i,
+    /[A-Za-z0-9+\/]{20,}={0,2}/, // Base64-like patterns
+    /0x[0-9a-fA-F]{4,}/, // Hex patterns
+    /%[0-9a-fA-F]{2}/g, // URL encoding
+    /&#x?[0-9a-fA-F]+;/g, // HTML entities
+    /[^\x20-\x7E]{3,}/, // Non-printable characters
+  ];
+  
+  const matches = [];
+  obfuscationPatterns.forEach((pattern, idx) => {
+    if (test(pattern)) {
+      matches.push(`Obfuscation pattern ${idx + 1} detected`);
+    }
+  });
+  
+  return matches;
+}
+
+function analyzeContext(prompt, test = (regex) => regex.test(prompt)) {
+  const contextScore = {
+    suspicious: 0,
+    neutral: 0,
+    safe: 0,
+    reasons: []
+  };
+  
+  // Suspicious context indicators
+  const suspiciousContexts = [
+    { pattern: /(?:how|what|way|method|technique).{0,30}(?:to|can|do|should).{0,30}(?:hack|crack|break|steal|exploit)/i, weight: 0.8 },
+    { pattern: /(?:help|assist|guide|teach).{0,30}(?:me|us|you).{0,30}(?:hack|crack|break|steal|exploit)/i, weight: 0.9 },
+    { pattern: /(?:i|we|they).{0,20}(?:want|need|trying|attempting).{0,30}(?:to|to).{0,30}(?:hack|crack|break|steal|exploit)/i, weight: 0.85 },
+    { pattern: /(?:show|tell|give|provide).{0,20}(?:me|us).{0,30}(?:code|script|method|way).{0,30}(?:to|for).{0,30}(?:hack|crack|break)/i, weight: 0.9 },
+    { pattern: /(?:bypass|circumvent|evade|override).{0,30}(?:security|protection|safety|guard|defense)/i, weight: 0.95 },
+  ];
+  
+  suspiciousContexts.forEach(({ pattern, weight }) => {
+    if (test(pattern)) {
+      contextScore.suspicious += weight;
+      contextScore.reasons.push(`Suspicious intent detected (weight: ${weight})`);
+    }
+  });
+  
+  // Safe context indicators (reduce suspicion)
+  const safeContexts = [
+    { pattern: /(?:explain|describe|what is|tell me about|how does).{0,30}(?:security|hacking|cybersecurity)/i, weight: -0.3 },
+    { pattern: /(?:learn|study|understand|education|academic|research)/i, weight: -0.2 },
+    { pattern: /(?:prevent|protect|defend|secure|guard)/i, weight: -0.4 },
+  ];
+  
+  safeContexts.forEach(({ pattern, weight }) => {
+    if (test(pattern)) {
+      contextScore.safe += Math.abs(weight);
+      contextScore.reasons.push(`Educational/defensive context detected`);
+    }
+  });
+  
+  return contextScore;
+}
+
+function computeThreatScore(ritdHits, deviationScore, entropyScore, ncdDelta, contextScore, obfuscationHits, mlProbability = null) {
+  let threatScore = 0;
+  const maxScore = 100;
+  const details = [];
+  
+  // RITD contribution (40% weight)
+  const ritdScore = Math.min(40, ritdHits.length * 10);
+  threatScore += ritdScore;
+  if (ritdScore > 0) {
+    details.push(`RITD: ${ritdScore}/40 (${ritdHits.length} patterns detected)`);
+  }
+  
+  // LDF contribution (25% weight)
+  const ldfScore = Math.min(25, (deviationScore / 4.0) * 25);
+  threatScore += ldfScore;
+  if (ldfScore > 10) {
+    details.push(`LDF: ${ldfScore.toFixed(1)}/25 (deviation: ${deviationScore.toFixed(2)})`);
+  }
+  
+  // Context analysis (20% weight)
+  const contextThreat = Math.min(20, contextScore.suspicious * 20);
+  threatScore += contextThreat;
+  if (contextThreat > 5) {
+    details.push(`Context: ${contextThreat.toFixed(1)}/20 (suspicious intent)`);
+  }
+  
+  // Obfuscation (10% weight)
+  const obfuscationScore = Math.min(10, obfuscationHits.length * 5);
+  threatScore += obfuscationScore;
+  if (obfuscationScore > 0) {
+    details.push(`Obfuscation: ${obfuscationScore}/10 (${obfuscationHits.length} patterns)`);
+  }
+  
+  // NCD contribution (5% weight) - only if significantly different
+  if (Math.abs(ncdDelta) > 0.1) {
+    const ncdScore = Math.min(5, Math.abs(ncdDelta) * 10);
+    threatScore += ncdScore;
+    if (ncdScore > 2) {
+      details.push(`NCD: ${ncdScore.toFixed(1)}/5 (delta: ${ncdDelta.toFixed(3)})`);
+    }
+  }
+
+  // Trained classifier (only with a model loaded) - confident unsafe predictions only
+  if (mlProbability !== null) {
+    const mlScore = Math.min(ML_MAX_SCORE, Math.max(0, mlProbability - 0.5) * 2 * ML_MAX_SCORE);
+    threatScore += mlScore;
+    if (mlScore > 5) {
+      details.push(`ML: ${mlScore.toFixed(1)}/${ML_MAX_SCORE} (P(unsafe) ${mlProbability.toFixed(2)})`);
+    }
+  }
+  
+  // Safe context reduces threat
+  const safeReduction = Math.min(15, contextScore.safe * 15);
+  threatScore = Math.max(0, threatScore - safeReduction);
+  if (safeReduction > 0) {
+    details.push(`Safe context reduction: -${safeReduction.toFixed(1)}`);
+  }
+  
+  return {
+    score: Math.min(maxScore, Math.round(threatScore)),
+    maxScore,
+    percentage: Math.round((threatScore / maxScore) * 100),
+    details
+  };
+}
+
+function getConfidenceLevel(threatScore) {
+  if (threatScore >= 70) return { level: 'HIGH', color: 'red', action: 'BLOCK' };
+  if (threatScore >= 50) return { level: 'MEDIUM', color: 'orange', action: 'BLOCK' };
+  if (threatScore >= 30) return { level: 'LOW', color: 'yellow', action: 'REVIEW' };
+  return { level: 'MINIMAL', color: 'green', action: 'ALLOW' };
+}
+
+function decideVerdict(ritdHits, deviationScore, contextScore, obfuscationHits, threatScore) {
+  // Adaptive blocking thresholds based on threat score
+  const ritdBlocked = ritdHits.length > 0;
+  const ldfBlocked = deviationScore > 5.0 || threatScore > 50;
+  const contextBlocked = contextScore.suspicious > 0.7;
+  const obfuscationBlocked = obfuscationHits.length > 0 && threatScore > 40;
+  
+  // Disable NCD/entropy checks for now - too many false positives on legitimate prompts
+  const entropyThresholdHigh = 999;  // Effectively disabled
+  const entropyThresholdLow = -999;  // Effectively disabled
+  const entropyAnomaly = false;  // Disabled
+  const ncdAnomaly = false;  // Disabled
+  const ncdBlocked = entropyAnomaly || ncdAnomaly;
+
+  // Final decision: Block if any critical layer triggers OR threat score is high
+  // RITD is always a hard block (highest priority)
+  // Other layers can contribute to blocking, especially with high threat scores
+  const shouldBlock = ritdBlocked || 
+                      (threatScore >= 50) || 
+                      (threatScore >= 30 && (ldfBlocked || contextBlocked || obfuscationBlocked)) ||
+                      ncdBlocked;
+
+  return {
+    ritdBlocked,
+    ldfBlocked,
+    contextBlocked,
+    obfuscationBlocked,
+    ncdBlocked,
+    shouldBlock,
+  };
+}
+
+// The prompt as the layers see it: windows for the rule layers, and for the
+// statistical layers the whole prompt or, past SAMPLE_CHARS, a sample of it
+function preparePrompt(cleanedPrompt) {
+  const windows = splitWindows(cleanedPrompt, WINDOW_CHARS, WINDOW_OVERLAP);
+  const sample = cleanedPrompt.length > SAMPLE_CHARS
+    ? sampleWindows(windows, SAMPLE_CHARS / WINDOW_CHARS, WINDOW_CHARS)
+    : cleanedPrompt;
+  return { windows, sample };
+}
+
+// Runs a rule layer within LAYER_BUDGET_MS; adds `layer` to `exceeded` when it ran out
+function runRules(detect, layer, prompt, windows, exceeded) {
+  const budget = createBudget(LAYER_BUDGET_MS);
+  const result = detect(prompt, (regex) => testWindows(regex, prompt, windows, budget));
+  if (budget.exceeded) exceeded.push(layer);
+  return result;
+}
+
+// The rule layers alone (RITD, CONTEXT, OBFUSCATION), run exactly as
+// analyzePrompt runs them: the cheap checks a prompt must still pass before it
+// reuses a near-duplicate's verdict
+function screenRules(prompt) {
+  const cleanedPrompt = prompt.trim();
+  const exceeded = [];
+  const windows = splitWindows(cleanedPrompt, WINDOW_CHARS, WINDOW_OVERLAP);
+  const ritdHits = runRules(detectRoleInversion, 'RITD', cleanedPrompt, windows, exceeded);
+  const contextScore = runRules(analyzeContext, 'CONTEXT', cleanedPrompt, windows, exceeded);
+  const obfuscationHits = runRules(detectObfuscation, 'OBFUSCATION', cleanedPrompt, windows, exceeded);
+  return {
+    ritdHits,
+    contextScore,
+    obfuscationHits,
+    budgetExceeded: exceeded.length > 0,
+  };
+}
+
+const sameHits = (a, b) => a.length === b.length && a.every((hit, h) => hit === b[h]);
+
+// Whether `prompt` may take `analysis`'s verdict: screenRules() must finish in
+// budget and find exactly the RITD hits, CONTEXT scores and OBFUSCATION hits
+// the analysis recorded. A fast result blocked by RITD stops before CONTEXT and
+// OBFUSCATION, and the same RITD hits block the new prompt too.
+function screenMatches(prompt, analysis) {
+  const { layers } = analysis;
+  const screen = screenRules(prompt);
+  if (screen.budgetExceeded || !sameHits(screen.ritdHits, layers.RITD.hits)) return false;
+  if (!layers.CONTEXT || !layers.OBFUSCATION) return screen.ritdHits.length > 0;
+  return screen.contextScore.suspicious === layers.CONTEXT.suspiciousScore
+    && screen.contextScore.safe === layers.CONTEXT.safeScore
+    && sameHits(screen.obfuscationHits, layers.OBFUSCATION.hits);
+}
+
+const RULE_LAYERS = ['RITD', 'CONTEXT', 'OBFUSCATION'];
+
+// `analysis` (a neighbour's) as the verdict for `prompt`, once screenMatches()
+// passed. The rule layers ran on `prompt` and found the same, so they stand;
+// every other layer, the threat score and the metrics are the neighbour's and
+// are marked `reused` and listed in `nearDuplicate.reused`. The char count in
+// the first log line is the prompt's own.
+function reuseVerdict(prompt, analysis, similarity) {
+  const layers = {};
+  const reused = [];
+  Object.entries(analysis.layers).forEach(([name, layer]) => {
+    const inherited = !RULE_LAYERS.includes(name);
+    layers[name] = inherited ? { ...layer, reused: true } : layer;
+    if (inherited) reused.push(name);
+  });
+  ['threatAnalysis', 'threatScore', 'metrics'].forEach((field) => {
+    if (analysis[field] !== undefined && analysis[field] !== null) reused.push(field);
+  });
+  const result = {
+    ...analysis,
+    layers,
+    nearDuplicate: { similarity: Number(similarity.toFixed(4)), reused },
+  };
+  if (analysis.logs) {
+    result.logs = [
+      { type: 'system', msg: `Gateway received prompt (${prompt.trim().length} chars).` },
+      ...analysis.logs.slice(1, -1),
+      { type: 'system', msg: `Near-duplicate → ${reused.join(', ')} reused from a prompt ${(similarity * 100).toFixed(0)}% similar.` },
+      analysis.logs[analysis.logs.length - 1],
+    ];
+  }
+  return result;
+}
+
+// Pass a `timings` object to have it filled with each layer's wall time in
+// nanoseconds from process.hrtime.bigint() (keys match `layers`, plus
+// `scoring` for the final aggregation). A rule layer that exceeds
+// LAYER_BUDGET_MS blocks the prompt (listed in `budgetExceeded`); prompts
+// longer than WINDOW_CHARS report how they were read in `longPrompt`.
+function analyzePrompt(prompt, timings) {
+  let mark = timings ? process.hrtime.bigint() : 0n;
+  const lap = (layer) => {
+    if (!timings) return;
+    const now = process.hrtime.bigint();
+    timings[layer] = Number(now - mark);
+    mark = now;
+  };
+  const cleanedPrompt = prompt.trim();
+  const { windows, sample } = preparePrompt(cleanedPrompt);
+  const exceeded = [];
+
+  // Layer 1: RITD - Pattern-based detection
+  const ritdHits = runRules(detectRoleInversion, 'RITD', cleanedPrompt, windows, exceeded);
+  lap('RITD');
+  
+  // Layer 2: Entropy and compression analysis
+  const {
+    entropyScore,
+    normalizedEntropy,
+    ncdSafe,
+    ncdUnsafe,
+    ncdDelta,
+  } = computeNcdProfile(sample);
+  lap('NCD');
+
+  // Layer 3: LDF - Linguistic analysis
+  const featureVector = computeFeatureVector(sample);
+  const deviationScore = computeDeviation(featureVector, safeFeatureStats);
+  lap('LDF');
+
+  // Layer 4: Context analysis
+  const contextScore = runRules(analyzeContext, 'CONTEXT', cleanedPrompt, windows, exceeded);
+  lap('CONTEXT');
+  
+  // Layer 5: Obfuscation detection
+  const obfuscationHits = runRules(detectObfuscation, 'OBFUSCATION', cleanedPrompt, windows, exceeded);
+  lap('OBFUSCATION');
+
+  // Layer 6: trained classifier, when a model is loaded
+  const mlProbability = computeMlProbability(sample);
+  if (classifier) lap('ML');
+
+  // Comprehensive threat scoring
+  const threatAnalysis = computeThreatScore(
+    ritdHits,
+    deviationScore,
+    entropyScore,
+    ncdDelta,
+    contextScore,
+    obfuscationHits,
+    mlProbability
+  );
+  
+  const confidence = getConfidenceLevel(threatAnalysis.score);
+
+  const {
+    ritdBlocked,
+    ldfBlocked,
+    contextBlocked,
+    obfuscationBlocked,
+    ncdBlocked,
+    shouldBlock,
+  } = decideVerdict(ritdHits, deviationScore, contextScore, obfuscationHits, threatAnalysis.score);
+  // A layer that ran out of budget has not read the whole prompt. Wall time
+  // also runs out under GC pauses or an oversubscribed CPU, so unless what
+  // was read blocks the prompt, hold it for review (never forwarded) rather
+  // than block it
+  const result = shouldBlock ? 'BLOCKED' : (exceeded.length ? 'REVIEW' : 'SAFE');
+
+  // Generate detailed explanations
+  const getRitdReason = () => {
+    if (ritdHits.length === 0) return 'No role inversion patterns detected.';
+    if (ritdHits.length === 1) return `Detected ${ritdHits.length} suspicious pattern: ${ritdHits[0].substring(0, 50)}.`;
+    return `Detected ${ritdHits.length} suspicious patterns indicating potential security threat.`;
+  };
+
+  const getLdfReason = () => {
+    if (ldfBlocked) {
+      return `Linguistic deviation score ${deviationScore.toFixed(2)} exceeds safe threshold (3.5). Structural patterns suggest non-standard or potentially malicious intent.`;
+    }
+    return `Linguistic fingerprint within safe bounds (deviation: ${deviationScore.toFixed(2)}).`;
+  };
+
+  const getContextReason = () => {
+    if (contextScore.suspicious > 0) {
+      return `Context analysis detected suspicious intent (score: ${contextScore.suspicious.toFixed(2)}). ${contextScore.reasons.slice(0, 2).join(' ')}`;
+    }
+    if (contextScore.safe > 0) {
+      return `Context suggests educational or defensive purpose.`;
+    }
+    return 'Context analysis shows neutral intent.';
+  };
+
+  const layerSummaries = {
+    RITD: {
+      status: ritdBlocked ? 'danger' : 'safe',
+      reason: getRitdReason(),
+      hits: ritdHits,
+      score: ritdHits.length * 10,
+      maxScore: 40,
+    },
+    NCD: {
+      status: ncdBlocked ? 'danger' : 'safe',
+      reason: ncdBlocked
+        ? 'Entropy or compression profile deviates from safe baseline.'
+        : 'Compression profile aligned with safe prompts.',
+      entropyScore: Number(entropyScore.toFixed(3)),
+      normalizedEntropy: Number(normalizedEntropy.toFixed(3)),
+      ncdSafe,
+      ncdUnsafe,
+      ncdDelta,
+    },
+    LDF: {
+      status: ldfBlocked ? 'danger' : 'safe',
+      reason: getLdfReason(),
+      deviationScore,
+      vector: featureVector,
+    },
+    CONTEXT: {
+      status: contextBlocked ? 'danger' : 'safe',
+      reason: getContextReason(),
+      suspiciousScore: contextScore.suspicious,
+      safeScore: contextScore.safe,
+    },
+    OBFUSCATION: {
+      status: obfuscationBlocked ? 'danger' : 'safe',
+      reason: obfuscationHits.length > 0
+        ? `Detected ${obfuscationHits.length} obfuscation pattern(s). Prompt may be encoded or attempting to evade detection.`
+        : 'No obfuscation patterns detected.',
+      hits: obfuscationHits,
+    },
+  };
+  if (classifier) {
+    layerSummaries.ML = {
+      status: mlProbability >= 0.5 ? 'danger' : 'safe',
+      reason: mlProbability >= 0.5
+        ? `Classifier rates the prompt unsafe (P = ${mlProbability.toFixed(2)}).`
+        : `Classifier rates the prompt safe (P(unsafe) = ${mlProbability.toFixed(2)}).`,
+      probability: mlProbability,
+      modelVersion: classifier.version,
+    };
+  }
+  exceeded.forEach((layer) => {
+    Object.assign(layerSummaries[layer], {
+      status: 'danger',
+      reason: `Analysis budget of ${LAYER_BUDGET_MS} ms exceeded before the prompt was fully checked.`,
+      budgetExceeded: true,
+    });
+  });
+
+  const logs = [
+    { type: 'system', msg: `Gateway received prompt (${cleanedPrompt.length} chars).` },
+    {
+      type: layerSummaries.RITD.status === 'danger' ? 'error' : 'success',
+      msg: `RITD → ${layerSummaries.RITD.reason}`,
+    },
+    {
+      type: layerSummaries.NCD.status === 'danger' ? 'error' : 'success',
+      msg: `NCD → Δ ${ncdDelta}, entropy ${layerSummaries.NCD.entropyScore}`,
+    },
+    {
+      type: layerSummaries.LDF.status === 'danger' ? 'error' : 'success',
+      msg: `LDF → deviation score ${deviationScore}`,
+    },
+  ];
+  if (exceeded.length) {
+    logs.push({ type: 'error', msg: `Budget → ${exceeded.join(', ')} exceeded ${LAYER_BUDGET_MS} ms; not forwarding.` });
+  }
+
+  const outcomes = {
+    SAFE: 'Prompt cleared all layers.',
+    REVIEW: 'Prompt held for review before LLM.',
+    BLOCKED: 'Prompt quarantined before LLM.',
+  };
+  logs.push({ type: result === 'SAFE' ? 'success' : 'error', msg: outcomes[result] });
+  lap('scoring');
+
+  return {
+    result,
+    layers: layerSummaries,
+    metrics: {
+      ncdScore: Number(entropyScore.toFixed(2)),
+      ldfScore: deviationScore,
+    },
+    threatAnalysis: {
+      threatScore: threatAnalysis.score,
+      maxScore: threatAnalysis.maxScore,
+      percentage: threatAnalysis.percentage,
+      confidence: confidence.level,
+      confidenceColor: confidence.color,
+      recommendedAction: confidence.action,
+      breakdown: threatAnalysis.details,
+    },
+    logs,
+    ...(windows.length > 1 && {
+      longPrompt: { chars: cleanedPrompt.length, windows: windows.length, sampledChars: sample.length },
+    }),
+    ...(exceeded.length && { budgetExceeded: exceeded }),
+  };
+}
+
+// Fast verdict: SAFE/BLOCKED only, with the layers run cheapest first and a
+// layer skipped whenever no value it could produce would change the verdict.
+// RITD hits are a hard block, so nothing after them runs. Before LDF and again
+// before NCD, the verdict is decided with each pending layer at its lowest and
+// its highest possible contribution (LDF: deviation 0 / unbounded, NCD: 0 / 5
+// points); when both agree the pending layers are skipped. Every blocking rule
+// only gets stricter as the score rises, so the two bounds cover every outcome
+// and the verdict always matches analyzePrompt(). The ML layer, when loaded,
+// always runs along with CONTEXT and OBFUSCATION. threatScore counts the
+// evaluated layers only. `timings`, budgets, windows and REVIEW for a layer
+// over budget work as in analyzePrompt().
+const FAST_LAYERS = ['RITD', 'CONTEXT', 'OBFUSCATION', ...(classifier ? ['ML'] : []), 'LDF', 'NCD'];
+
+function analyzePromptFast(prompt, timings) {
+  let mark = timings ? process.hrtime.bigint() : 0n;
+  const lap = (layer) => {
+    if (!timings) return;
+    const now = process.hrtime.bigint();
+    timings[layer] = Number(now - mark);
+    mark = now;
+  };
+  const cleanedPrompt = prompt.trim();
+  const { windows, sample } = preparePrompt(cleanedPrompt);
+  const exceeded = [];
+  const evaluated = ['RITD'];
+  const fastResult = (result, threatScore, layers) => ({
+    result,
+    mode: 'fast',
+    threatScore,
+    evaluated,
+    skipped: FAST_LAYERS.filter((layer) => !evaluated.includes(layer)),
+    layers,
+    ...(exceeded.length && { budgetExceeded: exceeded }),
+  });
+  const budgetStatus = (layer) => (exceeded.includes(layer) ? { status: 'danger', budgetExceeded: true } : null);
+
+  const ritdHits = runRules(detectRoleInversion, 'RITD', cleanedPrompt, windows, exceeded);
+  lap('RITD');
+  if (ritdHits.length > 0) {
+    return fastResult('BLOCKED', null, { RITD: { status: 'danger', hits: ritdHits, ...budgetStatus('RITD') } });
+  }
+
+  const contextScore = runRules(analyzeContext, 'CONTEXT', cleanedPrompt, windows, exceeded);
+  lap('CONTEXT');
+  const obfuscationHits = runRules(detectObfuscation, 'OBFUSCATION', cleanedPrompt, windows, exceeded);
+  lap('OBFUSCATION');
+  evaluated.push('CONTEXT', 'OBFUSCATION');
+  const mlProbability = computeMlProbability(sample);
+  if (classifier) {
+    lap('ML');
+    evaluated.push('ML');
+  }
+
+  const verdictWith = (deviationScore, ncdDelta) => {
+    const { score } = computeThreatScore(ritdHits, deviationScore, 0, ncdDelta, contextScore, obfuscationHits, mlProbability);
+    return { score, ...decideVerdict(ritdHits, deviationScore, contextScore, obfuscationHits, score) };
+  };
+  // |ncdDelta| = 0.5 earns the full 5 NCD points; 0 earns none
+  const settled = (low, high) => low.shouldBlock === high.shouldBlock;
+
+  let deviationScore = null;
+  let ncdDelta = null;
+  let decision = verdictWith(0, 0);
+  if (!settled(decision, verdictWith(Infinity, 0.5))) {
+    deviationScore = computeDeviation(computeFeatureVector(sample), safeFeatureStats);
+    lap('LDF');
+    evaluated.push('LDF');
+    decision = verdictWith(deviationScore, 0);
+    if (!settled(decision, verdictWith(deviationScore, 0.5))) {
+      ({ ncdDelta } = computeNcdProfile(sample));
+      lap('NCD');
+      evaluated.push('NCD');
+      decision = verdictWith(deviationScore, ncdDelta);
+    }
+  }
+  lap('scoring');
+
+  const status = (blocked) => (blocked ? 'danger' : 'safe');
+  const layers = {
+    RITD: { status: 'safe', hits: ritdHits, ...budgetStatus('RITD') },
+    CONTEXT: {
+      status: status(decision.contextBlocked),
+      suspiciousScore: contextScore.suspicious,
+      safeScore: contextScore.safe,
+      ...budgetStatus('CONTEXT'),
+    },
+    OBFUSCATION: { status: status(decision.obfuscationBlocked), hits: obfuscationHits, ...budgetStatus('OBFUSCATION') },
+  };
+  if (classifier) {
+    layers.ML = { status: mlProbability >= 0.5 ? 'danger' : 'safe', probability: mlProbability };
+  }
+  if (deviationScore !== null) {
+    layers.LDF = { status: status(decision.ldfBlocked), deviationScore };
+  }
+  if (ncdDelta !== null) {
+    layers.NCD = { status: status(decision.ncdBlocked), ncdDelta };
+  }
+  return fastResult(decision.shouldBlock ? 'BLOCKED' : (exceeded.length ? 'REVIEW' : 'SAFE'), decision.score, layers);
+}
+
+module.exports = {
+  DATA_FILES,
+  FEEDBACK_CHECKPOINT,
+  LAYER_BUDGET_MS,
+  ML_MODEL,
+  NCD_CORPUS_ROWS,
+  SAMPLE_CHARS,
+  WINDOW_CHARS,
+  WINDOW_OVERLAP,
+  compressor,
+  get baselines() { return baselines; },
+  computeBaselines,
+  describeBaselineSource,
+  getBaselines,
+  setBaselines,
+  baseTriggers,
+  dangerousKeywords,
+  analyzePrompt,
+  analyzePromptFast,
+  computeVerdictVersion,
+  computeEntropyScore,
+  computeFeatureVector,
+  computeFeatureVectorByRegex,
+  computeMlProbability,
+  computeNcdProfile,
+  computeThreatScore,
+  detectRoleInversion,
+  screenRules,
+  screenMatches,
+  reuseVerdict,
+  analyzeContext,
+  detectObfuscation,
+};
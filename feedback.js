@@ -0,0 +1,230 @@
+// feedback.js
+// Online baseline updates from labeled prompts (POST /feedback in server.js).
+//
+// The learner starts from the baselines detector.js loaded and keeps them
+// current without rereading the datasets:
+// - entropy and safe feature statistics are Welford accumulators (corpus.js)
+//   seeded with the loaded { mean, std } over `rows` values, so a labeled
+//   prompt updates them as if it had been one more dataset row;
+// - each NCD corpus is a reservoir of at most NCD_CORPUS_ROWS lines
+//   (Algorithm R over every row seen), so it stays a bounded, uniform sample.
+//
+// Nothing here runs inside a request: submit() only queues the prompts, the
+// queue is scored a slice at a time between event-loop turns, onApply() gets
+// the new baselines at most every `applyIntervalMs`, and a checkpoint (the
+// snapshot format of snapshot.js) is written asynchronously at most every
+// `checkpointIntervalMs`. detector.js prefers that checkpoint over the build
+// snapshot on the next start that also has FEEDBACK=1. A full queue rejects with
+// err.code === 'QUEUE_FULL', like the analyzer pool.
+
+const { createRunningStats } = require('./corpus');
+const { writeSnapshotAsync } = require('./snapshot');
+const {
+  NCD_CORPUS_ROWS,
+  compressor,
+  computeEntropyScore,
+  computeFeatureVector,
+} = require('./detector');
+
+const LABELS = ['safe', 'unsafe'];
+const SLICE_SIZE = 50;
+
+function queueFullError(maxPending) {
+  const err = new Error(`Feedback queue full (max ${maxPending} pending prompts)`);
+  err.code = 'QUEUE_FULL';
+  return err;
+}
+
+function createFeedbackLearner({
+  baselines,
+  source,
+  checkpointPath = null,
+  applyIntervalMs = 5000,
+  checkpointIntervalMs = 60 * 1000,
+  maxPending = 10000,
+  onApply = () => {},
+  random = Math.random,
+}) {
+  const rows = { ...baselines.rows };
+  const entropy = {
+    safe: createRunningStats({ ...baselines.safeEntropyStats, count: rows.safe }),
+    unsafe: createRunningStats({ ...baselines.unsafeEntropyStats, count: rows.unsafe }),
+  };
+  const features = {};
+  Object.entries(baselines.safeFeatureStats).forEach(([key, summary]) => {
+    features[key] = createRunningStats({ ...summary, count: rows.safe });
+  });
+  const reservoirs = {
+    safe: baselines.safeCorpus ? baselines.safeCorpus.split('\n') : [],
+    unsafe: baselines.unsafeCorpus ? baselines.unsafeCorpus.split('\n') : [],
+  };
+  const capacity = {
+    safe: Math.max(NCD_CORPUS_ROWS, reservoirs.safe.length),
+    unsafe: Math.max(NCD_CORPUS_ROWS, reservoirs.unsafe.length),
+  };
+  const compressedCorpusLength = { ...baselines.compressedCorpusLength };
+  const corpusChanged = { safe: false, unsafe: false };
+
+  const pending = [];
+  const counters = {
+    received: 0,
+    learned: 0,
+    rejected: 0,
+    applied: 0,
+    checkpoints: 0,
+    checkpointErrors: 0,
+  };
+  let current = baselines;
+  let draining = false;
+  let unapplied = false;
+  let uncheckpointed = false;
+  let checkpointing = null;
+  let lastCheckpointAt = null;
+
+  function sample(label, text) {
+    const reservoir = reservoirs[label];
+    if (reservoir.length < capacity[label]) {
+      reservoir.push(text);
+      corpusChanged[label] = true;
+      return;
+    }
+    const slot = Math.floor(random() * rows[label]);
+    if (slot < reservoir.length) {
+      reservoir[slot] = text;
+      corpusChanged[label] = true;
+    }
+  }
+
+  function learn({ text, label }) {
+    rows[label] += 1;
+    entropy[label].add(computeEntropyScore(text));
+    if (label === 'safe') {
+      const vector = computeFeatureVector(text);
+      Object.keys(vector).forEach((key) => {
+        if (!features[key]) features[key] = createRunningStats();
+        features[key].add(vector[key]);
+      });
+    }
+    sample(label, text);
+    counters.learned += 1;
+    unapplied = true;
+    uncheckpointed = true;
+  }
+
+  function drain() {
+    pending.splice(0, SLICE_SIZE).forEach(learn);
+    if (pending.length) {
+      setImmediate(drain);
+    } else {
+      draining = false;
+    }
+  }
+
+  // items: [{ prompt, label: 'safe' | 'unsafe' }], already validated
+  function submit(items) {
+    if (pending.length + items.length > maxPending) {
+      counters.rejected += items.length;
+      throw queueFullError(maxPending);
+    }
+    items.forEach(({ prompt, label }) => pending.push({ text: prompt.trim(), label }));
+    counters.received += items.length;
+    if (!draining) {
+      draining = true;
+      setImmediate(drain);
+    }
+    return { accepted: items.length, pending: pending.length };
+  }
+
+  function buildBaselines() {
+    const corpora = {};
+    LABELS.forEach((label) => {
+      corpora[label] = reservoirs[label].join('\n');
+      if (corpusChanged[label]) {
+        compressedCorpusLength[label] = corpora[label] ? compressor.length(Buffer.from(corpora[label], 'utf-8')) : 0;
+        corpusChanged[label] = false;
+      }
+    });
+    const safeFeatureStats = {};
+    Object.entries(features).forEach(([key, stats]) => {
+      safeFeatureStats[key] = stats.summary();
+    });
+    return {
+      rows: { ...rows },
+      safeEntropyStats: entropy.safe.summary(),
+      unsafeEntropyStats: entropy.unsafe.summary(),
+      safeFeatureStats,
+      safeCorpus: corpora.safe,
+      unsafeCorpus: corpora.unsafe,
+      compressedCorpusLength: { ...compressedCorpusLength },
+      origin: 'feedback',
+    };
+  }
+
+  // Publishes what has been learned so far; a no-op when nothing changed
+  function apply() {
+    if (!unapplied) return current;
+    unapplied = false;
+    current = buildBaselines();
+    counters.applied += 1;
+    onApply(current);
+    return current;
+  }
+
+  async function checkpoint() {
+    if (!checkpointPath || !uncheckpointed) return;
+    if (checkpointing) {
+      await checkpointing;
+      return;
+    }
+    uncheckpointed = false;
+    const { origin, ...derived } = apply();
+    checkpointing = writeSnapshotAsync(checkpointPath, derived, source, `node ${process.version} feedback`)
+      .then(() => {
+        counters.checkpoints += 1;
+        lastCheckpointAt = new Date().toISOString();
+      })
+      .catch((err) => {
+        counters.checkpointErrors += 1;
+        uncheckpointed = true;
+        console.error(`[Feedback] Checkpoint to ${checkpointPath} failed: ${err.message}`);
+      })
+      .finally(() => { checkpointing = null; });
+    await checkpointing;
+  }
+
+  const applyTimer = setInterval(apply, applyIntervalMs);
+  const checkpointTimer = setInterval(checkpoint, checkpointIntervalMs);
+  applyTimer.unref();
+  checkpointTimer.unref();
+
+  function stats() {
+    return {
+      ...counters,
+      pending: pending.length,
+      rows: { ...rows },
+      lastCheckpointAt,
+    };
+  }
+
+  // Learns whatever is still queued, publishes it and writes a final checkpoint
+  async function close() {
+    clearInterval(applyTimer);
+    clearInterval(checkpointTimer);
+    pending.splice(0).forEach(learn);
+    apply();
+    if (checkpointing) await checkpointing;
+    await checkpoint();
+  }
+
+  return {
+    submit,
+    apply,
+    checkpoint,
+    stats,
+    close,
+  };
+}
+
+module.exports = {
+  createFeedbackLearner,
+};
@@ -0,0 +1,314 @@
+// matcher.js
+// Single-pass multi-pattern matcher for the RITD layer.
+//
+// compileRuleSet({ patterns, keywords }) builds one Aho-Corasick automaton over
+// the lowercased prompt that covers every keyword plus a required literal
+// "anchor" extracted from each regex (e.g. ignore|forget|disregard for
+// /(?:ignore|forget|disregard).{0,20}.../i). One scan finds every keyword hit
+// and tells us which regexes can possibly match; only those are executed.
+// Regexes without an extractable anchor are always executed. Hits come back
+// in the same order as the old loop: patterns first, then keywords, each in
+// declaration order.
+
+const ZERO_WIDTH_ESCAPES = new Set(['b', 'B']);
+const CLASS_ESCAPES = new Set(['d', 'D', 'w', 'W', 's', 'S', 'n', 'r', 't', 'v', 'f', 'x', 'u', 'c', '0']);
+
+class AhoCorasick {
+  constructor(strings) {
+    this.transitions = [new Map()];
+    this.fail = [0];
+    this.outputs = [[]];
+    strings.forEach((value, id) => this.insert(value, id));
+    this.buildFailureLinks();
+  }
+
+  insert(value, id) {
+    let state = 0;
+    for (let i = 0; i < value.length; i += 1) {
+      const code = value.charCodeAt(i);
+      let next = this.transitions[state].get(code);
+      if (next === undefined) {
+        next = this.transitions.length;
+        this.transitions.push(new Map());
+        this.fail.push(0);
+        this.outputs.push([]);
+        this.transitions[state].set(code, next);
+      }
+      state = next;
+    }
+    this.outputs[state].push(id);
+  }
+
+  buildFailureLinks() {
+    const queue = [];
+    this.transitions[0].forEach((child) => queue.push(child));
+    for (let head = 0; head < queue.length; head += 1) {
+      const state = queue[head];
+      this.transitions[state].forEach((child, code) => {
+        let fallback = this.fail[state];
+        while (fallback && !this.transitions[fallback].has(code)) {
+          fallback = this.fail[fallback];
+        }
+        const target = this.transitions[fallback].get(code);
+        this.fail[child] = target !== undefined && target !== child ? target : 0;
+        // Inherit matches that end here via the failure chain
+        this.outputs[child] = this.outputs[child].concat(this.outputs[this.fail[child]]);
+        queue.push(child);
+      });
+    }
+  }
+
+  // Calls onMatch(id) for every occurrence of every string in `text`.
+  scan(text, onMatch) {
+    let state = 0;
+    for (let i = 0; i < text.length; i += 1) {
+      const code = text.charCodeAt(i);
+      let next = this.transitions[state].get(code);
+      while (next === undefined && state) {
+        state = this.fail[state];
+        next = this.transitions[state].get(code);
+      }
+      state = next === undefined ? 0 : next;
+      const found = this.outputs[state];
+      for (let j = 0; j < found.length; j += 1) {
+        onMatch(found[j]);
+      }
+    }
+  }
+}
+
+// Index of the `)` closing the group opened at `start`, honouring escapes and classes.
+function findGroupEnd(source, start) {
+  let depth = 0;
+  let inClass = false;
+  for (let i = start; i < source.length; i += 1) {
+    const ch = source[i];
+    if (ch === '\\') {
+      i += 1;
+    } else if (inClass) {
+      if (ch === ']') inClass = false;
+    } else if (ch === '[') {
+      inClass = true;
+    } else if (ch === '(') {
+      depth += 1;
+    } else if (ch === ')') {
+      depth -= 1;
+      if (depth === 0) return i;
+    }
+  }
+  return -1;
+}
+
+// Literal alternatives of a group body like `ignore|forget|disregard`, or null.
+function literalAlternatives(body) {
+  const alternatives = [];
+  let current = '';
+  for (let i = 0; i < body.length; i += 1) {
+    const ch = body[i];
+    if (ch === '|') {
+      alternatives.push(current);
+      current = '';
+    } else if (ch === '\\') {
+      const next = body[i + 1];
+      if (next === undefined || /[A-Za-z0-9]/.test(next)) return null;
+      current += next;
+      i += 1;
+    } else if ('()[]{}.*+?^$'.includes(ch)) {
+      return null;
+    } else {
+      current += ch;
+    }
+  }
+  alternatives.push(current);
+  return alternatives.some((alt) => !alt) ? null : alternatives;
+}
+
+// Does the quantifier at `index` allow zero repetitions?
+function isOptionalQuantifier(source, index) {
+  const ch = source[index];
+  if (ch === '*' || ch === '?') return true;
+  return ch === '{' && /^\{0+(?:,\d*)?\}/.test(source.slice(index, index + 16));
+}
+
+function quantifierEnd(source, index) {
+  const ch = source[index];
+  if (ch === '*' || ch === '+' || ch === '?') return index + 1;
+  if (ch === '{') {
+    const close = source.indexOf('}', index);
+    if (close > -1 && /^\{\d+(?:,\d*)?\}$/.test(source.slice(index, close + 1))) return close + 1;
+  }
+  return index;
+}
+
+// Returns the lowercased literal alternatives that any match of `regex` must
+// contain (the most selective required top-level element), or null when no
+// such anchor can be proven.
+function extractAnchors(regex) {
+  const { source } = regex;
+  const candidates = [];
+  let run = '';
+  const flushRun = () => {
+    if (run) candidates.push([run]);
+    run = '';
+  };
+
+  let i = 0;
+  while (i < source.length) {
+    const ch = source[i];
+    let atomEnd;
+    let alternatives = null;
+    let literalChar = null;
+
+    if (ch === '|') {
+      return null; // top-level alternation: nothing is required
+    }
+    if (ch === '^' || ch === '$') {
+      flushRun();
+      i += 1;
+      continue;
+    }
+    if (ch === '\\') {
+      const next = source[i + 1];
+      if (ZERO_WIDTH_ESCAPES.has(next)) {
+        flushRun();
+        i += 2;
+        continue;
+      }
+      atomEnd = i + 2;
+      if (!CLASS_ESCAPES.has(next) && !/[0-9A-Za-z]/.test(next)) literalChar = next;
+    } else if (ch === '(') {
+      const close = findGroupEnd(source, i);
+      if (close < 0) return null;
+      const body = source.slice(i + 1, close);
+      if (body.startsWith('?=') || body.startsWith('?!') || body.startsWith('?<')) {
+        flushRun();
+        i = close + 1;
+        continue;
+      }
+      alternatives = literalAlternatives(body.startsWith('?:') ? body.slice(2) : body);
+      atomEnd = close + 1;
+    } else if (ch === '[') {
+      let j = i + 1;
+      while (j < source.length && source[j] !== ']') j += source[j] === '\\' ? 2 : 1;
+      atomEnd = j + 1;
+    } else if ('.*+?{}'.includes(ch)) {
+      atomEnd = i + 1;
+    } else {
+      atomEnd = i + 1;
+      literalChar = ch;
+    }
+
+    const optional = isOptionalQuantifier(source, atomEnd);
+    const next = quantifierEnd(source, atomEnd);
+    const quantified = next !== atomEnd;
+
+    if (literalChar !== null && !quantified) {
+      run += literalChar;
+    } else {
+      // A quantifier binds to the last char only, so the run ends before it
+      flushRun();
+      if (literalChar !== null && !optional) candidates.push([literalChar]);
+      if (alternatives && !optional) candidates.push(alternatives);
+    }
+    i = next;
+  }
+  flushRun();
+
+  if (!candidates.length) return null;
+  // Prefer the anchor whose shortest alternative is longest (fewest false candidates)
+  const best = candidates.reduce((a, b) => (
+    Math.min(...b.map((s) => s.length)) > Math.min(...a.map((s) => s.length)) ? b : a
+  ));
+  return best.map((s) => s.toLowerCase());
+}
+
+// patterns: RegExp[] reported as labelPattern(regex); keywords: string[]
+// reported as labelKeyword(keyword). Returns { match(prompt, test) -> string[] }.
+// `test(regex)` runs a candidate regex (default: regex.test(prompt)); detector.js
+// passes one that works on windows of a long prompt within a time budget.
+function compileRuleSet({ patterns = [], keywords = [], labelPattern, labelKeyword }) {
+  const strings = [];
+  const stringIds = new Map();
+  const owners = []; // per string id: { patterns: [], keywords: [] }
+  const intern = (value) => {
+    let id = stringIds.get(value);
+    if (id === undefined) {
+      id = strings.length;
+      strings.push(value);
+      stringIds.set(value, id);
+      owners.push({ patterns: [], keywords: [] });
+    }
+    return id;
+  };
+
+  const alwaysRun = [];
+  patterns.forEach((regex, index) => {
+    const anchors = extractAnchors(regex);
+    if (!anchors) {
+      alwaysRun.push(index);
+      return;
+    }
+    anchors.forEach((anchor) => owners[intern(anchor)].patterns.push(index));
+  });
+  keywords.forEach((keyword, index) => {
+    owners[intern(keyword.toLowerCase())].keywords.push(index);
+  });
+
+  const automaton = new AhoCorasick(strings);
+  const patternLabels = patterns.map(labelPattern);
+  const keywordLabels = keywords.map(labelKeyword);
+
+  // seen[id] === generation marks strings already reported for this prompt,
+  // so no per-call allocation proportional to the rule count is needed
+  const seen = new Uint32Array(strings.length);
+  let generation = 0;
+
+  function match(prompt, test) {
+    generation = generation === 0xffffffff ? 1 : generation + 1;
+    if (generation === 1) seen.fill(0);
+    const candidatePatterns = alwaysRun.slice();
+    const keywordHits = [];
+
+    automaton.scan(prompt.toLowerCase(), (id) => {
+      if (seen[id] === generation) return;
+      seen[id] = generation;
+      const owner = owners[id];
+      for (let k = 0; k < owner.patterns.length; k += 1) candidatePatterns.push(owner.patterns[k]);
+      for (let k = 0; k < owner.keywords.length; k += 1) keywordHits.push(owner.keywords[k]);
+    });
+
+    const matches = [];
+    candidatePatterns.sort((a, b) => a - b);
+    for (let k = 0; k < candidatePatterns.length; k += 1) {
+      const index = candidatePatterns[k];
+      if (k > 0 && candidatePatterns[k - 1] === index) continue;
+      const regex = patterns[index];
+      let matched;
+      if (test) {
+        matched = test(regex);
+      } else {
+        regex.lastIndex = 0;
+        matched = regex.test(prompt);
+      }
+      if (matched) matches.push(patternLabels[index]);
+    }
+    keywordHits.sort((a, b) => a - b);
+    for (let k = 0; k < keywordHits.length; k += 1) {
+      matches.push(keywordLabels[keywordHits[k]]);
+    }
+    return matches;
+  }
+
+  return {
+    match,
+    patternCount: patterns.length,
+    keywordCount: keywords.length,
+    unanchoredPatterns: alwaysRun.length,
+  };
+}
+
+module.exports = {
+  AhoCorasick,
+  compileRuleSet,
+  extractAnchors,
+};
@@ -0,0 +1,193 @@
+// metrics.js
+// Minimal Prometheus registry (text exposition format 0.0.4) and the
+// gateway's own metrics. No client library: counters and histograms are plain
+// objects keyed by their label values, and gauges are read when scraped.
+
+const { monitorEventLoopDelay } = require('perf_hooks');
+
+const LAYER_BUCKETS = [0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1];
+const REQUEST_BUCKETS = [0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30];
+const OLLAMA_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120];
+
+function escapeLabel(value) {
+  return String(value).replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n');
+}
+
+function formatLabels(labels) {
+  const keys = Object.keys(labels);
+  if (!keys.length) return '';
+  return `{${keys.map((key) => `${key}="${escapeLabel(labels[key])}"`).join(',')}}`;
+}
+
+function formatValue(value) {
+  if (value === Infinity) return '+Inf';
+  if (value === -Infinity) return '-Inf';
+  return String(value);
+}
+
+function createRegistry() {
+  const metrics = [];
+
+  function register(metric) {
+    metrics.push(metric);
+    return metric;
+  }
+
+  function counter(name, help) {
+    const series = new Map();
+    return register({
+      name,
+      help,
+      type: 'counter',
+      inc(labels = {}, value = 1) {
+        const key = formatLabels(labels);
+        series.set(key, (series.get(key) || 0) + value);
+      },
+      lines() {
+        return [...series].map(([labels, value]) => `${name}${labels} ${formatValue(value)}`);
+      },
+    });
+  }
+
+  function histogram(name, help, buckets) {
+    const series = new Map();
+    return register({
+      name,
+      help,
+      type: 'histogram',
+      observe(labels, value) {
+        const key = formatLabels(labels);
+        let entry = series.get(key);
+        if (!entry) {
+          entry = { labels, counts: new Array(buckets.length).fill(0), sum: 0, count: 0 };
+          series.set(key, entry);
+        }
+        for (let i = 0; i < buckets.length; i += 1) {
+          if (value <= buckets[i]) entry.counts[i] += 1;
+        }
+        entry.sum += value;
+        entry.count += 1;
+      },
+      lines() {
+        const out = [];
+        series.forEach(({ labels, counts, sum, count }) => {
+          buckets.forEach((bound, i) => {
+            out.push(`${name}_bucket${formatLabels({ ...labels, le: bound })} ${counts[i]}`);
+          });
+          out.push(`${name}_bucket${formatLabels({ ...labels, le: '+Inf' })} ${count}`);
+          out.push(`${name}_sum${formatLabels(labels)} ${formatValue(sum)}`);
+          out.push(`${name}_count${formatLabels(labels)} ${count}`);
+        });
+        return out;
+      },
+    });
+  }
+
+  // Values read at scrape time. collect() returns a number or [{ labels, value }].
+  function collected(name, help, type, collect) {
+    return register({
+      name,
+      help,
+      type,
+      lines() {
+        const value = collect();
+        const samples = Array.isArray(value) ? value : [{ labels: {}, value }];
+        return samples.map((sample) => `${name}${formatLabels(sample.labels)} ${formatValue(sample.value)}`);
+      },
+    });
+  }
+
+  function render() {
+    const out = [];
+    metrics.forEach((metric) => {
+      out.push(`# HELP ${metric.name} ${metric.help}`);
+      out.push(`# TYPE ${metric.name} ${metric.type}`);
+      out.push(...metric.lines());
+    });
+    return `${out.join('\n')}\n`;
+  }
+
+  return {
+    counter,
+    histogram,
+    gauge: (name, help, collect) => collected(name, help, 'gauge', collect),
+    counterFrom: (name, help, collect) => collected(name, help, 'counter', collect),
+    render,
+  };
+}
+
+const registry = createRegistry();
+
+const httpRequests = registry.counter('gateway_http_requests_total', 'HTTP requests by route and status code.');
+const httpDuration = registry.histogram('gateway_http_request_duration_seconds', 'HTTP request latency by route.', REQUEST_BUCKETS);
+const verdicts = registry.counter('gateway_verdicts_total', 'Prompt verdicts by result.');
+const budgetExceeded = registry.counter('gateway_layer_budget_exceeded_total', 'Prompts blocked because a rule layer ran out of its time budget, by layer.');
+const nearDuplicates = registry.counter('gateway_near_duplicate_lookups_total', 'Near-duplicate lookups for verdict cache misses by outcome (reused, rescored, miss).');
+const layerDuration = registry.histogram('gateway_layer_duration_seconds', 'Detection layer latency for freshly scored prompts.', LAYER_BUCKETS);
+const scanTotals = { bytes: 0, seconds: 0 };
+registry.counterFrom('gateway_scanned_bytes_total', 'UTF-8 bytes of prompts scored by the detection layers (cache misses).', () => scanTotals.bytes);
+registry.counterFrom('gateway_analysis_seconds_total', 'Time spent in the detection layers (cache misses).', () => scanTotals.seconds);
+const ollamaDuration = registry.histogram('gateway_ollama_request_duration_seconds', 'Ollama upstream latency by mode (generate, stream).', OLLAMA_BUCKETS);
+const ollamaRequests = registry.counter('gateway_ollama_requests_total', 'Ollama upstream requests by mode and outcome (ok, error).');
+
+const eventLoopDelay = monitorEventLoopDelay({ resolution: 10 });
+eventLoopDelay.enable();
+registry.gauge('nodejs_eventloop_lag_seconds', 'Event loop delay quantiles since start.', () => (
+  [0.5, 0.9, 0.99].map((quantile) => ({
+    labels: { quantile },
+    value: eventLoopDelay.percentile(quantile * 100) / 1e9,
+  }))
+));
+registry.gauge('nodejs_eventloop_lag_max_seconds', 'Maximum event loop delay since start.', () => eventLoopDelay.max / 1e9);
+registry.gauge('process_heap_used_bytes', 'V8 heap in use.', () => process.memoryUsage().heapUsed);
+registry.gauge('process_heap_total_bytes', 'V8 heap allocated.', () => process.memoryUsage().heapTotal);
+registry.gauge('process_resident_memory_bytes', 'Resident set size.', () => process.memoryUsage().rss);
+registry.counterFrom('process_cpu_seconds_total', 'User + system CPU time.', () => {
+  const { user, system } = process.cpuUsage();
+  return (user + system) / 1e6;
+});
+registry.gauge('gateway_scan_throughput_bytes_per_second', 'Detection layer throughput: scanned bytes / analysis time.', () => scanThroughput());
+
+// Record one freshly scored prompt: `timings` (ns) as filled by analyzePrompt(prompt, timings)
+function observeAnalysis(bytes, timings) {
+  let total = 0;
+  Object.keys(timings).forEach((layer) => {
+    const seconds = timings[layer] / 1e9;
+    layerDuration.observe({ layer }, seconds);
+    total += seconds;
+  });
+  scanTotals.bytes += bytes;
+  scanTotals.seconds += total;
+}
+
+function scanThroughput() {
+  return scanTotals.seconds ? scanTotals.bytes / scanTotals.seconds : 0;
+}
+
+// Wraps an Ollama call so its latency and outcome are recorded
+async function timeOllama(mode, call) {
+  const start = process.hrtime.bigint();
+  try {
+    const result = await call();
+    ollamaRequests.inc({ mode, outcome: 'ok' });
+    return result;
+  } catch (err) {
+    ollamaRequests.inc({ mode, outcome: 'error' });
+    throw err;
+  } finally {
+    ollamaDuration.observe({ mode }, Number(process.hrtime.bigint() - start) / 1e9);
+  }
+}
+
+module.exports = {
+  createRegistry,
+  registry,
+  httpRequests,
+  httpDuration,
+  verdicts,
+  budgetExceeded,
+  nearDuplicates,
+  observeAnalysis,
+  scanThroughput,
+  timeOllama,
+};
@@ -0,0 +1,252 @@
+// ncd.js
+// Normalized Compression Distance (NCD) against a fixed reference corpus.
+//
+// computeNcd(sample, corpus) is the exact definition: it gzips the corpus and
+// the sample+corpus concatenation on every call, so its cost grows with the
+// corpus. createNcdEngine(corpus) precomputes C(corpus) once; by default it
+// still compresses the full sample+corpus concatenation per call (mode
+// 'exact', the scores every deployment was tuned on). Mode 'dictionary'
+// (NCD_MODE=dictionary) estimates C(sample + corpus) as C(corpus) +
+// C(sample | corpus) instead, compressing the sample with the corpus tail as
+// a preset deflate dictionary. Deflate can only look back 32KB, so that is
+// all the dictionary ever needs and per-prompt cost stays flat however large
+// the corpus grows, but ncdSafe / ncdUnsafe shift by a few hundredths.
+//
+// createNcdIndex(exemplars) (NCD_MODE=knn) compares the sample with individual
+// exemplars instead of one concatenated corpus: the distance is the mean NCD
+// to the `k` nearest exemplars. C(exemplar) and a bottom-k sketch of each
+// exemplar's byte 4-grams are computed once. Per prompt, an inverted index
+// over the sketch hashes ranks exemplars by shared n-grams, and the exact NCD
+// is only computed against the `candidates` best ranked, so the per-prompt
+// cost stays close to flat however many exemplars there are.
+//
+// Every function takes an optional `compressor` from compressors.js (gzip by
+// default); with brotli the dictionary mode is only an estimate, since
+// brotli can look back much further than the 32KB tail it is given.
+
+const { createCompressor } = require('./compressors');
+
+const WINDOW_SIZE = 32 * 1024;
+const SEPARATOR = Buffer.from('\n');
+// kNN defaults: n-gram length in bytes, hashes kept per sketch, exemplars
+// scored exactly per prompt, and neighbours averaged into the distance
+const NGRAM_BYTES = 4;
+const SKETCH_SIZE = 64;
+const NCD_CANDIDATES = 16;
+const NCD_NEIGHBOURS = 3;
+// Posting-list ids a prefilter lookup reads before settling for what it has
+const NCD_MAX_POSTINGS = 8192;
+
+const GZIP = createCompressor('gzip');
+
+function compressedLength(buffer, compressor = GZIP) {
+  return compressor.length(buffer);
+}
+
+function ncdFromLengths(cSample, cCorpus, cCombined) {
+  const numerator = cCombined - Math.min(cSample, cCorpus);
+  const denominator = Math.max(cSample, cCorpus);
+  if (!denominator) return 1;
+  return Number((numerator / denominator).toFixed(4));
+}
+
+function computeNcd(sample, corpus, compressor = GZIP) {
+  const sampleBuffer = Buffer.from(sample, 'utf-8');
+  const corpusBuffer = Buffer.from(corpus, 'utf-8');
+  if (!sampleBuffer.length || !corpusBuffer.length) {
+    return 1;
+  }
+  const cSample = compressor.length(sampleBuffer);
+  const cCorpus = compressor.length(corpusBuffer);
+  const cCombined = compressor.length(Buffer.concat([sampleBuffer, SEPARATOR, corpusBuffer]));
+  return ncdFromLengths(cSample, cCorpus, cCombined);
+}
+
+// Pass `compressedCorpusLength` when C(corpus) is already known (a baseline snapshot)
+function createNcdEngine(corpus, { mode = 'exact', compressedCorpusLength, compressor = GZIP } = {}) {
+  const corpusBuffer = Buffer.from(corpus, 'utf-8');
+  let cCorpus = compressedCorpusLength;
+  if (cCorpus === undefined) cCorpus = corpusBuffer.length ? compressor.length(corpusBuffer) : 0;
+  // Copy the window so only 32KB is handed to the compressor per call
+  const conditionalLength = mode !== 'dictionary'
+    ? null
+    : compressor.conditional(Buffer.from(corpusBuffer.subarray(Math.max(0, corpusBuffer.length - WINDOW_SIZE))));
+  const corpusBytes = corpusBuffer.length;
+
+  // `sample` may be a string or a Buffer; pass `cSample` when the caller
+  // already has C(sample) (analyzePrompt computes it for the entropy score).
+  function distance(sample, cSample) {
+    const sampleBuffer = Buffer.isBuffer(sample) ? sample : Buffer.from(sample, 'utf-8');
+    if (!sampleBuffer.length || !corpusBytes) {
+      return 1;
+    }
+    const sampleLength = cSample === undefined ? compressor.length(sampleBuffer) : cSample;
+    if (mode !== 'dictionary') {
+      const cCombined = compressor.length(Buffer.concat([sampleBuffer, SEPARATOR, corpusBuffer]));
+      return ncdFromLengths(sampleLength, cCorpus, cCombined);
+    }
+    const cConditional = conditionalLength(Buffer.concat([SEPARATOR, sampleBuffer]));
+    return ncdFromLengths(sampleLength, cCorpus, cCorpus + cConditional);
+  }
+
+  return {
+    mode,
+    distance,
+    corpusBytes,
+    compressedCorpusLength: cCorpus,
+  };
+}
+
+// FNV-1a over the n-gram's bytes, then the murmur3 finalizer so that the
+// smallest hashes are a uniform sample of the n-grams
+function ngramHash(buffer, start, end) {
+  let hash = 0x811c9dc5;
+  for (let i = start; i < end; i += 1) {
+    hash = Math.imul(hash ^ buffer[i], 0x01000193);
+  }
+  hash ^= hash >>> 16;
+  hash = Math.imul(hash, 0x85ebca6b);
+  hash ^= hash >>> 13;
+  hash = Math.imul(hash, 0xc2b2ae35);
+  hash ^= hash >>> 16;
+  return hash >>> 0;
+}
+
+// The `size` smallest distinct n-gram hashes of `buffer`, ascending. Two
+// texts' sketches share a hash only where they share that n-gram, and a
+// shared n-gram below both sketches' cut-offs is in both.
+function sketch(buffer, size = SKETCH_SIZE) {
+  if (!buffer.length) return [];
+  const hashes = new Set();
+  if (buffer.length <= NGRAM_BYTES) {
+    hashes.add(ngramHash(buffer, 0, buffer.length));
+  } else {
+    for (let i = 0; i + NGRAM_BYTES <= buffer.length; i += 1) {
+      hashes.add(ngramHash(buffer, i, i + NGRAM_BYTES));
+    }
+  }
+  return Array.from(hashes).sort((a, b) => a - b).slice(0, size);
+}
+
+// kNN NCD over `exemplars` (an array of strings; empty ones are ignored).
+// Pass the index being replaced as `previous` to reuse its per-exemplar
+// entries, and `compressedCorpusLength` to report it as createNcdEngine does.
+function createNcdIndex(exemplars, {
+  k = NCD_NEIGHBOURS,
+  candidates = NCD_CANDIDATES,
+  maxPostings = NCD_MAX_POSTINGS,
+  previous = null,
+  compressedCorpusLength,
+  compressor = GZIP,
+} = {}) {
+  const entries = [];
+  const byText = new Map();
+  const postings = new Map();
+  let corpusBytes = 0;
+  exemplars.forEach((text) => {
+    if (!text || byText.has(text)) return;
+    let entry = previous ? previous.entry(text) : undefined;
+    if (!entry) {
+      const buffer = Buffer.from(text, 'utf-8');
+      entry = { text, buffer, compressed: compressor.length(buffer), sketch: sketch(buffer) };
+    }
+    const id = entries.length;
+    entries.push(entry);
+    byText.set(text, entry);
+    corpusBytes += entry.buffer.length;
+    entry.sketch.forEach((hash) => {
+      const list = postings.get(hash);
+      if (list) list.push(id);
+      else postings.set(hash, [id]);
+    });
+  });
+  const shared = new Uint16Array(entries.length);
+
+  // Ids of up to `candidates` exemplars sharing the most sketch hashes with
+  // the sample; ties go to the exemplar reached first. Rare n-grams say the
+  // most about a neighbour, so posting lists are read shortest first and
+  // reading stops after `maxPostings` ids once there are enough candidates.
+  function rank(sampleBuffer) {
+    const lists = [];
+    sketch(sampleBuffer).forEach((hash) => {
+      const list = postings.get(hash);
+      if (list) lists.push(list);
+    });
+    lists.sort((a, b) => a.length - b.length);
+    const touched = [];
+    let read = 0;
+    for (let i = 0; i < lists.length; i += 1) {
+      if (read >= maxPostings && touched.length >= candidates) break;
+      const list = lists[i];
+      read += list.length;
+      for (let j = 0; j < list.length; j += 1) {
+        const id = list[j];
+        if (shared[id] === 0) touched.push(id);
+        shared[id] += 1;
+      }
+    }
+    const buckets = [];
+    touched.forEach((id) => {
+      (buckets[shared[id]] || (buckets[shared[id]] = [])).push(id);
+      shared[id] = 0;
+    });
+    const picked = [];
+    for (let count = buckets.length - 1; count > 0 && picked.length < candidates; count -= 1) {
+      const bucket = buckets[count] || [];
+      for (let i = 0; i < bucket.length && picked.length < candidates; i += 1) picked.push(bucket[i]);
+    }
+    return picked;
+  }
+
+  // Up to `k` nearest exemplars as { text, distance }, nearest first
+  function nearest(sample, cSample) {
+    const sampleBuffer = Buffer.isBuffer(sample) ? sample : Buffer.from(sample, 'utf-8');
+    if (!sampleBuffer.length) return [];
+    const sampleLength = cSample === undefined ? compressor.length(sampleBuffer) : cSample;
+    return rank(sampleBuffer)
+      .map((id) => {
+        const entry = entries[id];
+        const cCombined = compressor.length(Buffer.concat([sampleBuffer, SEPARATOR, entry.buffer]));
+        return { id, text: entry.text, distance: ncdFromLengths(sampleLength, entry.compressed, cCombined) };
+      })
+      .sort((a, b) => a.distance - b.distance || a.id - b.id)
+      .slice(0, k)
+      .map(({ text, distance }) => ({ text, distance }));
+  }
+
+  // Mean NCD to the k nearest exemplars; a neighbour the prefilter found
+  // nothing in common with counts as 1, the distance of unrelated texts
+  function distance(sample, cSample) {
+    const neighbours = Math.min(k, entries.length);
+    if (!neighbours) return 1;
+    const found = nearest(sample, cSample);
+    if (!found.length) return 1;
+    const total = found.reduce((sum, { distance: d }) => sum + d, neighbours - found.length);
+    return Number((total / neighbours).toFixed(4));
+  }
+
+  return {
+    mode: 'knn',
+    distance,
+    nearest,
+    entry: (text) => byText.get(text),
+    exemplars: entries.length,
+    corpusBytes,
+    compressedCorpusLength,
+  };
+}
+
+module.exports = {
+  NCD_CANDIDATES,
+  NCD_MAX_POSTINGS,
+  NCD_NEIGHBOURS,
+  NGRAM_BYTES,
+  SKETCH_SIZE,
+  WINDOW_SIZE,
+  compressedLength,
+  computeNcd,
+  createNcdEngine,
+  createNcdIndex,
+  ncdFromLengths,
+  sketch,
+};
@@ -0,0 +1,28 @@
+// ndjson.js
+// Line reader for Ollama's NDJSON stream (ollama.js). Chunks arrive however
+// TCP cut them, so a UTF-8 character can be split across two chunks; the
+// StringDecoder holds the incomplete bytes back until the rest arrives
+// instead of decoding each half to U+FFFD.
+
+const { StringDecoder } = require('string_decoder');
+
+// Calls onLine(line) for every newline-terminated line of `chunks` (an async
+// iterable of Buffers or strings), then once for whatever follows the last newline
+async function forEachLine(chunks, onLine) {
+  const decoder = new StringDecoder('utf8');
+  let pending = '';
+  for await (const data of chunks) {
+    pending += typeof data === 'string' ? data : decoder.write(data);
+    let newline = pending.indexOf('\n');
+    while (newline > -1) {
+      onLine(pending.slice(0, newline));
+      pending = pending.slice(newline + 1);
+      newline = pending.indexOf('\n');
+    }
+  }
+  onLine(pending + decoder.end());
+}
+
+module.exports = {
+  forEachLine,
+};
@@ -0,0 +1,211 @@
+// nearDuplicates.js
+// Bounded index of recently analyzed prompts for near-duplicate lookups
+// (NEAR_DUPLICATES=1 in server.js): prompts that differ from an analyzed one
+// by a word or some whitespace miss the exact-hash verdict cache, but can
+// reuse the analyzed prompt's verdict.
+//
+// Each prompt is lowercased with its whitespace collapsed, cut into
+// overlapping `SHINGLE_CHARS`-char shingles, and summarized by a MinHash
+// signature of `bands * rows` values: the share of equal values between two
+// signatures estimates the Jaccard similarity of their shingle sets. Banded
+// LSH finds the candidates: a prompt is filed under one key per band of
+// `rows` values, and a lookup only compares signatures with the prompts that
+// share at least one band key (with 16 bands of 4 rows, pairs at 0.9
+// similarity share a band with probability ~1, pairs at 0.3 with ~0.13).
+// The best candidate at or above `threshold` wins.
+//
+// Memory is bounded by `maxEntries` (the oldest entry is evicted first) and
+// entries expire `ttlMs` after they were added. Prompts over `maxChars` are
+// neither indexed nor looked up, so a lookup costs O(maxChars * bands * rows).
+// setVersion() drops every entry, and add() drops values computed under an
+// older version, like the verdict cache.
+
+const SHINGLE_CHARS = 5;
+
+// murmur3's 32-bit finalizer
+function mix(value) {
+  let hash = value;
+  hash ^= hash >>> 16;
+  hash = Math.imul(hash, 0x85ebca6b);
+  hash ^= hash >>> 13;
+  hash = Math.imul(hash, 0xc2b2ae35);
+  hash ^= hash >>> 16;
+  return hash >>> 0;
+}
+
+function normalize(prompt) {
+  return prompt.trim().toLowerCase().replace(/\s+/g, ' ');
+}
+
+// FNV-1a over the UTF-16 code units of every shingle, deduplicated
+function shingleHashes(text) {
+  const hashes = new Set();
+  const last = Math.max(0, text.length - SHINGLE_CHARS);
+  for (let start = 0; start <= last; start += 1) {
+    let hash = 0x811c9dc5;
+    const end = Math.min(text.length, start + SHINGLE_CHARS);
+    for (let i = start; i < end; i += 1) hash = Math.imul(hash ^ text.charCodeAt(i), 0x01000193);
+    hashes.add(hash >>> 0);
+  }
+  return hashes;
+}
+
+function createNearDuplicateIndex({
+  threshold = 0.9,
+  bands = 16,
+  rows = 4,
+  maxEntries = 10000,
+  ttlMs = 10 * 60 * 1000,
+  maxChars = 4096,
+  version = null,
+} = {}) {
+  const size = bands * rows;
+  const seeds = Array.from({ length: size }, (_, i) => mix(Math.imul(i + 1, 0x9e3779b9)));
+  // Insertion order is age order: the first entry is the oldest
+  const entries = new Map(); // id -> { signature, keys, value, expiresAt }
+  const buckets = new Map(); // band key -> Set of ids
+  let nextId = 0;
+  let currentVersion = version;
+  const counters = {
+    hits: 0,
+    misses: 0,
+    evictions: 0,
+    expirations: 0,
+    invalidations: 0,
+    stale: 0,
+  };
+
+  function signatureOf(prompt) {
+    const signature = new Uint32Array(size).fill(0xffffffff);
+    shingleHashes(normalize(prompt)).forEach((hash) => {
+      for (let i = 0; i < size; i += 1) {
+        const value = mix(hash ^ seeds[i]);
+        if (value < signature[i]) signature[i] = value;
+      }
+    });
+    return signature;
+  }
+
+  function bandKeys(signature) {
+    const keys = new Array(bands);
+    for (let band = 0; band < bands; band += 1) {
+      keys[band] = `${band}:${signature.subarray(band * rows, (band + 1) * rows).join(',')}`;
+    }
+    return keys;
+  }
+
+  function similarity(a, b) {
+    let equal = 0;
+    for (let i = 0; i < size; i += 1) if (a[i] === b[i]) equal += 1;
+    return equal / size;
+  }
+
+  function remove(id) {
+    const entry = entries.get(id);
+    entries.delete(id);
+    entry.keys.forEach((key) => {
+      const ids = buckets.get(key);
+      ids.delete(id);
+      if (!ids.size) buckets.delete(key);
+    });
+  }
+
+  function evictExpired(now) {
+    for (const [id, entry] of entries) {
+      if (entry.expiresAt > now) break;
+      remove(id);
+      counters.expirations += 1;
+    }
+  }
+
+  // Files `value` (the analysis of `prompt`) under the prompt's band keys
+  function add(prompt, value, computedUnder = currentVersion) {
+    if (!maxEntries || prompt.length > maxChars) return;
+    if (computedUnder !== currentVersion) {
+      counters.stale += 1;
+      return;
+    }
+    const now = Date.now();
+    evictExpired(now);
+    const signature = signatureOf(prompt);
+    const keys = bandKeys(signature);
+    const id = nextId;
+    nextId += 1;
+    entries.set(id, { signature, keys, value, expiresAt: now + ttlMs });
+    keys.forEach((key) => {
+      const ids = buckets.get(key);
+      if (ids) ids.add(id);
+      else buckets.set(key, new Set([id]));
+    });
+    while (entries.size > maxEntries) {
+      remove(entries.keys().next().value);
+      counters.evictions += 1;
+    }
+  }
+
+  // { value, similarity } of the most similar indexed prompt at or above the
+  // threshold, or undefined
+  function find(prompt) {
+    if (!maxEntries || prompt.length > maxChars) return undefined;
+    evictExpired(Date.now());
+    const signature = signatureOf(prompt);
+    const seen = new Set();
+    let best;
+    bandKeys(signature).forEach((key) => {
+      const ids = buckets.get(key);
+      if (!ids) return;
+      ids.forEach((id) => {
+        if (seen.has(id)) return;
+        seen.add(id);
+        const entry = entries.get(id);
+        const score = similarity(signature, entry.signature);
+        if (score >= threshold && (!best || score > best.similarity)) {
+          best = { value: entry.value, similarity: score };
+        }
+      });
+    });
+    if (best) counters.hits += 1;
+    else counters.misses += 1;
+    return best;
+  }
+
+  function clear() {
+    entries.clear();
+    buckets.clear();
+  }
+
+  function setVersion(nextVersion) {
+    if (nextVersion === currentVersion) return false;
+    currentVersion = nextVersion;
+    if (entries.size) counters.invalidations += 1;
+    clear();
+    return true;
+  }
+
+  function stats() {
+    const lookups = counters.hits + counters.misses;
+    return {
+      ...counters,
+      size: entries.size,
+      maxEntries,
+      ttlMs,
+      threshold,
+      bands,
+      rows,
+      version: currentVersion,
+      hitRate: lookups ? Number((counters.hits / lookups).toFixed(4)) : 0,
+    };
+  }
+
+  return {
+    add,
+    find,
+    clear,
+    setVersion,
+    stats,
+  };
+}
+
+module.exports = {
+  createNearDuplicateIndex,
+};
@@ -0,0 +1,110 @@
+// ollama.js
+// Pooled client for the Ollama backend.
+//
+// OLLAMA_URL / OLLAMA_MODEL are read once at startup and every request goes
+// through one axios instance backed by keep-alive agents, so bursts of SAFE
+// prompts reuse sockets instead of opening a connection each. generate() is
+// single-flight: concurrent calls for the same model + prompt share one
+// upstream generation and all resolve to its answer. Streaming requests are
+// per client and are never coalesced.
+
+const http = require('http');
+const https = require('https');
+const axios = require('axios');
+const { timeOllama } = require('./metrics');
+const { forEachLine } = require('./ndjson');
+
+const OLLAMA_URL = process.env.OLLAMA_URL || 'http://127.0.0.1:11434';
+const OLLAMA_MODEL = process.env.OLLAMA_MODEL || 'llama2';
+const OLLAMA_MAX_SOCKETS = Number(process.env.OLLAMA_MAX_SOCKETS) || 16;
+
+const agentOptions = {
+  keepAlive: true,
+  maxSockets: OLLAMA_MAX_SOCKETS,
+  maxFreeSockets: OLLAMA_MAX_SOCKETS,
+};
+const httpAgent = new http.Agent(agentOptions);
+const httpsAgent = new https.Agent(agentOptions);
+
+const client = axios.create({
+  baseURL: OLLAMA_URL,
+  httpAgent,
+  httpsAgent,
+  family: 4,
+});
+
+const inFlight = new Map();
+const counters = {
+  requests: 0,
+  upstream: 0,
+  coalesced: 0,
+};
+
+async function requestGeneration(prompt, model, timeout) {
+  counters.upstream += 1;
+  const response = await timeOllama('generate', () => client.post('/api/generate', {
+    model: model,
+    prompt: prompt,
+    stream: false
+  }, { timeout }));
+  return response.data.response || '';
+}
+
+function generate(prompt, { model = OLLAMA_MODEL, timeout = 30000 } = {}) {
+  counters.requests += 1;
+  const key = `${model}\u0000${prompt}`;
+  const pending = inFlight.get(key);
+  if (pending) {
+    counters.coalesced += 1;
+    return pending;
+  }
+  const request = requestGeneration(prompt, model, timeout)
+    .finally(() => inFlight.delete(key));
+  inFlight.set(key, request);
+  return request;
+}
+
+// Streams Ollama's NDJSON output, calling onToken(text) per chunk; resolves to the full answer.
+// Aborting `signal` (client went away) stops the upstream generation.
+function generateStream(prompt, onToken, options = {}) {
+  counters.requests += 1;
+  counters.upstream += 1;
+  // Timed until the last token, not just the response headers
+  return timeOllama('stream', () => relayStream(prompt, onToken, options));
+}
+
+async function relayStream(prompt, onToken, { model = OLLAMA_MODEL, timeout = 30000, signal }) {
+  const response = await client.post('/api/generate', {
+    model: model,
+    prompt: prompt,
+    stream: true
+  }, { timeout, responseType: 'stream', signal });
+
+  let answer = '';
+  await forEachLine(response.data, (line) => {
+    if (!line.trim()) return;
+    const chunk = JSON.parse(line);
+    if (chunk.error) throw new Error(chunk.error);
+    if (chunk.response) {
+      answer += chunk.response;
+      onToken(chunk.response);
+    }
+  });
+  return answer;
+}
+
+function stats() {
+  return {
+    ...counters,
+    inFlight: inFlight.size,
+    maxSockets: OLLAMA_MAX_SOCKETS,
+  };
+}
+
+module.exports = {
+  OLLAMA_URL,
+  OLLAMA_MODEL,
+  generate,
+  generateStream,
+  stats,
+};
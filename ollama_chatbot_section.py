@@ -24,6 +24,56 @@ def chat_with_ollama(prompt, model="llama2"):
     except Exception as e:
         return f"Error: {str(e)}"
 
+def stream_ollama(prompt, model="llama2"):
+    """Yield Ollama's response tokens as they are generated"""
+    with requests.post('http://localhost:11434/api/generate',
+        json={
+            "model": model,
+            "prompt": prompt,
+            "stream": True
+        },
+        stream=True,
+        timeout=30
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get('response'):
+                yield chunk['response']
+            if chunk.get('done'):
+                break
+
+def stream_prompt(prompt, url='http://localhost:3001/analyze/stream'):
+    """Yield gateway events: 'verdict' first, then 'token' events for SAFE prompts, then 'done'"""
+    with requests.post(url, json={"prompt": prompt}, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+def chat_with_gateway_stream(prompt):
+    """Print the verdict immediately, then the LLM answer token by token"""
+    is_safe = False
+    answer = ''
+    for event in stream_prompt(prompt):
+        if event['type'] == 'verdict':
+            is_safe = event['result'] == 'SAFE'
+            if is_safe:
+                print("✅ Prompt is SAFE - streaming response:")
+                print("🤖 Bot: ", end='', flush=True)
+        elif event['type'] == 'token':
+            answer += event['text']
+            print(event['text'], end='', flush=True)
+        elif event['type'] == 'error':
+            print(f"\n❌ {event['message']}", end='')
+        elif event['type'] == 'done':
+            answer = event.get('llmResponse') or answer
+    if is_safe:
+        print("\n")
+    return is_safe, answer
+
 def check_prompt_safety(prompt):
     """Check prompt safety using the gateway API"""
     try:
@@ -52,17 +102,13 @@ def safe_prompt_chatbot():
             print("👋 Goodbye!")
             break
             
-        is_safe, llm_response = check_prompt_safety(user_prompt)
+        try:
+            is_safe, _ = chat_with_gateway_stream(user_prompt)
+        except Exception as e:
+            print(f"Error checking safety: {e}")
+            is_safe = False
         
-        if is_safe:
-            if llm_response:
-                print("✅ Prompt is SAFE - LLM Response:")
-                print(f"🤖 Bot: {llm_response}\n")
-            else:
-                print("✅ Prompt is SAFE - Getting Ollama response...")
-                ollama_response = chat_with_ollama(user_prompt)
-                print(f"🤖 Bot: {ollama_response}\n")
-        else:
+        if not is_safe:
             print("🚫 Prompt is UNSAFE - Blocked for security")
             print("🛡️ Please try a different, safer prompt.\n")
 
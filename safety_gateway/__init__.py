@@ -0,0 +1,35 @@
+"""
+In-process Python port of the LLM Safety Gateway detection pipeline.
+
+Mirrors analyzePrompt() in server.js so Python tooling can score prompts
+without an HTTP round trip per prompt.
+"""
+
+from .engine import GatewayEngine, analyze_prompt, get_engine
+from .layers import (
+    analyze_context,
+    compute_deviation,
+    compute_entropy_score,
+    compute_feature_vector,
+    compute_threat_score,
+    detect_obfuscation,
+    detect_role_inversion,
+    get_confidence_level,
+)
+from .ncd import NcdEngine, compute_ncd
+
+__all__ = [
+    'GatewayEngine',
+    'analyze_prompt',
+    'get_engine',
+    'NcdEngine',
+    'analyze_context',
+    'compute_deviation',
+    'compute_entropy_score',
+    'compute_feature_vector',
+    'compute_ncd',
+    'compute_threat_score',
+    'detect_obfuscation',
+    'detect_role_inversion',
+    'get_confidence_level',
+]
@@ -0,0 +1,228 @@
+"""
+JavaScript compatibility helpers.
+
+server.js runs on V8, so string lengths are UTF-16 code units, `\\s` and
+`.trim()` use the ECMAScript whitespace set, and numbers are rounded and
+printed with `toFixed` / `Number#toString` semantics. These helpers let the
+Python engine reproduce those results exactly.
+"""
+
+import math
+import re
+import struct
+from decimal import Decimal, ROUND_HALF_UP
+
+# WhiteSpace + LineTerminator as defined by ECMAScript (used by \s and trim)
+JS_WHITESPACE = (
+    '\t\n\x0b\x0c\r \xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005'
+    '\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000\ufeff'
+)
+_WS_CLASS_BODY = (
+    '\\t\\n\\x0b\\x0c\\r \\xa0\\u1680\\u2000-\\u200a'
+    '\\u2028\\u2029\\u202f\\u205f\\u3000\\ufeff'
+)
+# `.` in a non-dotAll JS regex excludes every line terminator, not just \n
+_DOT_CLASS = '[^\\n\\r\\u2028\\u2029]'
+
+
+def translate_regex(source):
+    """Rewrite a JS regex source so Python `re` (with re.ASCII) matches identically."""
+    out = []
+    in_class = False
+    i = 0
+    while i < len(source):
+        ch = source[i]
+        if ch == '\\' and i + 1 < len(source):
+            nxt = source[i + 1]
+            if nxt == 's':
+                out.append(_WS_CLASS_BODY if in_class else f'[{_WS_CLASS_BODY}]')
+            elif nxt == 'S' and not in_class:
+                out.append(f'[^{_WS_CLASS_BODY}]')
+            else:
+                out.append(source[i:i + 2])
+            i += 2
+            continue
+        if in_class:
+            if ch == ']':
+                in_class = False
+        elif ch == '[':
+            in_class = True
+        elif ch == '.':
+            out.append(_DOT_CLASS)
+            i += 1
+            continue
+        elif ch == '$':
+            # JS `$` never matches before a trailing newline
+            out.append('\\Z')
+            i += 1
+            continue
+        out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def compile_js(source, ignore_case=False):
+    """Compile a JS regex source (non-unicode mode) as an equivalent Python pattern."""
+    flags = re.ASCII | (re.IGNORECASE if ignore_case else 0)
+    return re.compile(translate_regex(source), flags)
+
+
+def js_string(text):
+    """Return `text` as V8 sees it: astral characters split into surrogate pairs."""
+    if text.isascii() or max(text) < '\U00010000':
+        return text
+    units = []
+    for ch in text:
+        code = ord(ch)
+        if code > 0xFFFF:
+            code -= 0x10000
+            units.append(chr(0xD800 + (code >> 10)))
+            units.append(chr(0xDC00 + (code & 0x3FF)))
+        else:
+            units.append(ch)
+    return ''.join(units)
+
+
+def utf8_bytes(js_text):
+    """Encode a UTF-16 view string the way `Buffer.from(text, 'utf-8')` does."""
+    try:
+        return js_text.encode('utf-8')
+    except UnicodeEncodeError:
+        # Re-pair surrogates; lone halves become U+FFFD like in Node
+        raw = js_text.encode('utf-16-le', 'surrogatepass')
+        return raw.decode('utf-16-le', 'replace').encode('utf-8')
+
+
+def py_string(js_text):
+    """Whole code points again from a UTF-16 view string (lone surrogates become U+FFFD)."""
+    if js_text.isascii():
+        return js_text
+    return js_text.encode('utf-16-le', 'surrogatepass').decode('utf-16-le', 'replace')
+
+
+def js_trim(text):
+    return text.strip(JS_WHITESPACE)
+
+
+def js_lower(js_text):
+    """`String#toLowerCase` on a UTF-16 view string."""
+    if js_text.isascii():
+        return js_text.lower()
+    raw = js_text.encode('utf-16-le', 'surrogatepass')
+    return js_string(raw.decode('utf-16-le', 'surrogatepass').lower())
+
+
+def js_round(value):
+    """`Math.round`: nearest integer, ties towards +Infinity."""
+    floor = math.floor(value)
+    return floor + 1 if value - floor >= 0.5 else floor
+
+
+# fdlibm e_exp.c constants (V8's base::ieee754::exp)
+_EXP_O_THRESHOLD = 7.09782712893383973096e+02
+_EXP_U_THRESHOLD = -7.45133219101941108420e+02
+_EXP_LN2_HI = (6.93147180369123816490e-01, -6.93147180369123816490e-01)
+_EXP_LN2_LO = (1.90821492927058770002e-10, -1.90821492927058770002e-10)
+_EXP_INV_LN2 = 1.44269504088896338700e+00
+_EXP_P = (1.66666666666666019037e-01, -2.77777777770155933842e-03, 6.61375632143793436117e-05,
+          -1.65339022054652515390e-06, 4.13813679705723846039e-08)
+_EXP_TWOM1000 = 9.33263618503218878990e-302
+
+
+def _from_high_word(high):
+    return struct.unpack('<d', struct.pack('<Q', (high & 0xffffffff) << 32))[0]
+
+
+def js_exp(x):
+    """`Math.exp`: V8 computes it with fdlibm, which can differ from the C library in the last bit."""
+    high = struct.unpack('<Q', struct.pack('<d', x))[0] >> 32
+    sign = high >> 31
+    high &= 0x7fffffff
+    if high >= 0x40862E42:  # |x| >= 709.78 or not finite
+        if x != x or x == math.inf:
+            return x
+        if x == -math.inf:
+            return 0.0
+        if x > _EXP_O_THRESHOLD:
+            return math.inf
+        if x < _EXP_U_THRESHOLD:
+            return 0.0
+    k = 0
+    hi = lo = 0.0
+    if high > 0x3fd62e42:  # |x| > 0.5 ln2: reduce to x - k ln2
+        if high < 0x3FF0A2B2:  # and |x| < 1.5 ln2
+            if x == 1.0:
+                return math.e
+            hi = x - _EXP_LN2_HI[sign]
+            lo = _EXP_LN2_LO[sign]
+            k = 1 - sign - sign
+        else:
+            k = int(_EXP_INV_LN2 * x + (-0.5 if sign else 0.5))
+            hi = x - k * _EXP_LN2_HI[0]
+            lo = k * _EXP_LN2_LO[0]
+        x = hi - lo
+    elif high < 0x3e300000:  # |x| < 2**-28
+        return 1.0 + x
+    p1, p2, p3, p4, p5 = _EXP_P
+    t = x * x
+    c = x - t * (p1 + t * (p2 + t * (p3 + t * (p4 + t * p5))))
+    if k == 0:
+        return 1.0 - ((x * c) / (c - 2.0) - x)
+    y = 1.0 - ((lo - (x * c) / (2.0 - c)) - hi)
+    if k >= -1021:
+        if k == 1024:
+            return y * 2.0 * 2.0 ** 1023
+        return y * _from_high_word(0x3ff00000 + (k << 20))
+    return y * _from_high_word(0x3ff00000 + ((k + 1000) << 20)) * _EXP_TWOM1000
+
+
+def to_fixed(value, digits):
+    """`Number#toFixed(digits)` as a string (exact decimal value, ties away from zero)."""
+    if value != value:
+        return 'NaN'
+    if value == 0:
+        value = 0.0
+    if abs(value) >= 1e21:
+        return number_to_string(value)
+    quantum = Decimal(1).scaleb(-digits)
+    return str(Decimal(value).quantize(quantum, rounding=ROUND_HALF_UP))
+
+
+def fixed(value, digits):
+    """`Number(value.toFixed(digits))`."""
+    return float(to_fixed(value, digits))
+
+
+def number_to_string(value):
+    """`String(number)` following the ECMAScript Number::toString algorithm."""
+    if value != value:
+        return 'NaN'
+    if value == 0:
+        return '0'
+    if math.isinf(value):
+        return 'Infinity' if value > 0 else '-Infinity'
+    if value < 0:
+        return '-' + number_to_string(-value)
+    # repr() yields the same shortest round-trip digits V8 uses
+    sign, digit_tuple, exponent = Decimal(repr(value)).normalize().as_tuple()
+    digits = ''.join(str(d) for d in digit_tuple)
+    k = len(digits)
+    n = exponent + k
+    if k <= n <= 21:
+        return digits + '0' * (n - k)
+    if 0 < n <= 21:
+        return f'{digits[:n]}.{digits[n:]}'
+    if -6 < n <= 0:
+        return f"0.{'0' * -n}{digits}"
+    exp = n - 1
+    exp_str = f"e{'+' if exp >= 0 else '-'}{abs(exp)}"
+    if k == 1:
+        return digits + exp_str
+    return f'{digits[0]}.{digits[1:]}{exp_str}'
+
+
+def js_str(value):
+    """Template-literal interpolation of an int/float."""
+    if isinstance(value, int):
+        return str(value)
+    return number_to_string(value)
@@ -0,0 +1,186 @@
+"""
+Baseline statistics and the snapshot file, mirroring detector.js and snapshot.js.
+`python3 -m safety_gateway.build_baselines` writes the snapshot.
+
+The snapshot holds everything derived from the datasets: entropy stats, safe
+feature stats, the NCD corpora and their compressed lengths. It also holds
+the SHA-256, size and mtime of each dataset file, so server.js and
+GatewayEngine only load it while those files are unchanged. Loading only
+stats the files and hashes the ones whose size or mtime changed. Both sides read and write the same
+format. Snapshots written here carry CPython's zlib lengths, which can
+differ by a byte from Node's (see test_python_parity.py); build with
+`npm run baselines` when the server must match a fresh Node computation
+exactly.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+from ._js import js_string, utf8_bytes
+from .datasets import DATA_FILES, REPO_ROOT, iter_labeled_rows
+from .compressors import get_compressor
+from .layers import RunningStats, compute_entropy_score, compute_feature_vector
+
+# Bump together with SNAPSHOT_FORMAT in snapshot.js
+SNAPSHOT_FORMAT = 1
+# Rows per label that make up each NCD reference corpus (the exemplars when NCD_MODE=knn)
+NCD_CORPUS_ROWS = int(os.environ.get('NCD_CORPUS_ROWS') or 100)
+# BASELINE_SNAPSHOT= (empty) always recomputes, as in detector.js
+BASELINE_SNAPSHOT = os.environ.get('BASELINE_SNAPSHOT', os.path.join(REPO_ROOT, 'baselines.snapshot.json'))
+# Baselines learned by the server's POST /feedback, preferred over the snapshot;
+# only with FEEDBACK=1, as in detector.js
+FEEDBACK_CHECKPOINT = (
+    os.environ.get('FEEDBACK_CHECKPOINT', os.path.join(REPO_ROOT, 'feedback.checkpoint.json'))
+    if os.environ.get('FEEDBACK') == '1' else ''
+)
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def compute_baselines(data_files=None, compressor=None):
+    """Stream the datasets once, like computeBaselines() in detector.js."""
+    compressor = compressor or get_compressor()
+    entropy = {'safe': RunningStats(), 'unsafe': RunningStats()}
+    corpus_rows = {'safe': [], 'unsafe': []}
+    feature_stats = None
+    for file_path in (data_files or DATA_FILES).values():
+        for row in iter_labeled_rows(file_path):
+            text, label = row['text'], row['label']
+            entropy[label].add(compute_entropy_score(text, compressor))
+            if len(corpus_rows[label]) < NCD_CORPUS_ROWS:
+                corpus_rows[label].append(text)
+            if label != 'safe':
+                continue
+            vector = compute_feature_vector(text)
+            if feature_stats is None:
+                feature_stats = {key: RunningStats() for key in vector}
+            for key, value in vector.items():
+                feature_stats[key].add(value)
+
+    corpora = {label: '\n'.join(texts) for label, texts in corpus_rows.items()}
+    return {
+        'rows': {label: stats.count for label, stats in entropy.items()},
+        'safeEntropyStats': entropy['safe'].summary(),
+        'unsafeEntropyStats': entropy['unsafe'].summary(),
+        'safeFeatureStats': {key: stats.summary() for key, stats in (feature_stats or {}).items()},
+        'safeCorpus': corpora['safe'],
+        'unsafeCorpus': corpora['unsafe'],
+        'compressedCorpusLength': {
+            label: compressor.length(utf8_bytes(corpus)) if corpus else 0
+            for label, corpus in corpora.items()
+        },
+    }
+
+
+def file_stat(file_path):
+    """Size and mtime (ns, as a string, as snapshot.js records it)."""
+    stat = os.stat(file_path)
+    return {'bytes': stat.st_size, 'mtimeNs': str(stat.st_mtime_ns)}
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(file_path, 'rb') as handle:
+        mtime_ns = str(os.fstat(handle.fileno()).st_mtime_ns)
+        for chunk in iter(lambda: handle.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return {'sha256': digest.hexdigest(), 'bytes': size, 'mtimeNs': mtime_ns}
+
+
+def describe_sources(data_files=None, compressor=None, digests=True):
+    """What a snapshot has to have been built from to be usable now.
+
+    With digests=False the files are only stat'ed ({path, bytes, mtimeNs}), and
+    read_snapshot() hashes the ones whose size or mtime differ from the snapshot.
+    """
+    files = {
+        key: file_digest(path) if digests else {'path': path, **file_stat(path)}
+        for key, path in (data_files or DATA_FILES).items()
+    }
+    return {'ncdCorpusRows': NCD_CORPUS_ROWS, 'compressor': (compressor or get_compressor()).name, 'files': files}
+
+
+def _current_digest(expected, built):
+    """Digest of an expected file, hashing it only if it was touched since `built`."""
+    if expected.get('sha256'):
+        return expected
+    if (built.get('sha256') and built.get('bytes') == expected['bytes']
+            and built.get('mtimeNs') == expected['mtimeNs']):
+        return {'sha256': built['sha256'], 'bytes': expected['bytes'], 'mtimeNs': expected['mtimeNs']}
+    return file_digest(expected['path'])
+
+
+def write_snapshot(path, baselines, source):
+    snapshot = {
+        'format': SNAPSHOT_FORMAT,
+        'producer': f'python {sys.version.split()[0]}',
+        'createdAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'source': source,
+        'baselines': baselines,
+    }
+    # Write then rename so a starting server never reads a half-written file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        json.dump(snapshot, handle)
+    os.replace(tmp_path, path)
+    return snapshot
+
+
+def read_snapshot(path, expected_source):
+    """(snapshot, None) when usable, otherwise (None, reason).
+
+    A usable snapshot's 'source' describes the files as they are now, digests included.
+    """
+    try:
+        with open(path, encoding='utf-8') as handle:
+            snapshot = json.load(handle)
+    except FileNotFoundError:
+        return None, 'missing'
+    except (OSError, ValueError) as error:
+        return None, f'unreadable: {error}'
+    source = snapshot.get('source')
+    if snapshot.get('format') != SNAPSHOT_FORMAT or not source:
+        return None, f"format {snapshot.get('format')}, expected {SNAPSHOT_FORMAT}"
+    if source.get('ncdCorpusRows') != expected_source['ncdCorpusRows']:
+        return None, (f"built with {source.get('ncdCorpusRows')} NCD corpus rows, "
+                      f"expected {expected_source['ncdCorpusRows']}")
+    # Snapshots from before the compressor was recorded were built with gzip
+    built_compressor = source.get('compressor') or 'gzip'
+    if built_compressor != expected_source['compressor']:
+        return None, f"built with the {built_compressor} compressor, expected {expected_source['compressor']}"
+    built_files = source.get('files') or {}
+    files = {
+        key: _current_digest(expected, built_files.get(key) or {})
+        for key, expected in expected_source['files'].items()
+    }
+    changed = [key for key, digest in files.items() if (built_files.get(key) or {}).get('sha256') != digest['sha256']]
+    if changed:
+        return None, f"{', '.join(changed)} dataset changed since the snapshot was built"
+    snapshot['source'] = {**source, 'files': files}
+    baselines = snapshot['baselines']
+    # JSON gives whole code points; the engine works on the UTF-16 view
+    baselines['safeCorpus'] = js_string(baselines['safeCorpus'])
+    baselines['unsafeCorpus'] = js_string(baselines['unsafeCorpus'])
+    return snapshot, None
+
+
+def load_baselines(data_files=None, snapshot_path=BASELINE_SNAPSHOT, compressor=None,
+                   checkpoint_path=FEEDBACK_CHECKPOINT):
+    """Baselines from the feedback checkpoint or the snapshot when it matches the
+    datasets, else computed; with their origin ('checkpoint', 'snapshot' or 'datasets')."""
+    expected_source = None
+    for path, origin in ((checkpoint_path, 'checkpoint'), (snapshot_path, 'snapshot')):
+        if not path:
+            continue
+        expected_source = expected_source or describe_sources(data_files, compressor, digests=False)
+        snapshot, reason = read_snapshot(path, expected_source)
+        if snapshot:
+            return snapshot['baselines'], origin
+        if reason != 'missing':
+            print(f'[Baselines] Not using {path} ({reason})', file=sys.stderr)
+    return compute_baselines(data_files, compressor), 'datasets'
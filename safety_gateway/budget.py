@@ -0,0 +1,112 @@
+"""
+Bounded-cost analysis for long prompts, mirroring budget.js.
+
+split_windows() and sample_windows() cut and sample a prompt exactly as
+budget.js does, so long prompts get the same verdicts from both engines.
+Bounded rules run window by window, rules with an unbounded quantifier on the
+whole prompt, and NCD/LDF/ML read the sample once a prompt passes
+SAMPLE_CHARS.
+
+CPython cannot interrupt a running `re` search, so a Budget only checks the
+clock before and after each regex. A backtracking-prone rule on a hostile
+prompt runs to completion here and only then counts as over budget, whereas
+budget.js stops it with a vm timeout.
+"""
+
+import os
+import re
+import time
+
+# Same defaults as detector.js; LAYER_BUDGET_MS= (empty) disables the budget
+WINDOW_CHARS = 4096
+WINDOW_OVERLAP = 512
+SAMPLE_CHARS = 16384
+_LAYER_BUDGET = os.environ.get('LAYER_BUDGET_MS', '250')
+LAYER_BUDGET_MS = float(_LAYER_BUDGET) if _LAYER_BUDGET else None
+
+_UNBOUNDED_RE = re.compile(r'[*+]|\{\d+,\}')
+_unbounded = {}
+
+
+def _is_word(text, index):
+    code = ord(text[index])
+    return 48 <= code <= 57 or 65 <= code <= 90 or 97 <= code <= 122 or code == 95
+
+
+def split_windows(text, size=WINDOW_CHARS, overlap=WINDOW_OVERLAP):
+    """Overlapping windows of a UTF-16 view string, cut next to non-word characters."""
+    if len(text) <= size:
+        return [text]
+    windows = []
+    start = 0
+    while True:
+        if len(text) - start <= size:
+            windows.append(text[start:])
+            return windows
+        end = start + size
+        while end > start + 2 * overlap and _is_word(text, end):
+            end -= 1
+        if _is_word(text, end):
+            end = start + size
+            while end < len(text) and _is_word(text, end):
+                end += 1
+        windows.append(text[start:end])
+        if end >= len(text):
+            return windows
+        following = end - overlap
+        while following > start + 1 and _is_word(text, following - 1):
+            following -= 1
+        start = following if following > start + 1 else end - overlap
+
+
+def sample_windows(windows, count, size):
+    """`count` evenly spaced windows (first and last included), each cut to `size` chars."""
+    if len(windows) <= count:
+        picked = windows
+    else:
+        # Math.round: halves round up
+        picked = [windows[int((i * (len(windows) - 1)) / (count - 1) + 0.5)] for i in range(count)]
+    return '\n'.join(window[:size] for window in picked)
+
+
+def has_unbounded_quantifier(pattern):
+    """`*`, `+` or `{n,}` outside escapes and character classes."""
+    unbounded = _unbounded.get(pattern.pattern)
+    if unbounded is None:
+        view = re.sub(r'\[[^\]]*\]', 'c', re.sub(r'\\.', 'e', pattern.pattern, flags=re.S))
+        unbounded = _unbounded[pattern.pattern] = bool(_UNBOUNDED_RE.search(view))
+    return unbounded
+
+
+class Budget:
+    """Wall time one rule layer may spend; test() returns None once it is spent."""
+
+    def __init__(self, ms=LAYER_BUDGET_MS):
+        self.ms = ms
+        self.started = time.perf_counter()
+        self.exceeded = False
+
+    def _spent(self):
+        return (time.perf_counter() - self.started) * 1000 >= self.ms
+
+    def test(self, pattern, text):
+        if self.ms is None:
+            return pattern.search(text) is not None
+        if self.exceeded or self._spent():
+            self.exceeded = True
+            return None
+        matched = pattern.search(text) is not None
+        if self._spent():
+            self.exceeded = True
+        return matched
+
+
+def test_windows(pattern, prompt, windows, budget):
+    """Does `pattern` match `prompt`? False once the budget is spent."""
+    if len(windows) == 1 or has_unbounded_quantifier(pattern):
+        return budget.test(pattern, prompt) is True
+    for window in windows:
+        matched = budget.test(pattern, window)
+        if matched is not False:
+            return matched is True
+    return False
@@ -0,0 +1,48 @@
+"""
+Write (or check) the baseline snapshot; the Python counterpart of buildBaselines.js.
+
+    python3 -m safety_gateway.build_baselines            # write baselines.snapshot.json
+    python3 -m safety_gateway.build_baselines --safe big_safe.csv --unsafe big_unsafe.csv
+    python3 -m safety_gateway.build_baselines --check    # exit 1 if the snapshot is stale
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from .baselines import compute_baselines, describe_sources, read_snapshot, write_snapshot
+from .datasets import DATA_FILES, REPO_ROOT
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write (or check) the baseline snapshot.')
+    parser.add_argument('--output', default=os.path.join(REPO_ROOT, 'baselines.snapshot.json'))
+    parser.add_argument('--safe', default=DATA_FILES['safe'], help='safe dataset CSV')
+    parser.add_argument('--unsafe', default=DATA_FILES['unsafe'], help='unsafe dataset CSV')
+    parser.add_argument('--check', action='store_true',
+                        help='only report whether --output matches the datasets; exit 1 if not')
+    args = parser.parse_args(argv)
+    data_files = {'safe': args.safe, 'unsafe': args.unsafe}
+
+    if args.check:
+        snapshot, reason = read_snapshot(args.output, describe_sources(data_files))
+        if not snapshot:
+            print(f'❌ {args.output}: {reason}')
+            return 1
+        print(f"✅ {args.output} is current ({snapshot['producer']}, {snapshot['createdAt']})")
+        return 0
+
+    started = time.perf_counter()
+    source = describe_sources(data_files)
+    baselines = compute_baselines(data_files)
+    write_snapshot(args.output, baselines, source)
+    rows = baselines['rows']
+    print(f"💾 Baseline snapshot written to {args.output} "
+          f"({rows['safe']} safe, {rows['unsafe']} unsafe rows, {source['compressor']}, "
+          f"in {time.perf_counter() - started:.1f}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,511 @@
+"""
+Offline calibration of the threat score: weights, cut-offs, ROC and PR.
+
+    python3 -m safety_gateway.calibration collect --input labeled.csv --output scores.npz
+    python3 -m safety_gateway.calibration sweep scores.npz --max-fpr 0.01
+    python3 -m safety_gateway.calibration sweep scores.npz --grid ldf_max=20,25,30 --curves roc.csv
+
+`collect` scores a labeled set (text,label CSV like safe_prompts.csv; the
+default datasets without --input) once with GatewayEngine and keeps only the
+raw per-layer values compute_threat_score() consumes. `sweep` then evaluates
+every combination of the weights in SEARCH_SPACE against every review/block
+cut-off pair in NumPy, without rescoring a prompt or calling the gateway.
+
+Threat scores are integers from 0 to 100, so per combination the prompts are
+binned by score, label and how the verdict rule treats them (RITD hit,
+LDF/context flag, obfuscation only, nothing). Cumulative sums over those bins
+give the blocked counts for all cut-off pairs at once. The weights with
+today's values reproduce the engine's scores and verdicts exactly, and the
+binned counts match the engine's verdict rule prompt by prompt at other
+cut-off pairs too; the sweep checks both before reporting anything.
+
+For each combination the operating point is the review/block pair with the
+highest recall whose false positive rate stays within --max-fpr. The report
+starts with the engine as it is (`engine`) and today's weights at their best
+cut-offs (`recut`). ROC and PR curves are those of the score alone (RITD
+hits count as blocked at any threshold). The suggested HIGH cut-off is the lowest score at or above the
+block cut-off whose precision reaches --high-precision. Score a held-out set:
+the LDF and NCD baselines are built from the default datasets, so sweeping
+those is optimistic.
+
+Requires NumPy (`pip install numpy`).
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+
+import numpy as np
+
+from .datasets import DATA_FILES, iter_labeled_rows
+from .engine import GatewayEngine
+
+# compute_threat_score() and get_confidence_level() as they are today
+CURRENT_WEIGHTS = {
+    'ritd_per_hit': 10.0,
+    'ritd_max': 40.0,
+    'ldf_scale': 4.0,
+    'ldf_max': 25.0,
+    'context_max': 20.0,
+    'obfuscation_per_hit': 5.0,
+    'obfuscation_max': 10.0,
+    'ncd_max': 5.0,
+    'ml_max': 20.0,
+    'safe_max': 15.0,
+}
+CURRENT_CUTOFFS = {'review': 30, 'block': 50, 'high': 70}
+
+SEARCH_SPACE = {
+    'ritd_per_hit': [10.0],
+    'ritd_max': [30.0, 40.0, 50.0],
+    'ldf_scale': [3.0, 4.0, 5.0, 6.0],
+    'ldf_max': [15.0, 20.0, 25.0, 30.0, 35.0],
+    'context_max': [10.0, 15.0, 20.0, 25.0, 30.0],
+    'obfuscation_per_hit': [5.0],
+    'obfuscation_max': [5.0, 10.0, 15.0],
+    'ncd_max': [0.0, 5.0, 10.0],
+    'ml_max': [0.0, 10.0, 20.0, 30.0],  # only swept when the scores have ML probabilities
+    'safe_max': [5.0, 10.0, 15.0, 20.0, 25.0],
+}
+REVIEW_CUTOFFS = np.arange(10, 62, 2)
+BLOCK_CUTOFFS = np.arange(20, 92, 2)
+
+# Fixed parts of the verdict rule in engine.analyze_prompt()
+LDF_BLOCK_DEVIATION = 5.0
+LDF_BLOCK_SCORE = 50
+CONTEXT_BLOCK_SUSPICIOUS = 0.7
+OBFUSCATION_BLOCK_SCORE = 40
+NCD_MIN_DELTA = 0.1
+NCD_PER_DELTA = 10
+
+MAX_SCORE = 100
+# Review/block pairs check_reproduction() evaluates both ways: today's and
+# block cut-offs above LDF_BLOCK_SCORE, where its term is not covered by the block rule
+CHECK_CUTOFFS = ((30, 50), (30, 60), (40, 70), (50, 90))
+# Bin categories: how the verdict rule treats a prompt below the block cut-off
+ALWAYS, FLAGGED, OBFUSCATED, PLAIN = range(4)
+# Cap on combinations x prompts held in memory at once
+CHUNK_CELLS = 4_000_000
+
+SCORE_FIELDS = (
+    'unsafe', 'ritd', 'deviation', 'suspicious', 'safe', 'obfuscation', 'ncd_delta', 'ml', 'threat', 'blocked',
+)
+
+
+def collect_scores(rows, engine=None):
+    """Raw per-layer values for labeled rows ({'text', 'label'}), as NumPy arrays."""
+    engine = engine or GatewayEngine()
+    columns = {field: [] for field in SCORE_FIELDS}
+    for row in rows:
+        analysis = engine.analyze_prompt(row['text'])
+        layers = analysis['layers']
+        columns['unsafe'].append(row['label'] == 'unsafe')
+        columns['ritd'].append(len(layers['RITD']['hits']))
+        columns['deviation'].append(layers['LDF']['deviationScore'])
+        columns['suspicious'].append(layers['CONTEXT']['suspiciousScore'])
+        columns['safe'].append(layers['CONTEXT']['safeScore'])
+        columns['obfuscation'].append(len(layers['OBFUSCATION']['hits']))
+        columns['ncd_delta'].append(layers['NCD']['ncdDelta'])
+        columns['ml'].append(layers['ML']['probability'] if 'ML' in layers else np.nan)
+        columns['threat'].append(analysis['threatAnalysis']['threatScore'])
+        columns['blocked'].append(analysis['result'] == 'BLOCKED')
+    return {
+        'unsafe': np.array(columns['unsafe'], dtype=bool),
+        'ritd': np.array(columns['ritd'], dtype=np.int64),
+        'deviation': np.array(columns['deviation'], dtype=float),
+        'suspicious': np.array(columns['suspicious'], dtype=float),
+        'safe': np.array(columns['safe'], dtype=float),
+        'obfuscation': np.array(columns['obfuscation'], dtype=np.int64),
+        'ncd_delta': np.array(columns['ncd_delta'], dtype=float),
+        'ml': np.array(columns['ml'], dtype=float),
+        'threat': np.array(columns['threat'], dtype=np.int64),
+        'blocked': np.array(columns['blocked'], dtype=bool),
+    }
+
+
+def save_scores(path, scores):
+    np.savez_compressed(path, **scores)
+
+
+def load_scores(path):
+    with np.load(path) as data:
+        scores = {field: data[field] for field in SCORE_FIELDS if field in data}
+    # Collected without a classifier (or before the ML layer existed)
+    scores.setdefault('ml', np.full(scores['unsafe'].shape, np.nan))
+    return scores
+
+
+def weight_grid(space=None):
+    """Every combination of `space` (name -> candidate values) as name -> array."""
+    space = {**CURRENT_WEIGHTS, **(space or SEARCH_SPACE)}
+    names = list(CURRENT_WEIGHTS)
+    values = [np.atleast_1d(np.asarray(space[name], dtype=float)) for name in names]
+    combos = np.array(list(itertools.product(*values)), dtype=float).reshape(-1, len(names))
+    return {name: combos[:, i] for i, name in enumerate(names)}
+
+
+def threat_scores(scores, weights):
+    """compute_threat_score() for every (combination, prompt): an int array of shape (G, N).
+
+    Same operations in the same order as the engine, so the current weights
+    reproduce its scores bit for bit (including JS Math.round).
+    """
+    w = {name: np.asarray(values, dtype=float)[:, None] for name, values in weights.items()}
+    total = np.minimum(w['ritd_max'], scores['ritd'] * w['ritd_per_hit'])
+    total = total + np.minimum(w['ldf_max'], (scores['deviation'] / w['ldf_scale']) * w['ldf_max'])
+    total = total + np.minimum(w['context_max'], scores['suspicious'] * w['context_max'])
+    total = total + np.minimum(w['obfuscation_max'], scores['obfuscation'] * w['obfuscation_per_hit'])
+    ncd = np.abs(scores['ncd_delta'])
+    total = total + np.where(ncd > NCD_MIN_DELTA, np.minimum(w['ncd_max'], ncd * NCD_PER_DELTA), 0.0)
+    ml = scores['ml']
+    total = total + np.where(np.isnan(ml), 0.0, np.minimum(w['ml_max'], np.maximum(0, ml - 0.5) * 2 * w['ml_max']))
+    total = np.maximum(0, total - np.minimum(w['safe_max'], scores['safe'] * w['safe_max']))
+    return np.minimum(MAX_SCORE, np.floor(total + 0.5)).astype(np.int64)
+
+
+def categories(scores):
+    flagged = (scores['deviation'] > LDF_BLOCK_DEVIATION) | (scores['suspicious'] > CONTEXT_BLOCK_SUSPICIOUS)
+    return np.select(
+        [scores['ritd'] > 0, flagged, scores['obfuscation'] > 0],
+        [ALWAYS, FLAGGED, OBFUSCATED],
+        PLAIN,
+    )
+
+
+def histogram(threat, category, unsafe):
+    """Counts per (combination, category, label, score): shape (G, 4, 2, MAX_SCORE + 1)."""
+    combos = threat.shape[0]
+    bins = 4 * 2 * (MAX_SCORE + 1)
+    offset = (category * 2 + unsafe.astype(np.int64)) * (MAX_SCORE + 1)
+    flat = np.arange(combos)[:, None] * bins + offset + threat
+    counts = np.bincount(flat.ravel(), minlength=combos * bins)
+    return counts.reshape(combos, 4, 2, MAX_SCORE + 1)
+
+
+def tails(counts):
+    """tails[..., t] = counts at score >= t, for t in 0..MAX_SCORE + 1."""
+    reversed_sum = np.cumsum(counts[..., ::-1], axis=-1)[..., ::-1]
+    pad = np.zeros(counts.shape[:-1] + (1,), dtype=reversed_sum.dtype)
+    return np.concatenate([reversed_sum, pad], axis=-1)
+
+
+def blocked_counts(hist, review=REVIEW_CUTOFFS, block=BLOCK_CUTOFFS):
+    """Blocked prompts per (combination, label, review, block) under the verdict rule.
+
+    Blocked: any RITD hit, or score >= block, or score >= review with an
+    LDF/context flag, or score >= review and > 50 (the LDF score term), or
+    score >= review and > 40 with an obfuscation hit.
+    Shape (G, 2, R, B); pairs with review > block are meaningless (see valid_pairs).
+    """
+    tail = tails(hist)
+    review = np.asarray(review)
+    block = np.asarray(block)
+
+    def blocked_from(above):
+        return np.minimum(np.maximum(review, above + 1)[:, None], block[None, :])
+
+    return (
+        tail[:, ALWAYS, :, 0][:, :, None, None]
+        + tail[:, FLAGGED][:, :, review][:, :, :, None]
+        + tail[:, OBFUSCATED][:, :, blocked_from(OBFUSCATION_BLOCK_SCORE)]
+        + tail[:, PLAIN][:, :, blocked_from(LDF_BLOCK_SCORE)]
+    )
+
+
+def valid_pairs(review=REVIEW_CUTOFFS, block=BLOCK_CUTOFFS):
+    return np.asarray(review)[:, None] <= np.asarray(block)[None, :]
+
+
+def score_curves(hist):
+    """ROC/PR of the score alone per combination; RITD hits rank above every score.
+
+    Returns (tp, fp) of shape (G, MAX_SCORE + 3): blocked counts at thresholds
+    0..MAX_SCORE + 2, where MAX_SCORE + 1 blocks only RITD hits.
+    """
+    ranked = hist[:, FLAGGED:].sum(axis=1)  # (G, 2, S)
+    always = hist[:, ALWAYS].sum(axis=-1)  # (G, 2)
+    ranked = np.concatenate([ranked, always[:, :, None]], axis=-1)
+    tail = tails(ranked)
+    return tail[:, 1], tail[:, 0]
+
+
+def roc_auc(tp, fp, positives, negatives):
+    tpr = tp[:, ::-1] / max(positives, 1)
+    fpr = fp[:, ::-1] / max(negatives, 1)
+    return np.sum(np.diff(fpr, axis=1) * (tpr[:, 1:] + tpr[:, :-1]) / 2, axis=1)
+
+
+def average_precision(tp, fp, positives):
+    tp = tp[:, ::-1]
+    fp = fp[:, ::-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+    recall_gain = np.diff(tp, axis=1, prepend=0) / max(positives, 1)
+    return np.sum(recall_gain * precision, axis=1)
+
+
+def high_cutoff(hist, block, target_precision):
+    """Lowest score >= block whose precision (score alone) reaches the target, per combination."""
+    tail = tails(hist.sum(axis=1))  # (G, 2, S + 1)
+    tp = tail[:, 1, :MAX_SCORE + 1]
+    fp = tail[:, 0, :MAX_SCORE + 1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+    thresholds = np.arange(MAX_SCORE + 1)
+    ok = (precision >= target_precision) & (thresholds[None, :] >= np.asarray(block)[:, None])
+    return np.where(ok.any(axis=1), ok.argmax(axis=1), -1)
+
+
+def verdicts(scores, threat, review, block):
+    """engine.analyze_prompt()'s verdict rule, prompt by prompt, at any cut-off pair."""
+    ldf = (scores['deviation'] > LDF_BLOCK_DEVIATION) | (threat > LDF_BLOCK_SCORE)
+    context = scores['suspicious'] > CONTEXT_BLOCK_SUSPICIOUS
+    obfuscation = (scores['obfuscation'] > 0) & (threat > OBFUSCATION_BLOCK_SCORE)
+    return (scores['ritd'] > 0) | (threat >= block) | ((threat >= review) & (ldf | context | obfuscation))
+
+
+def check_reproduction(scores):
+    """The current weights and cut-offs must give back the engine's own scores and verdicts,
+    and the binned counts the sweep uses must follow the verdict rule at every CHECK_CUTOFFS pair."""
+    current = {name: np.array([value]) for name, value in CURRENT_WEIGHTS.items()}
+    threat = threat_scores(scores, current)[0]
+    mismatched = int(np.count_nonzero(threat != scores['threat']))
+    if mismatched:
+        raise ValueError(f'{mismatched} threat scores differ from the engine; sweep model is out of date')
+    blocked = verdicts(scores, threat, CURRENT_CUTOFFS['review'], CURRENT_CUTOFFS['block'])
+    mismatched = int(np.count_nonzero(blocked != scores['blocked']))
+    if mismatched:
+        raise ValueError(f'{mismatched} verdicts differ from the engine; sweep model is out of date')
+    hist = histogram(threat[None, :], categories(scores), scores['unsafe'])
+    for review, block in CHECK_CUTOFFS:
+        counts = blocked_counts(hist, [review], [block])[0, :, 0, 0]
+        blocked = verdicts(scores, threat, review, block)
+        expected = [int(np.count_nonzero(blocked & (scores['unsafe'] == label))) for label in (False, True)]
+        if counts.tolist() != expected:
+            raise ValueError(f'blocked counts at review {review} / block {block} are {counts.tolist()} '
+                             f'(safe, unsafe), the verdict rule gives {expected}; sweep model is out of date')
+
+
+def sweep(scores, weights=None, max_fpr=0.01, high_precision=0.99,
+          review=REVIEW_CUTOFFS, block=BLOCK_CUTOFFS):
+    """Evaluate every weight combination at every cut-off pair; one result row per combination."""
+    weights = weights or weight_grid()
+    review = np.asarray(review)
+    block = np.asarray(block)
+    unsafe = scores['unsafe']
+    positives = int(np.count_nonzero(unsafe))
+    negatives = int(unsafe.size - positives)
+    category = categories(scores)
+    pairs = valid_pairs(review, block)
+    combos = len(next(iter(weights.values())))
+    chunk = max(1, CHUNK_CELLS // max(unsafe.size, 1))
+
+    columns = {key: [] for key in ('review', 'block', 'high', 'tp', 'fp', 'roc_auc', 'average_precision')}
+    for start in range(0, combos, chunk):
+        part = {name: values[start:start + chunk] for name, values in weights.items()}
+        hist = histogram(threat_scores(scores, part), category, unsafe)
+        counts = blocked_counts(hist, review, block)
+        tp = counts[:, 1].reshape(len(counts), -1)
+        fp = counts[:, 0].reshape(len(counts), -1)
+        valid = pairs.ravel()[None, :]
+        feasible = valid & (fp <= max_fpr * negatives)
+        # Most recall within the FPR budget, then fewest false positives;
+        # when nothing fits the budget, fewest false positives, then most recall
+        within = np.where(feasible, tp * (negatives + 1) - fp, -1)
+        fallback = np.where(valid, -fp * (positives + 1) + tp, np.iinfo(np.int64).min)
+        best = np.where(feasible.any(axis=1), within.argmax(axis=1), fallback.argmax(axis=1))
+        rows = np.arange(len(best))
+        best_review = review[best // len(block)]
+        best_block = block[best % len(block)]
+        curve_tp, curve_fp = score_curves(hist)
+
+        columns['review'].append(best_review)
+        columns['block'].append(best_block)
+        columns['high'].append(high_cutoff(hist, best_block, high_precision))
+        columns['tp'].append(tp[rows, best])
+        columns['fp'].append(fp[rows, best])
+        columns['roc_auc'].append(roc_auc(curve_tp, curve_fp, positives, negatives))
+        columns['average_precision'].append(average_precision(curve_tp, curve_fp, positives))
+
+    results = {key: np.concatenate(parts) for key, parts in columns.items()}
+    results['tpr'] = results['tp'] / max(positives, 1)
+    results['fpr'] = results['fp'] / max(negatives, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        flagged = results['tp'] + results['fp']
+        results['precision'] = np.where(flagged > 0, results['tp'] / np.maximum(flagged, 1), 0.0)
+        pr_sum = results['precision'] + results['tpr']
+        results['f1'] = np.where(pr_sum > 0, 2 * results['precision'] * results['tpr'] / np.maximum(pr_sum, 1e-12), 0.0)
+    results['feasible'] = results['fp'] <= max_fpr * negatives
+    results.update({f'w_{name}': np.asarray(values) for name, values in weights.items()})
+    return results, {'positives': positives, 'negatives': negatives, 'combinations': combos}
+
+
+def rank(results):
+    """Combination indexes, best first: within the FPR budget, recall, then fewer FPs, then ROC AUC."""
+    return np.lexsort((-results['roc_auc'], results['fp'], -results['tp'], ~results['feasible']))
+
+
+def current_index(weights):
+    matches = np.ones(len(next(iter(weights.values()))), dtype=bool)
+    for name, value in CURRENT_WEIGHTS.items():
+        matches &= weights[name] == value
+    return int(matches.argmax()) if matches.any() else None
+
+
+def describe(results, i):
+    weights = {name: float(results[f'w_{name}'][i]) for name in CURRENT_WEIGHTS}
+    high = int(results['high'][i])
+    return {
+        'weights': weights,
+        'cutoffs': {
+            'review': int(results['review'][i]),
+            'block': int(results['block'][i]),
+            'high': high if high >= 0 else None,
+        },
+        'tpr': float(results['tpr'][i]),
+        'fpr': float(results['fpr'][i]),
+        'precision': float(results['precision'][i]),
+        'f1': float(results['f1'][i]),
+        'rocAuc': float(results['roc_auc'][i]),
+        'averagePrecision': float(results['average_precision'][i]),
+        'withinFprBudget': bool(results['feasible'][i]),
+    }
+
+
+def engine_point(scores, current):
+    """The engine's own verdicts (current weights at 30/50/70) in the shape describe() returns."""
+    unsafe = scores['unsafe']
+    tp = int(np.count_nonzero(scores['blocked'] & unsafe))
+    fp = int(np.count_nonzero(scores['blocked'] & ~unsafe))
+    tpr = tp / max(int(np.count_nonzero(unsafe)), 1)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    return {
+        **current,
+        'cutoffs': dict(CURRENT_CUTOFFS),
+        'tpr': tpr,
+        'fpr': fp / max(int(np.count_nonzero(~unsafe)), 1),
+        'precision': precision,
+        'f1': 2 * precision * tpr / (precision + tpr) if precision + tpr else 0.0,
+    }
+
+
+def format_point(label, point):
+    cutoffs = point['cutoffs']
+    high = cutoffs['high'] if cutoffs['high'] is not None else '-'
+    return (
+        f"{label:<10} review {cutoffs['review']:>3}  block {cutoffs['block']:>3}  high {high:>3}  "
+        f"TPR {point['tpr']:.3f}  FPR {point['fpr']:.4f}  precision {point['precision']:.3f}  "
+        f"F1 {point['f1']:.3f}  ROC AUC {point['rocAuc']:.4f}  AP {point['averagePrecision']:.4f}"
+    )
+
+
+def format_weights(weights):
+    changed = [f'{name}={value:g}' for name, value in weights.items() if value != CURRENT_WEIGHTS[name]]
+    return ', '.join(changed) or '(current weights)'
+
+
+def write_curves(path, scores, weights, indexes):
+    """ROC/PR points of the given combinations as CSV rows (combination, threshold, tpr, fpr, precision)."""
+    category = categories(scores)
+    unsafe = scores['unsafe']
+    positives = max(int(np.count_nonzero(unsafe)), 1)
+    negatives = max(int(unsafe.size - np.count_nonzero(unsafe)), 1)
+    part = {name: values[indexes] for name, values in weights.items()}
+    tp, fp = score_curves(histogram(threat_scores(scores, part), category, unsafe))
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(['combination', 'threshold', 'tpr', 'fpr', 'precision'])
+        for row, index in enumerate(indexes):
+            for threshold in range(tp.shape[1]):
+                flagged = tp[row, threshold] + fp[row, threshold]
+                precision = tp[row, threshold] / flagged if flagged else 1.0
+                writer.writerow([
+                    int(index), threshold,
+                    f'{tp[row, threshold] / positives:.6f}',
+                    f'{fp[row, threshold] / negatives:.6f}',
+                    f'{precision:.6f}',
+                ])
+
+
+def parse_grid(overrides):
+    space = dict(SEARCH_SPACE)
+    for override in overrides or []:
+        name, _, values = override.partition('=')
+        if name not in CURRENT_WEIGHTS or not values:
+            raise SystemExit(f'--grid expects name=v1,v2,... with name one of {", ".join(CURRENT_WEIGHTS)}')
+        space[name] = [float(value) for value in values.split(',')]
+    return space
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    collect = commands.add_parser('collect', help='score a labeled set once and save the raw layer values')
+    collect.add_argument('--input', help='labeled CSV (text,label); default: the baseline datasets')
+    collect.add_argument('--output', default='calibration_scores.npz')
+    collect.add_argument('--limit', type=int, help='score at most this many rows')
+
+    run = commands.add_parser('sweep', help='evaluate weight and cut-off combinations on saved scores')
+    run.add_argument('scores', help='file written by `collect`')
+    run.add_argument('--max-fpr', type=float, default=0.01, help='false positive budget per operating point')
+    run.add_argument('--high-precision', type=float, default=0.99, help='precision the HIGH cut-off must reach')
+    run.add_argument('--grid', action='append', metavar='NAME=V1,V2,...', help='candidate values for one weight')
+    run.add_argument('--top', type=int, default=10)
+    run.add_argument('--curves', help='write ROC/PR points of the current and best combinations to this CSV')
+    run.add_argument('--output', help='write the ranked operating points as JSON')
+    args = parser.parse_args(argv)
+
+    if args.command == 'collect':
+        files = [args.input] if args.input else list(DATA_FILES.values())
+        rows = (row for file_path in files for row in iter_labeled_rows(file_path))
+        if args.limit:
+            rows = itertools.islice(rows, args.limit)
+        scores = collect_scores(rows)
+        save_scores(args.output, scores)
+        unsafe = int(np.count_nonzero(scores['unsafe']))
+        print(f'Saved layer scores for {scores["unsafe"].size} prompts ({unsafe} unsafe) to {args.output}')
+        return 0
+
+    scores = load_scores(args.scores)
+    check_reproduction(scores)
+    space = parse_grid(args.grid)
+    if np.isnan(scores['ml']).all():
+        space['ml_max'] = [CURRENT_WEIGHTS['ml_max']]
+    weights = weight_grid(space)
+    results, totals = sweep(scores, weights, max_fpr=args.max_fpr, high_precision=args.high_precision)
+    order = rank(results)
+    current = current_index(weights)
+
+    print(f"{totals['combinations']} weight combinations x {int(valid_pairs().sum())} cut-off pairs, "
+          f"{totals['positives']} unsafe / {totals['negatives']} safe prompts, FPR budget {args.max_fpr}")
+    today = engine_point(scores, describe(results, current) if current is not None else {
+        'weights': dict(CURRENT_WEIGHTS), 'rocAuc': float('nan'), 'averagePrecision': float('nan'),
+    })
+    print(format_point('engine', today))
+    if current is not None:
+        print(format_point('recut', describe(results, current)))
+    print()
+    ranked = [describe(results, i) for i in order[:args.top]]
+    for position, point in enumerate(ranked, 1):
+        print(format_point(f'#{position}', point))
+        print(f"{'':<10} {format_weights(point['weights'])}")
+    if not results['feasible'].any():
+        print(f'\nNo combination stays within FPR {args.max_fpr}; points shown minimise false positives')
+
+    if args.curves:
+        indexes = [int(i) for i in order[:1]] + ([current] if current is not None else [])
+        write_curves(args.curves, scores, weights, np.array(indexes))
+        print(f'\nROC/PR points written to {args.curves}')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump({'totals': totals, 'maxFpr': args.max_fpr, 'engine': today, 'ranked': ranked,
+                       'current': describe(results, current) if current is not None else None}, handle, indent=2)
+        print(f'Operating points written to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
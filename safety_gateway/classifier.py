@@ -0,0 +1,119 @@
+"""
+Pure-Python scorer for the classifier weight table, mirroring classifier.js.
+
+The table is what `python3 -m safety_gateway.train_classifier export` writes.
+Hashing follows scikit-learn's HashingVectorizer (MurmurHash3 x86 32-bit of
+the UTF-8 term, sign from the hash, L2 norm), the sums run in the same
+order as classifier.js, and the logistic uses V8's Math.exp (js_exp), so
+both produce identical probabilities. Training and
+batch scoring with the full model live in train_classifier.py.
+"""
+
+import json
+import math
+import os
+import re
+
+from ._js import js_exp, js_lower, py_string
+
+TABLE_FORMAT = 1
+# classifier.js: /[\p{L}\p{N}_]{2,}/gu on the lowercased prompt
+TOKEN_PATTERN = re.compile(r'\w{2,}')
+# Same default as detector.js; ML_MODEL= (empty) disables the ML layer
+ML_MODEL = os.environ.get(
+    'ML_MODEL', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ml.weights.json'))
+
+
+def murmurhash3(data, seed=0):
+    """Signed MurmurHash3 x86 32-bit, like sklearn's murmurhash3_32(positive=False)."""
+    c1, c2, mask = 0xcc9e2d51, 0x1b873593, 0xffffffff
+    h = seed & mask
+    blocks = len(data) // 4
+    for i in range(blocks):
+        k = int.from_bytes(data[i * 4:i * 4 + 4], 'little')
+        k = (k * c1) & mask
+        k = ((k << 15) | (k >> 17)) & mask
+        k = (k * c2) & mask
+        h ^= k
+        h = ((h << 13) | (h >> 19)) & mask
+        h = (h * 5 + 0xe6546b64) & mask
+    tail = data[blocks * 4:]
+    k = 0
+    if len(tail) >= 3:
+        k ^= tail[2] << 16
+    if len(tail) >= 2:
+        k ^= tail[1] << 8
+    if tail:
+        k ^= tail[0]
+        k = (k * c1) & mask
+        k = ((k << 15) | (k >> 17)) & mask
+        k = (k * c2) & mask
+        h ^= k
+    h ^= len(data)
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & mask
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & mask
+    h ^= h >> 16
+    return h - 0x100000000 if h & 0x80000000 else h
+
+
+def extract_terms(js_text, ngram_range):
+    """Lowercased tokens of a UTF-16 view string, then word n-grams (HashingVectorizer's analyzer)."""
+    tokens = TOKEN_PATTERN.findall(py_string(js_lower(js_text)))
+    min_n, max_n = ngram_range
+    if min_n == 1 and max_n == 1:
+        return tokens
+    terms = []
+    for n in range(min_n, min(max_n, len(tokens)) + 1):
+        for i in range(len(tokens) - n + 1):
+            terms.append(tokens[i] if n == 1 else ' '.join(tokens[i:i + n]))
+    return terms
+
+
+def hash_terms(terms, n_features, alternate_sign):
+    """Column -> signed count, in first-seen order."""
+    counts = {}
+    for term in terms:
+        h = murmurhash3(term.encode('utf-8', 'replace'))
+        column = (2147483647 - (n_features - 1)) % n_features if h == -2147483648 else abs(h) % n_features
+        counts[column] = counts.get(column, 0) + (-1 if alternate_sign and h < 0 else 1)
+    return counts
+
+
+class Classifier:
+    """Weight table loaded from JSON; predict() returns P(unsafe)."""
+
+    def __init__(self, table):
+        if table.get('format') != TABLE_FORMAT:
+            raise ValueError(f"Unsupported classifier table format {table.get('format')} (expected {TABLE_FORMAT})")
+        self.n_features = table['nFeatures']
+        self.ngram_range = tuple(table['ngramRange'])
+        self.alternate_sign = table['alternateSign']
+        self.intercept = table['intercept']
+        self.version = table.get('version')
+        self.weights = dict(zip(table['columns'], table['weights']))
+
+    def predict(self, js_text):
+        counts = hash_terms(extract_terms(js_text, self.ngram_range), self.n_features, self.alternate_sign)
+        dot = 0.0
+        squares = 0
+        for column, value in counts.items():
+            squares += value * value
+            weight = self.weights.get(column)
+            if weight is not None:
+                dot += weight * value
+        margin = self.intercept + dot / math.sqrt(squares) if squares > 0 else self.intercept
+        return 1 / (1 + js_exp(-margin))
+
+
+def load_classifier(path=ML_MODEL):
+    """None when `path` is unset or missing."""
+    if not path:
+        return None
+    try:
+        with open(path, encoding='utf-8') as handle:
+            table = json.load(handle)
+    except FileNotFoundError:
+        return None
+    return Classifier(table)
@@ -0,0 +1,65 @@
+"""
+Compressed-length backends for the entropy score and NCD, mirroring compressors.js.
+
+COMPRESSOR picks the backend as it does for server.js: 'gzip' (default),
+'deflate' (the same stream without gzip's 18 bytes of framing) or 'brotli'
+at quality 4. The brotli backend needs `pip install brotli`; the others are
+plain zlib.
+"""
+
+import os
+import zlib
+
+BROTLI_QUALITY = 4
+COMPRESSOR = os.environ.get('COMPRESSOR') or 'gzip'
+COMPRESSOR_NAMES = ('gzip', 'deflate', 'brotli')
+
+_compressors = {}
+
+
+def gzip_length(data):
+    """Length of `zlib.gzipSync(data)` with Node's default options."""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 31)
+    return len(compressor.compress(data)) + len(compressor.flush())
+
+
+def deflate_length(data, dictionary=None):
+    """Length of `zlib.deflateRawSync(data, { dictionary })`."""
+    if dictionary:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return len(compressor.compress(data)) + len(compressor.flush())
+
+
+class Compressor:
+    """One backend: length(data) is C(x); conditional(dictionary) returns a function giving C(x | dictionary)."""
+
+    def __init__(self, name):
+        if name not in COMPRESSOR_NAMES:
+            raise ValueError(f'Unknown compressor "{name}" (expected one of {", ".join(COMPRESSOR_NAMES)})')
+        self.name = name
+        if name == 'gzip':
+            self.length = gzip_length
+        elif name == 'deflate':
+            self.length = deflate_length
+        else:
+            import brotli  # only this backend needs it
+            self.length = lambda data: len(brotli.compress(data, quality=BROTLI_QUALITY))
+
+    def conditional(self, dictionary):
+        if self.name != 'brotli':
+            return lambda data: deflate_length(data, dictionary)
+        # No custom dictionaries in Node's brotli: compress dictionary + x, as compressors.js
+        base = self.length(dictionary)
+        return lambda data: self.length(dictionary + data) - base
+
+
+def get_compressor(name=None):
+    """The shared Compressor for `name` (default: COMPRESSOR); a Compressor-like object is returned as is."""
+    if name is not None and not isinstance(name, str):
+        return name
+    name = name or COMPRESSOR
+    if name not in _compressors:
+        _compressors[name] = Compressor(name)
+    return _compressors[name]
@@ -0,0 +1,44 @@
+"""
+Baseline dataset loading, mirroring corpus.js.
+
+Files are streamed through the csv module (RFC 4180: quoted commas, doubled
+quotes and multi-line fields), one row at a time, so corpora far larger than
+RAM can feed the baseline statistics.
+"""
+
+import csv
+import os
+
+from ._js import js_string, js_trim
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# SAFE_DATASET / UNSAFE_DATASET point at larger labeled corpora, as in detector.js
+DATA_FILES = {
+    'safe': os.environ.get('SAFE_DATASET') or os.path.join(REPO_ROOT, 'safe_prompts.csv'),
+    'unsafe': os.environ.get('UNSAFE_DATASET') or os.path.join(REPO_ROOT, 'unsafe_prompts.csv'),
+}
+
+
+def iter_labeled_rows(file_path):
+    """Yield {'text', 'label'} per data row, like readLabeledRows() in corpus.js."""
+    # newline='' lets the csv module see the raw line endings, as the RFC requires
+    with open(file_path, encoding='utf-8', newline='') as handle:
+        reader = csv.reader(handle)
+        next(reader, None)  # remove header
+        for fields in reader:
+            if not fields or fields == ['']:
+                continue
+            label = fields[1] if len(fields) > 1 else ''
+            yield {
+                'text': js_trim(js_string(fields[0])),
+                'label': 'unsafe' if js_trim(label) == '1' else 'safe',
+            }
+
+
+def load_datasets(data_files=None):
+    """Every row of every file in a list (small files only; stream with iter_labeled_rows)."""
+    rows = []
+    for file_path in (data_files or DATA_FILES).values():
+        rows.extend(iter_labeled_rows(file_path))
+    return rows
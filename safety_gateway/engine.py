@@ -0,0 +1,338 @@
+"""
+In-process port of analyzePrompt() from server.js.
+
+Scoring with the engine avoids the HTTP round trip (and Ollama forwarding)
+that the /analyze route costs per prompt:
+
+    from safety_gateway import GatewayEngine
+
+    engine = GatewayEngine()
+    engine.analyze_prompt("Act as a hacker")["result"]   # 'BLOCKED'
+"""
+
+import os
+import time
+
+from ._js import js_str, js_string, js_trim, fixed, to_fixed, utf8_bytes
+from .baselines import BASELINE_SNAPSHOT, FEEDBACK_CHECKPOINT, load_baselines
+from .budget import (
+    LAYER_BUDGET_MS,
+    SAMPLE_CHARS,
+    WINDOW_CHARS,
+    WINDOW_OVERLAP,
+    Budget,
+    sample_windows,
+    split_windows,
+    test_windows,
+)
+from .classifier import ML_MODEL, load_classifier
+from .layers import (
+    analyze_context,
+    compute_deviation,
+    compute_feature_vector,
+    compute_threat_score,
+    detect_obfuscation,
+    detect_role_inversion,
+    get_confidence_level,
+    normalize_entropy,
+)
+from .compressors import get_compressor
+from .ncd import NcdEngine, NcdIndex
+
+OUTCOME_LOGS = {
+    'SAFE': 'Prompt cleared all layers.',
+    'REVIEW': 'Prompt held for review before LLM.',
+    'BLOCKED': 'Prompt quarantined before LLM.',
+}
+
+
+def _corpus_ncd(corpus, mode, compressed_corpus_length, compressor):
+    if mode == 'knn':
+        return NcdIndex(corpus.split('\n') if corpus else [], compressed_corpus_length=compressed_corpus_length,
+                        compressor=compressor)
+    return NcdEngine(corpus, mode, compressed_corpus_length, compressor)
+
+
+class GatewayEngine:
+    """Holds the baseline statistics server.js computes at startup."""
+
+    def __init__(self, data_files=None, ncd_mode=None, snapshot_path=BASELINE_SNAPSHOT, ml_model=ML_MODEL,
+                 layer_budget_ms=LAYER_BUDGET_MS, compressor=None, checkpoint_path=FEEDBACK_CHECKPOINT):
+        # Entropy/NCD backend, COMPRESSOR by default (see safety_gateway.compressors)
+        self.compressor = get_compressor(compressor)
+        # From the feedback checkpoint (FEEDBACK=1) or the snapshot when it matches the
+        # datasets, otherwise computed from them
+        baselines, self.baseline_origin = load_baselines(
+            data_files, snapshot_path, self.compressor, checkpoint_path)
+        self.safe_entropy_stats = baselines['safeEntropyStats']
+        self.unsafe_entropy_stats = baselines['unsafeEntropyStats']
+        self.safe_feature_stats = baselines['safeFeatureStats']
+
+        # Create corpus for NCD analysis (same NCD_MODE switch as server.js)
+        self.safe_corpus = baselines['safeCorpus']
+        self.unsafe_corpus = baselines['unsafeCorpus']
+        ncd_mode = ncd_mode or os.environ.get('NCD_MODE', 'exact')
+        self.safe_ncd = _corpus_ncd(
+            self.safe_corpus, ncd_mode, baselines['compressedCorpusLength']['safe'], self.compressor)
+        self.unsafe_ncd = _corpus_ncd(
+            self.unsafe_corpus, ncd_mode, baselines['compressedCorpusLength']['unsafe'], self.compressor)
+
+        # Same weight table as detector.js (ML_MODEL); None disables the ML layer
+        self.classifier = load_classifier(ml_model)
+        # Wall time per rule layer before the prompt is blocked unread; None disables
+        self.layer_budget_ms = layer_budget_ms
+
+    def _run_rules(self, detect, layer, prompt, windows, exceeded):
+        budget = Budget(self.layer_budget_ms)
+        result = detect(prompt, lambda pattern: test_windows(pattern, prompt, windows, budget))
+        if budget.exceeded:
+            exceeded.append(layer)
+        return result
+
+    def analyze_prompt(self, prompt, timings=None):
+        """Analyze one prompt; returns the same dict server.js puts in its /analyze response.
+
+        Pass a dict as ``timings`` to have it filled with per-layer nanoseconds,
+        keyed like server.js's timings block (see safety_gateway.timings).
+        Long prompts are windowed and sampled as in detector.js (see
+        safety_gateway.budget).
+        """
+        mark = time.perf_counter_ns() if timings is not None else 0
+
+        def lap(layer):
+            nonlocal mark
+            if timings is None:
+                return
+            now = time.perf_counter_ns()
+            timings[layer] = now - mark
+            mark = now
+
+        cleaned_prompt = js_trim(js_string(prompt))
+        windows = split_windows(cleaned_prompt, WINDOW_CHARS, WINDOW_OVERLAP)
+        # NCD, LDF and ML read a bounded sample of a long prompt
+        sample = (
+            sample_windows(windows, SAMPLE_CHARS // WINDOW_CHARS, WINDOW_CHARS)
+            if len(cleaned_prompt) > SAMPLE_CHARS else cleaned_prompt
+        )
+        exceeded = []
+
+        # Layer 1: RITD - Pattern-based detection
+        ritd_hits = self._run_rules(detect_role_inversion, 'RITD', cleaned_prompt, windows, exceeded)
+        lap('RITD')
+
+        # Layer 2: Entropy and compression analysis (prompt is compressed once and reused)
+        prompt_buffer = utf8_bytes(sample)
+        c_prompt = self.compressor.length(prompt_buffer) if prompt_buffer else 0
+        entropy_score = c_prompt / len(prompt_buffer) if prompt_buffer else 0
+        normalized_entropy = normalize_entropy(
+            entropy_score, self.safe_entropy_stats, self.unsafe_entropy_stats)
+        ncd_safe = self.safe_ncd.distance(prompt_buffer, c_prompt)
+        ncd_unsafe = self.unsafe_ncd.distance(prompt_buffer, c_prompt)
+        ncd_delta = fixed(ncd_safe - ncd_unsafe, 4)
+        lap('NCD')
+
+        # Layer 3: LDF - Linguistic analysis
+        feature_vector = compute_feature_vector(sample)
+        deviation_score = compute_deviation(feature_vector, self.safe_feature_stats)
+        lap('LDF')
+
+        # Layer 4: Context analysis
+        context_score = self._run_rules(analyze_context, 'CONTEXT', cleaned_prompt, windows, exceeded)
+        lap('CONTEXT')
+
+        # Layer 5: Obfuscation detection
+        obfuscation_hits = self._run_rules(detect_obfuscation, 'OBFUSCATION', cleaned_prompt, windows, exceeded)
+        lap('OBFUSCATION')
+
+        # Layer 6: trained classifier, when a model is loaded
+        ml_probability = None
+        if self.classifier is not None:
+            ml_probability = fixed(self.classifier.predict(sample), 4)
+            lap('ML')
+
+        threat_analysis = compute_threat_score(
+            ritd_hits,
+            deviation_score,
+            entropy_score,
+            ncd_delta,
+            context_score,
+            obfuscation_hits,
+            ml_probability,
+        )
+        confidence = get_confidence_level(threat_analysis['score'])
+
+        ritd_blocked = len(ritd_hits) > 0
+        ldf_blocked = deviation_score > 5.0 or threat_analysis['score'] > 50
+        context_blocked = context_score['suspicious'] > 0.7
+        obfuscation_blocked = len(obfuscation_hits) > 0 and threat_analysis['score'] > 40
+        # NCD/entropy blocking is disabled in server.js as well
+        ncd_blocked = False
+
+        should_block = (
+            ritd_blocked
+            or threat_analysis['score'] >= 50
+            or (threat_analysis['score'] >= 30 and (ldf_blocked or context_blocked or obfuscation_blocked))
+            or ncd_blocked
+        )
+        # A layer that ran out of budget has not read the whole prompt: unless
+        # what was read blocks it, hold it for review (wall time also runs out
+        # under load)
+        result = 'BLOCKED' if should_block else ('REVIEW' if exceeded else 'SAFE')
+
+        if not ritd_hits:
+            ritd_reason = 'No role inversion patterns detected.'
+        elif len(ritd_hits) == 1:
+            ritd_reason = f'Detected {len(ritd_hits)} suspicious pattern: {ritd_hits[0][:50]}.'
+        else:
+            ritd_reason = f'Detected {len(ritd_hits)} suspicious patterns indicating potential security threat.'
+
+        if ldf_blocked:
+            ldf_reason = (
+                f'Linguistic deviation score {to_fixed(deviation_score, 2)} exceeds safe threshold (3.5). '
+                'Structural patterns suggest non-standard or potentially malicious intent.'
+            )
+        else:
+            ldf_reason = f'Linguistic fingerprint within safe bounds (deviation: {to_fixed(deviation_score, 2)}).'
+
+        if context_score['suspicious'] > 0:
+            context_reason = (
+                f"Context analysis detected suspicious intent (score: {to_fixed(context_score['suspicious'], 2)}). "
+                + ' '.join(context_score['reasons'][:2])
+            )
+        elif context_score['safe'] > 0:
+            context_reason = 'Context suggests educational or defensive purpose.'
+        else:
+            context_reason = 'Context analysis shows neutral intent.'
+
+        layer_summaries = {
+            'RITD': {
+                'status': 'danger' if ritd_blocked else 'safe',
+                'reason': ritd_reason,
+                'hits': ritd_hits,
+                'score': len(ritd_hits) * 10,
+                'maxScore': 40,
+            },
+            'NCD': {
+                'status': 'danger' if ncd_blocked else 'safe',
+                'reason': (
+                    'Entropy or compression profile deviates from safe baseline.'
+                    if ncd_blocked else 'Compression profile aligned with safe prompts.'
+                ),
+                'entropyScore': fixed(entropy_score, 3),
+                'normalizedEntropy': fixed(normalized_entropy, 3),
+                'ncdSafe': ncd_safe,
+                'ncdUnsafe': ncd_unsafe,
+                'ncdDelta': ncd_delta,
+            },
+            'LDF': {
+                'status': 'danger' if ldf_blocked else 'safe',
+                'reason': ldf_reason,
+                'deviationScore': deviation_score,
+                'vector': feature_vector,
+            },
+            'CONTEXT': {
+                'status': 'danger' if context_blocked else 'safe',
+                'reason': context_reason,
+                'suspiciousScore': context_score['suspicious'],
+                'safeScore': context_score['safe'],
+            },
+            'OBFUSCATION': {
+                'status': 'danger' if obfuscation_blocked else 'safe',
+                'reason': (
+                    f'Detected {len(obfuscation_hits)} obfuscation pattern(s). '
+                    'Prompt may be encoded or attempting to evade detection.'
+                    if obfuscation_hits else 'No obfuscation patterns detected.'
+                ),
+                'hits': obfuscation_hits,
+            },
+        }
+        if self.classifier is not None:
+            ml_unsafe = ml_probability >= 0.5
+            layer_summaries['ML'] = {
+                'status': 'danger' if ml_unsafe else 'safe',
+                'reason': (
+                    f'Classifier rates the prompt unsafe (P = {to_fixed(ml_probability, 2)}).'
+                    if ml_unsafe else
+                    f'Classifier rates the prompt safe (P(unsafe) = {to_fixed(ml_probability, 2)}).'
+                ),
+                'probability': ml_probability,
+                'modelVersion': self.classifier.version,
+            }
+        for layer in exceeded:
+            layer_summaries[layer].update({
+                'status': 'danger',
+                'reason': f'Analysis budget of {js_str(self.layer_budget_ms)} ms exceeded before the prompt was fully checked.',
+                'budgetExceeded': True,
+            })
+
+        logs = [
+            {'type': 'system', 'msg': f'Gateway received prompt ({len(cleaned_prompt)} chars).'},
+            {
+                'type': 'error' if layer_summaries['RITD']['status'] == 'danger' else 'success',
+                'msg': f"RITD → {layer_summaries['RITD']['reason']}",
+            },
+            {
+                'type': 'error' if ncd_blocked else 'success',
+                'msg': f"NCD → Δ {js_str(ncd_delta)}, entropy {js_str(layer_summaries['NCD']['entropyScore'])}",
+            },
+            {
+                'type': 'error' if ldf_blocked else 'success',
+                'msg': f'LDF → deviation score {js_str(deviation_score)}',
+            },
+        ]
+        if exceeded:
+            logs.append({
+                'type': 'error',
+                'msg': f"Budget → {', '.join(exceeded)} exceeded {js_str(self.layer_budget_ms)} ms; not forwarding.",
+            })
+        logs += [
+            {
+                'type': 'success' if result == 'SAFE' else 'error',
+                'msg': OUTCOME_LOGS[result],
+            },
+        ]
+        lap('scoring')
+
+        analysis = {
+            'result': result,
+            'layers': layer_summaries,
+            'metrics': {
+                'ncdScore': fixed(entropy_score, 2),
+                'ldfScore': deviation_score,
+            },
+            'threatAnalysis': {
+                'threatScore': threat_analysis['score'],
+                'maxScore': threat_analysis['maxScore'],
+                'percentage': threat_analysis['percentage'],
+                'confidence': confidence['level'],
+                'confidenceColor': confidence['color'],
+                'recommendedAction': confidence['action'],
+                'breakdown': threat_analysis['details'],
+            },
+            'logs': logs,
+        }
+        if len(windows) > 1:
+            analysis['longPrompt'] = {'chars': len(cleaned_prompt), 'windows': len(windows), 'sampledChars': len(sample)}
+        if exceeded:
+            analysis['budgetExceeded'] = exceeded
+        return analysis
+
+    def analyze_many(self, prompts):
+        """Analyze an iterable of prompts, yielding results in input order."""
+        for prompt in prompts:
+            yield self.analyze_prompt(prompt)
+
+
+_default_engine = None
+
+
+def get_engine():
+    """Shared engine built from the repository's baseline CSVs."""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = GatewayEngine()
+    return _default_engine
+
+
+def analyze_prompt(prompt):
+    return get_engine().analyze_prompt(prompt)
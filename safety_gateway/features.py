@@ -0,0 +1,68 @@
+"""
+Batch LDF features as an (N x 10) NumPy matrix.
+
+Column order follows the feature vector server.js returns in
+`layers.LDF.vector` (see FEATURE_NAMES). Requires numpy
+(pip install numpy); the rest of the package does not.
+"""
+
+import numpy as np
+
+from ._js import js_string, js_trim
+from .layers import compute_feature_vector
+
+FEATURE_NAMES = (
+    'tokenCount',
+    'avgTokenLength',
+    'stopwordRatio',
+    'functionWordRatio',
+    'uppercaseRatio',
+    'digitRatio',
+    'punctuationRatio',
+    'uniqueTokenRatio',
+    'longestRunRatio',
+    'whitespaceRatio',
+)
+
+
+def feature_matrix(prompts, clean=True):
+    """Return a float64 array with one feature row per prompt.
+
+    With `clean=True` prompts are trimmed the way analyzePrompt does before
+    LDF runs; pass `clean=False` for rows that are already cleaned (e.g.
+    baseline CSV text).
+    """
+    prompts = list(prompts)
+    matrix = np.empty((len(prompts), len(FEATURE_NAMES)), dtype=np.float64)
+    for row, prompt in enumerate(prompts):
+        text = js_string(prompt)
+        vector = compute_feature_vector(js_trim(text) if clean else text)
+        matrix[row] = [vector[name] for name in FEATURE_NAMES]
+    return matrix
+
+
+def baseline_stats(matrix):
+    """Per-column mean/std like computeFeatureStats (population std, 0 -> 0.0001)."""
+    if not len(matrix):
+        return {}
+    means = matrix.mean(axis=0)
+    stds = matrix.std(axis=0)
+    return {
+        name: {'mean': float(means[col]), 'std': float(stds[col]) or 0.0001}
+        for col, name in enumerate(FEATURE_NAMES)
+    }
+
+
+def deviation_scores(matrix, stats):
+    """Vectorized computeDeviation: mean absolute z-score per row, rounded to 2 places.
+
+    Rounding uses NumPy (half-to-even), so a row can differ from the scalar
+    compute_deviation by 0.01 on an exact tie.
+    """
+    means = np.array([stats[name]['mean'] for name in FEATURE_NAMES])
+    stds = np.array([stats[name]['std'] for name in FEATURE_NAMES])
+    z_scores = np.abs((matrix - means) / stds)
+    return np.round(z_scores.mean(axis=1), 2)
+
+
+__all__ = ['FEATURE_NAMES', 'baseline_stats', 'deviation_scores', 'feature_matrix']
@@ -0,0 +1,259 @@
+"""
+Detection layers, ported one-to-one from server.js.
+
+Every function takes and returns the same values as its JavaScript
+counterpart (detectRoleInversion -> detect_role_inversion, ...). Text
+arguments are expected in UTF-16 view (see `_js.js_string`); the engine
+takes care of that conversion.
+"""
+
+import math
+import re
+
+from ._js import compile_js, fixed, js_lower, js_round, js_str, to_fixed, utf8_bytes
+from .compressors import get_compressor
+from .rules import (
+    BASE_TRIGGERS,
+    DANGEROUS_KEYWORDS,
+    FUNCTION_WORDS,
+    OBFUSCATION_PATTERNS,
+    SAFE_CONTEXTS,
+    STOPWORDS,
+    SUSPICIOUS_CONTEXTS,
+)
+
+# Threat points the ML layer adds at P(unsafe) = 1, as in detector.js
+ML_MAX_SCORE = 20
+
+_TRIGGERS = [
+    (compile_js(source, ignore_case=True), re.sub(r'\(\?:|\)', '', source)[:60])
+    for source in BASE_TRIGGERS
+]
+_KEYWORDS = [(keyword.lower(), f'Keyword: {keyword}') for keyword in DANGEROUS_KEYWORDS]
+_OBFUSCATION = [
+    (compile_js(source, ignore_case), f'Obfuscation pattern {idx + 1} detected')
+    for idx, (source, ignore_case) in enumerate(OBFUSCATION_PATTERNS)
+]
+_SUSPICIOUS = [(compile_js(source, ignore_case=True), weight) for source, weight in SUSPICIOUS_CONTEXTS]
+_SAFE = [(compile_js(source, ignore_case=True), weight) for source, weight in SAFE_CONTEXTS]
+
+_TOKEN_RE = compile_js(r"\b[\w']+\b")
+_UPPER_RE = compile_js(r"[A-Z]")
+_DIGIT_RE = compile_js(r"\d")
+_PUNCT_RE = compile_js(r"[^\w\s]")
+_SPACE_RE = compile_js(r"\s")
+
+
+def _search(prompt):
+    return lambda pattern: pattern.search(prompt) is not None
+
+
+# The rule layers take an optional `test(pattern)`, like detector.js; the
+# engine passes one that works on windows within the layer budget
+def detect_role_inversion(prompt, test=None):
+    test = test or _search(prompt)
+    matches = []
+    lower_prompt = js_lower(prompt)
+
+    for pattern, label in _TRIGGERS:
+        if test(pattern):
+            matches.append(label)
+
+    for keyword, label in _KEYWORDS:
+        if keyword in lower_prompt:
+            matches.append(label)
+
+    return matches
+
+
+def compute_entropy_score(text, compressor=None):
+    if not text:
+        return 0
+    buffer = utf8_bytes(text)
+    if not buffer:
+        return 0
+    return (compressor or get_compressor()).length(buffer) / len(buffer)
+
+
+class RunningStats:
+    """Welford's online mean/variance, as createRunningStats() in corpus.js."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0
+        self._m2 = 0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def summary(self):
+        if not self.count:
+            return {'mean': 0, 'std': 0}
+        return {'mean': self.mean, 'std': math.sqrt(self._m2 / self.count) or 0.0001}
+
+
+def longest_repeating_run(text):
+    if not text:
+        return 0
+    max_run = 1
+    current_run = 1
+    previous = text[0]
+    for ch in text[1:]:
+        if ch == previous:
+            current_run += 1
+            if current_run > max_run:
+                max_run = current_run
+        else:
+            current_run = 1
+            previous = ch
+    return max_run
+
+
+def compute_feature_vector(text):
+    sanitized = text or ''
+    length = len(sanitized) or 1
+    tokens = _TOKEN_RE.findall(js_lower(sanitized))
+    token_count = len(tokens) or 1
+    unique_tokens = set(tokens)
+    uppercase_count = len(_UPPER_RE.findall(sanitized))
+    digit_count = len(_DIGIT_RE.findall(sanitized))
+    punctuation_count = len(_PUNCT_RE.findall(sanitized))
+    whitespace_count = len(_SPACE_RE.findall(sanitized))
+    longest_run = longest_repeating_run(sanitized)
+
+    stopword_hits = 0
+    function_word_hits = 0
+    token_length_sum = 0
+    for token in tokens:
+        if token in STOPWORDS:
+            stopword_hits += 1
+        if token in FUNCTION_WORDS:
+            function_word_hits += 1
+        token_length_sum += len(token)
+
+    return {
+        'tokenCount': token_count,
+        'avgTokenLength': token_length_sum / token_count,
+        'stopwordRatio': stopword_hits / token_count,
+        'functionWordRatio': function_word_hits / token_count,
+        'uppercaseRatio': uppercase_count / length,
+        'digitRatio': digit_count / length,
+        'punctuationRatio': punctuation_count / length,
+        'uniqueTokenRatio': len(unique_tokens) / token_count,
+        'longestRunRatio': longest_run / length,
+        'whitespaceRatio': whitespace_count / length,
+    }
+
+
+def compute_deviation(feature_vector, baseline_stats):
+    total = 0
+    for key, value in feature_vector.items():
+        stats = baseline_stats.get(key) or {'mean': 0, 'std': 1}
+        if stats['std']:
+            total += abs((value - stats['mean']) / stats['std'])
+    average_deviation = total / len(feature_vector)
+    return fixed(average_deviation, 2)
+
+
+def normalize_entropy(entropy_score, safe_stats, unsafe_stats):
+    value_range = unsafe_stats['mean'] - safe_stats['mean'] or 0.0001
+    normalized = (entropy_score - safe_stats['mean']) / value_range
+    return max(0, min(1, normalized))
+
+
+def detect_obfuscation(prompt, test=None):
+    test = test or _search(prompt)
+    return [label for pattern, label in _OBFUSCATION if test(pattern)]
+
+
+def analyze_context(prompt, test=None):
+    test = test or _search(prompt)
+    context_score = {
+        'suspicious': 0,
+        'neutral': 0,
+        'safe': 0,
+        'reasons': [],
+    }
+
+    for pattern, weight in _SUSPICIOUS:
+        if test(pattern):
+            context_score['suspicious'] += weight
+            context_score['reasons'].append(f'Suspicious intent detected (weight: {js_str(weight)})')
+
+    for pattern, weight in _SAFE:
+        if test(pattern):
+            context_score['safe'] += abs(weight)
+            context_score['reasons'].append('Educational/defensive context detected')
+
+    return context_score
+
+
+def compute_threat_score(ritd_hits, deviation_score, entropy_score, ncd_delta, context_score, obfuscation_hits,
+                         ml_probability=None):
+    threat_score = 0
+    max_score = 100
+    details = []
+
+    # RITD contribution (40% weight)
+    ritd_score = min(40, len(ritd_hits) * 10)
+    threat_score += ritd_score
+    if ritd_score > 0:
+        details.append(f'RITD: {ritd_score}/40 ({len(ritd_hits)} patterns detected)')
+
+    # LDF contribution (25% weight)
+    ldf_score = min(25, (deviation_score / 4.0) * 25)
+    threat_score += ldf_score
+    if ldf_score > 10:
+        details.append(f'LDF: {to_fixed(ldf_score, 1)}/25 (deviation: {to_fixed(deviation_score, 2)})')
+
+    # Context analysis (20% weight)
+    context_threat = min(20, context_score['suspicious'] * 20)
+    threat_score += context_threat
+    if context_threat > 5:
+        details.append(f'Context: {to_fixed(context_threat, 1)}/20 (suspicious intent)')
+
+    # Obfuscation (10% weight)
+    obfuscation_score = min(10, len(obfuscation_hits) * 5)
+    threat_score += obfuscation_score
+    if obfuscation_score > 0:
+        details.append(f'Obfuscation: {obfuscation_score}/10 ({len(obfuscation_hits)} patterns)')
+
+    # NCD contribution (5% weight) - only if significantly different
+    if abs(ncd_delta) > 0.1:
+        ncd_score = min(5, abs(ncd_delta) * 10)
+        threat_score += ncd_score
+        if ncd_score > 2:
+            details.append(f'NCD: {to_fixed(ncd_score, 1)}/5 (delta: {to_fixed(ncd_delta, 3)})')
+
+    # Trained classifier (only with a model loaded) - confident unsafe predictions only
+    if ml_probability is not None:
+        ml_score = min(ML_MAX_SCORE, max(0, ml_probability - 0.5) * 2 * ML_MAX_SCORE)
+        threat_score += ml_score
+        if ml_score > 5:
+            details.append(f'ML: {to_fixed(ml_score, 1)}/{ML_MAX_SCORE} (P(unsafe) {to_fixed(ml_probability, 2)})')
+
+    # Safe context reduces threat
+    safe_reduction = min(15, context_score['safe'] * 15)
+    threat_score = max(0, threat_score - safe_reduction)
+    if safe_reduction > 0:
+        details.append(f'Safe context reduction: -{to_fixed(safe_reduction, 1)}')
+
+    return {
+        'score': min(max_score, js_round(threat_score)),
+        'maxScore': max_score,
+        'percentage': js_round((threat_score / max_score) * 100),
+        'details': details,
+    }
+
+
+def get_confidence_level(threat_score):
+    if threat_score >= 70:
+        return {'level': 'HIGH', 'color': 'red', 'action': 'BLOCK'}
+    if threat_score >= 50:
+        return {'level': 'MEDIUM', 'color': 'orange', 'action': 'BLOCK'}
+    if threat_score >= 30:
+        return {'level': 'LOW', 'color': 'yellow', 'action': 'REVIEW'}
+    return {'level': 'MINIMAL', 'color': 'green', 'action': 'ALLOW'}
@@ -0,0 +1,344 @@
+"""
+Asyncio load generator and latency benchmark for the gateway's HTTP API.
+
+    python3 -m safety_gateway.loadgen --concurrency 32 --duration 30
+    python3 -m safety_gateway.loadgen --rps 200 --requests 5000 --output run.json
+    python3 -m safety_gateway.loadgen --rps 200 --duration 30 --compare run.json
+
+Prompts come from safe_prompts.csv + unsafe_prompts.csv, or from --input
+(a CSV in the same format, or JSONL with one {"prompt": ...} object or JSON
+string per line), replayed in order and wrapped around.
+
+Closed loop (--concurrency N): N clients each send the next request as soon
+as their previous one finishes. Open loop (--rps R): requests start on a
+fixed schedule whatever the server's speed; latency is measured from the
+scheduled start, so queueing delay is not hidden (no coordinated omission).
+
+Only the standard library is used: requests go over a pool of persistent
+HTTP/1.1 keep-alive connections written directly on asyncio streams.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from urllib.parse import urlsplit
+
+from .datasets import DATA_FILES, load_datasets
+
+DEFAULT_URL = 'http://localhost:3001/analyze'
+
+
+class HttpConnection:
+    """One keep-alive HTTP/1.1 connection; reconnects if the server closed it."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def _ensure_open(self):
+        if self.writer is None or self.writer.is_closing():
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.writer = None
+
+    async def post(self, path, body):
+        """Send one POST; returns (status, response body bytes)."""
+        await self._ensure_open()
+        head = (
+            f'POST {path} HTTP/1.1\r\n'
+            f'Host: {self.host}:{self.port}\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            'Connection: keep-alive\r\n\r\n'
+        ).encode('ascii')
+        self.writer.write(head + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('server closed the connection')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            payload = await self._read_chunked()
+        else:
+            payload = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, payload
+
+    async def _read_chunked(self):
+        parts = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await self.reader.readline()
+                return b''.join(parts)
+            parts.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+
+class ConnectionPool:
+    def __init__(self, url, size):
+        parts = urlsplit(url)
+        if parts.scheme != 'http':
+            raise ValueError('only http:// URLs are supported')
+        self.path = parts.path or '/'
+        self._idle = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(HttpConnection(parts.hostname, parts.port or 80))
+
+    async def post(self, body):
+        connection = await self._idle.get()
+        try:
+            return await connection.post(self.path, body)
+        except BaseException:
+            # Drop the half-used stream; the next user reconnects
+            await connection.close()
+            raise
+        finally:
+            self._idle.put_nowait(connection)
+
+    async def close(self):
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
+
+
+def load_prompts(path=None):
+    """Prompts from the baseline CSVs, or from a CSV / JSONL file."""
+    if path is None:
+        return [row['text'] for row in load_datasets(DATA_FILES)]
+    if not path.endswith('.jsonl'):
+        return [row['text'] for row in load_datasets({'input': path})]
+    prompts = []
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            prompts.append(item if isinstance(item, str) else item['prompt'])
+    return prompts
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(-(-fraction * len(sorted_values) // 1)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.error_kinds = {}
+
+    def ok(self, status, latency):
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        if 200 <= status < 300:
+            self.latencies.append(latency)
+        else:
+            self.errors += 1
+
+    def failed(self, error):
+        kind = type(error).__name__
+        self.error_kinds[kind] = self.error_kinds.get(kind, 0) + 1
+        self.errors += 1
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        total = len(latencies) + self.errors
+        to_ms = 1000.0
+        return {
+            'requests': total,
+            'succeeded': len(latencies),
+            'errors': self.errors,
+            'error_rate': round(self.errors / total, 6) if total else 0.0,
+            'elapsed_s': round(elapsed, 3),
+            'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies) * to_ms, 3) if latencies else 0.0,
+                'p50': round(percentile(latencies, 0.50) * to_ms, 3),
+                'p95': round(percentile(latencies, 0.95) * to_ms, 3),
+                'p99': round(percentile(latencies, 0.99) * to_ms, 3),
+                'max': round(latencies[-1] * to_ms, 3) if latencies else 0.0,
+            },
+            'status_codes': self.statuses,
+            'error_kinds': self.error_kinds,
+        }
+
+
+async def _send(pool, body, recorder, started, timeout):
+    try:
+        status, _ = await asyncio.wait_for(pool.post(body), timeout)
+        recorder.ok(status, time.perf_counter() - started)
+    except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError) as error:
+        recorder.failed(error)
+
+
+async def run_load(url, prompts, concurrency=16, rps=None, duration=None, requests=None,
+                   extra=None, timeout=30.0, connections=None):
+    """Run one load test; returns the summary dict (see Recorder.summary)."""
+    if duration is None and requests is None:
+        duration = 10.0
+    bodies = [json.dumps({'prompt': prompt, **(extra or {})}).encode('utf-8') for prompt in prompts]
+    pool = ConnectionPool(url, connections or (concurrency if rps is None else 64))
+    recorder = Recorder()
+    start = time.perf_counter()
+    deadline = start + duration if duration is not None else None
+
+    def more(sent):
+        if requests is not None and sent >= requests:
+            return False
+        return deadline is None or time.perf_counter() < deadline
+
+    try:
+        if rps is None:
+            sent = 0
+
+            async def client():
+                nonlocal sent
+                while more(sent):
+                    body = bodies[sent % len(bodies)]
+                    sent += 1
+                    await _send(pool, body, recorder, time.perf_counter(), timeout)
+
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+        else:
+            interval = 1.0 / rps
+            tasks = []
+            sent = 0
+            while more(sent):
+                scheduled = start + sent * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.ensure_future(
+                    _send(pool, bodies[sent % len(bodies)], recorder, scheduled, timeout)))
+                sent += 1
+            await asyncio.gather(*tasks)
+    finally:
+        await pool.close()
+    return recorder.summary(time.perf_counter() - start)
+
+
+def compare(current, baseline):
+    """Rows of (metric, baseline, current, change %) for the headline numbers."""
+    rows = []
+    for label, path in (
+        ('throughput_rps', ('throughput_rps',)),
+        ('error_rate', ('error_rate',)),
+        ('p50_ms', ('latency_ms', 'p50')),
+        ('p95_ms', ('latency_ms', 'p95')),
+        ('p99_ms', ('latency_ms', 'p99')),
+    ):
+        before, after = baseline['summary'], current['summary']
+        for key in path:
+            before, after = before[key], after[key]
+        change = (after - before) / before * 100 if before else 0.0
+        rows.append((label, before, after, change))
+    return rows
+
+
+def format_summary(summary):
+    latency = summary['latency_ms']
+    return '\n'.join([
+        f"📊 {summary['requests']} requests in {summary['elapsed_s']}s "
+        f"({summary['throughput_rps']} req/s ok, error rate {summary['error_rate'] * 100:.2f}%)",
+        f"   latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  "
+        f"max {latency['max']}  mean {latency['mean']}",
+        f"   status codes: {summary['status_codes']}"
+        + (f"  errors: {summary['error_kinds']}" if summary['error_kinds'] else ''),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--input', help='CSV (prompt,label) or JSONL file; default: the baseline CSVs')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--concurrency', type=int, default=16, help='closed-loop clients (default 16)')
+    mode.add_argument('--rps', type=float, help='open-loop target requests per second')
+    parser.add_argument('--connections', type=int, help='keep-alive connections (default: concurrency, or 64 with --rps)')
+    parser.add_argument('--duration', type=float, help='seconds to run (default 10 unless --requests)')
+    parser.add_argument('--requests', type=int, help='stop after this many requests')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds')
+    parser.add_argument('--body', default='{}', help='extra JSON merged into each request body, e.g. \'{"timings": true}\'')
+    parser.add_argument('--output', help='write the result JSON here')
+    parser.add_argument('--compare', help='result JSON from an earlier run to compare against')
+    parser.add_argument('--max-p95-regression', type=float,
+                        help='with --compare: exit 1 if p95 latency grew by more than this many percent')
+    args = parser.parse_args(argv)
+
+    prompts = load_prompts(args.input)
+    if not prompts:
+        parser.error('no prompts to send')
+    config = {
+        'url': args.url,
+        'input': args.input or 'baseline CSVs',
+        'mode': 'open' if args.rps else 'closed',
+        'concurrency': None if args.rps else args.concurrency,
+        'rps': args.rps,
+        'duration': args.duration,
+        'requests': args.requests,
+        'body': json.loads(args.body),
+    }
+    print(f"🚀 {config['mode']}-loop load on {args.url} with {len(prompts)} distinct prompts")
+    summary = asyncio.run(run_load(
+        args.url, prompts,
+        concurrency=args.concurrency,
+        rps=args.rps,
+        duration=args.duration,
+        requests=args.requests,
+        extra=config['body'],
+        timeout=args.timeout,
+        connections=args.connections,
+    ))
+    result = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': config,
+        'summary': summary,
+    }
+    print(format_summary(summary))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(result, handle, indent=2)
+        print(f"💾 Result written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        print(f"\n📈 vs {args.compare}")
+        print(f"   {'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+        for label, before, after, change in compare(result, baseline):
+            print(f"   {label:<16}{before:>12}{after:>12}{change:>9.1f}%")
+        p95_change = compare(result, baseline)[3][3]
+        if args.max_p95_regression is not None and p95_change > args.max_p95_regression:
+            print(f"❌ p95 latency regressed {p95_change:.1f}% (limit {args.max_p95_regression}%)")
+            return 1
+    return 1 if summary['succeeded'] == 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
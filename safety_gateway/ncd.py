@@ -0,0 +1,166 @@
+"""
+Normalized Compression Distance, mirroring ncd.js.
+
+`compute_ncd` is the exact definition (gzip of the sample+corpus
+concatenation). `NcdEngine` caches C(corpus); in the default 'exact' mode it
+still compresses the concatenation per call, and in 'dictionary' mode
+(NCD_MODE=dictionary) it estimates C(sample + corpus) as C(corpus) plus the
+size of the sample compressed after the last 32KB of the corpus, so the
+per-prompt cost does not grow with the corpus. `NcdIndex` is the kNN mode
+(NCD_MODE=knn): mean NCD to the nearest individual exemplars, with the same
+n-gram sketch prefilter, hashes and tie-breaks as createNcdIndex() in ncd.js,
+so both pick the same candidates and, given the same compressed lengths, the
+same neighbours and distances (test_knn_parity.py). With gzip/deflate the
+lengths themselves differ by a few bytes between Node's zlib and CPython's,
+which moves the distances. Each takes an optional `compressor`
+(safety_gateway.compressors, COMPRESSOR by default).
+"""
+
+from ._js import fixed, utf8_bytes
+from .compressors import get_compressor
+
+WINDOW_SIZE = 32 * 1024
+# kNN defaults, as in ncd.js
+NGRAM_BYTES = 4
+SKETCH_SIZE = 64
+NCD_CANDIDATES = 16
+NCD_NEIGHBOURS = 3
+NCD_MAX_POSTINGS = 8192
+
+
+def ncd_from_lengths(c_sample, c_corpus, c_combined):
+    numerator = c_combined - min(c_sample, c_corpus)
+    denominator = max(c_sample, c_corpus)
+    if not denominator:
+        return 1
+    return fixed(numerator / denominator, 4)
+
+
+def compute_ncd(sample, corpus, compressor=None):
+    length = (compressor or get_compressor()).length
+    sample_buffer = utf8_bytes(sample)
+    corpus_buffer = utf8_bytes(corpus)
+    if not sample_buffer or not corpus_buffer:
+        return 1
+    c_sample = length(sample_buffer)
+    c_corpus = length(corpus_buffer)
+    c_combined = length(sample_buffer + b'\n' + corpus_buffer)
+    return ncd_from_lengths(c_sample, c_corpus, c_combined)
+
+
+class NcdEngine:
+    """NCD against one fixed corpus; see module docstring for the modes."""
+
+    def __init__(self, corpus, mode='exact', compressed_corpus_length=None, compressor=None):
+        """Pass `compressed_corpus_length` when C(corpus) is already known (a baseline snapshot)."""
+        self.mode = mode
+        self._length = (compressor or get_compressor()).length
+        self._corpus = utf8_bytes(corpus)
+        self.corpus_bytes = len(self._corpus)
+        if compressed_corpus_length is None:
+            compressed_corpus_length = self._length(self._corpus) if self._corpus else 0
+        self.compressed_corpus_length = compressed_corpus_length
+        self._conditional = (
+            None if mode != 'dictionary' or not self._corpus
+            else (compressor or get_compressor()).conditional(self._corpus[-WINDOW_SIZE:]))
+
+    def distance(self, sample_buffer, c_sample=None):
+        """NCD for UTF-8 `sample_buffer`; pass `c_sample` if C(sample) is already known."""
+        if not sample_buffer or not self.corpus_bytes:
+            return 1
+        if c_sample is None:
+            c_sample = self._length(sample_buffer)
+        c_corpus = self.compressed_corpus_length
+        if self.mode != 'dictionary':
+            return ncd_from_lengths(c_sample, c_corpus, self._length(sample_buffer + b'\n' + self._corpus))
+        c_conditional = self._conditional(b'\n' + sample_buffer)
+        return ncd_from_lengths(c_sample, c_corpus, c_corpus + c_conditional)
+
+
+def _ngram_hash(data):
+    """FNV-1a then the murmur3 finalizer, as ngramHash() in ncd.js."""
+    value = 0x811c9dc5
+    for byte in data:
+        value = ((value ^ byte) * 0x01000193) & 0xffffffff
+    value ^= value >> 16
+    value = (value * 0x85ebca6b) & 0xffffffff
+    value ^= value >> 13
+    value = (value * 0xc2b2ae35) & 0xffffffff
+    return value ^ (value >> 16)
+
+
+def sketch(data, size=SKETCH_SIZE):
+    """The `size` smallest distinct byte n-gram hashes of `data`, ascending."""
+    if not data:
+        return []
+    if len(data) <= NGRAM_BYTES:
+        return [_ngram_hash(data)]
+    hashes = {_ngram_hash(data[i:i + NGRAM_BYTES]) for i in range(len(data) - NGRAM_BYTES + 1)}
+    return sorted(hashes)[:size]
+
+
+class NcdIndex:
+    """kNN NCD over individual exemplars; see createNcdIndex() in ncd.js."""
+
+    mode = 'knn'
+
+    def __init__(self, exemplars, k=NCD_NEIGHBOURS, candidates=NCD_CANDIDATES, max_postings=NCD_MAX_POSTINGS,
+                 compressed_corpus_length=None, compressor=None):
+        self._length = (compressor or get_compressor()).length
+        self.k = k
+        self.candidates = candidates
+        self.max_postings = max_postings
+        self.compressed_corpus_length = compressed_corpus_length
+        self._entries = []
+        self._postings = {}
+        seen = set()
+        for text in exemplars:
+            if not text or text in seen:
+                continue
+            seen.add(text)
+            data = utf8_bytes(text)
+            entry_id = len(self._entries)
+            self._entries.append((text, data, self._length(data)))
+            for value in sketch(data):
+                self._postings.setdefault(value, []).append(entry_id)
+        self.corpus_bytes = sum(len(data) for _, data, _ in self._entries)
+
+    def _rank(self, sample_buffer):
+        lists = [self._postings[value] for value in sketch(sample_buffer) if value in self._postings]
+        lists.sort(key=len)
+        shared = {}
+        read = 0
+        # Shortest posting lists first, until enough ids are read (as ncd.js)
+        for postings in lists:
+            if read >= self.max_postings and len(shared) >= self.candidates:
+                break
+            read += len(postings)
+            for entry_id in postings:
+                shared[entry_id] = shared.get(entry_id, 0) + 1
+        # dicts keep first-touch order, which breaks ties as ncd.js does
+        return sorted(shared, key=lambda entry_id: -shared[entry_id])[:self.candidates]
+
+    def nearest(self, sample_buffer, c_sample=None):
+        """Up to k nearest exemplars as (text, distance), nearest first."""
+        if not sample_buffer:
+            return []
+        if c_sample is None:
+            c_sample = self._length(sample_buffer)
+        scored = []
+        for entry_id in self._rank(sample_buffer):
+            text, data, c_exemplar = self._entries[entry_id]
+            c_combined = self._length(sample_buffer + b'\n' + data)
+            scored.append((ncd_from_lengths(c_sample, c_exemplar, c_combined), entry_id, text))
+        scored.sort()
+        return [(text, distance) for distance, _, text in scored[:self.k]]
+
+    def distance(self, sample_buffer, c_sample=None):
+        """Mean NCD to the k nearest exemplars, a neighbour not found counting as 1."""
+        neighbours = min(self.k, len(self._entries))
+        if not neighbours:
+            return 1
+        found = self.nearest(sample_buffer, c_sample)
+        if not found:
+            return 1
+        total = sum(distance for _, distance in found) + neighbours - len(found)
+        return fixed(total / neighbours, 4)
@@ -0,0 +1,148 @@
+"""
+Helpers for the root test_*_parity.py scripts, which run the gateway's
+JavaScript modules with plain `node` (no server, no npm install) and compare
+them with this package.
+
+A harness is the body of an async function: it gets the JSON payload as
+`input`, may require any module from the repository root, and returns what
+is sent back as JSON:
+
+    run_node("const { analyzePrompt } = require('./detector');\\n"
+             "return input.map((p) => analyzePrompt(p));", prompts)
+
+Node's zlib (Chromium's fork) and CPython's differ by a few bytes of gzip or
+deflate output, so a harness that starts with RECORD_LENGTHS keeps every
+length compressors.js computes, and ReplayCompressor answers with them on
+the Python side.
+"""
+
+import base64
+import json
+import subprocess
+import sys
+
+from .compressors import COMPRESSOR_NAMES, get_compressor
+from .datasets import REPO_ROOT
+
+_WRAPPER = r"""
+const harness = async (input) => {
+/* harness */
+};
+let raw = '';
+process.stdin.on('data', (chunk) => { raw += chunk; });
+process.stdin.on('end', async () => {
+  const output = await harness(JSON.parse(raw));
+  process.stdout.write(JSON.stringify(output), () => process.exit(0));
+});
+"""
+
+# Wraps compressors.createCompressor before anything requires it; every
+# length is kept in recorded[name].lengths, or under conditional[dictionary]
+RECORD_LENGTHS = r"""
+const compressors = require('./compressors');
+const recorded = {};
+const createBackend = compressors.createCompressor;
+const key = (buffer) => buffer.toString('base64');
+compressors.createCompressor = (name) => {
+  const backend = createBackend(name);
+  const record = recorded[backend.name] || (recorded[backend.name] = { lengths: {}, conditional: {} });
+  return {
+    ...backend,
+    length: (buffer) => {
+      const length = backend.length(buffer);
+      record.lengths[key(buffer)] = length;
+      return length;
+    },
+    conditional: (dictionary) => {
+      const conditional = backend.conditional(dictionary);
+      const lengths = record.conditional[key(dictionary)] || (record.conditional[key(dictionary)] = {});
+      return (buffer) => {
+        const length = conditional(buffer);
+        lengths[key(buffer)] = length;
+        return length;
+      };
+    },
+  };
+};
+"""
+
+
+class NodeError(RuntimeError):
+    """A harness could not run: node is missing, or the script threw."""
+
+
+def run_node(harness, payload, env=None):
+    """Run `harness` with `payload` as its input; returns the parsed output."""
+    try:
+        completed = subprocess.run(
+            ['node', '-e', _WRAPPER.replace('/* harness */', harness)],
+            input=json.dumps(payload),
+            capture_output=True,
+            text=True,
+            cwd=REPO_ROOT,
+            env=env,
+            check=True,
+        )
+    except FileNotFoundError as error:
+        raise NodeError('node is not installed (or not on PATH)') from error
+    except subprocess.CalledProcessError as error:
+        raise NodeError(error.stderr) from error
+    return json.loads(completed.stdout)
+
+
+class ReplayCompressor:
+    """A backend answering with the lengths Node recorded; counts requests Node never made."""
+
+    def __init__(self, name, recorded):
+        self.name = name
+        self._lengths = self._decode(recorded['lengths'])
+        self._conditional = {
+            base64.b64decode(dictionary): self._decode(lengths)
+            for dictionary, lengths in recorded['conditional'].items()
+        }
+        self.misses = 0
+
+    @staticmethod
+    def _decode(lengths):
+        return {base64.b64decode(data): length for data, length in lengths.items()}
+
+    def _lookup(self, lengths, data, fallback):
+        if data in lengths:
+            return lengths[data]
+        self.misses += 1
+        return fallback(data)
+
+    def length(self, data):
+        return self._lookup(self._lengths, data, get_compressor(self.name).length)
+
+    def conditional(self, dictionary):
+        lengths = self._conditional.get(dictionary, {})
+        fallback = get_compressor(self.name).conditional(dictionary)
+        return lambda data: self._lookup(lengths, data, fallback)
+
+
+def available_compressors():
+    """COMPRESSOR_NAMES minus brotli when the `brotli` module is not installed."""
+    names = []
+    for name in COMPRESSOR_NAMES:
+        try:
+            get_compressor(name)
+        except ImportError:
+            print(f"⚠️  Skipping {name}: pip install {name}")
+            continue
+        names.append(name)
+    return names
+
+
+def run_as_script(tests, module, success):
+    """The scripts' __main__: run `tests`, exit 1 on a failed assertion or when `module` cannot run."""
+    try:
+        for test in tests:
+            test()
+    except NodeError as error:
+        print(f"❌ Could not run {module} under Node:")
+        print(error)
+        sys.exit(1)
+    except AssertionError:
+        sys.exit(1)
+    print(success)
@@ -0,0 +1,83 @@
+"""
+Detection rules mirrored from server.js.
+
+Regex sources are kept byte-for-byte identical to the JavaScript literals so
+RITD hit labels (derived from `pattern.source`) match the gateway's output.
+"""
+
+STOPWORDS = frozenset([
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them'
+])
+
+FUNCTION_WORDS = frozenset([
+    'about', 'above', 'across', 'after', 'against', 'along', 'among', 'around', 'before', 'behind', 'below', 'beneath', 'beside', 'between', 'beyond', 'during', 'except', 'from', 'into', 'near', 'over', 'through', 'toward', 'under', 'until', 'upon', 'within', 'without'
+])
+
+# Role inversion detection patterns (all compiled case-insensitive)
+BASE_TRIGGERS = [
+    r"(?:ignore|forget|disregard).{0,20}(?:previous|above|prior|earlier)",
+    r"(?:act|behave|pretend).{0,20}(?:as|like).{0,20}(?:different|another|new|hacker)",
+    r"(?:system|admin|root|developer).{0,20}(?:mode|access|override|bypass)",
+    r"(?:reveal|show|tell|give).{0,20}(?:secret|hidden|confidential|private)",
+    r"(?:delete|remove|disable|uninstall).{0,20}(?:antivirus|security|defender|firewall|protection)",
+    r"(?:bypass|circumvent|evade).{0,20}(?:security|protection|detection|firewall)",
+    r"(?:hide|conceal).{0,20}(?:malware|virus|attack)",
+    r"(?:silently|secretly|without detection).{0,20}(?:delete|remove|disable|install)",
+    # HTML/XML injection and comment-based attacks
+    r"<!--.*(?:system|override|disable|unrestricted|filter|admin|root).*-->",
+    r"<script.*>.*<\/script>",
+    r"(?:system|admin|root)\s*:\s*(?:respond|output|disable|override|enable)",
+    r"(?:disable|remove|bypass|ignore).{0,20}(?:content filter|safety|restriction|limitation)",
+    r"(?:unrestricted|unfiltered|uncensored).{0,20}(?:output|response|mode|access)",
+    # Hacking and unauthorized access patterns
+    r"\b(?:hack|hacking|hacked|hacker|hacks)\b.{0,30}(?:computer|system|network|server|database|account|password|access|data)",
+    r"(?:hack|hacking|hacked|hacker).{0,20}(?:into|the|a|an|my|your|their)",
+    r"(?:enter|break|get|gain|obtain).{0,20}(?:into|access to).{0,30}(?:system|computer|network|server|database|account|level|duos)",
+    r"(?:unauthorized|illegal|illegitimate).{0,20}(?:access|entry|entry|intrusion)",
+    r"(?:crack|cracking|cracked).{0,20}(?:password|code|encryption|security|system)",
+    r"(?:exploit|exploiting|exploited).{0,20}(?:vulnerability|bug|weakness|system|security)",
+    r"(?:penetrate|penetration|breach|breaching).{0,20}(?:security|system|network|firewall|defense)",
+    r"(?:steal|stealing|steals|stolen).{0,20}(?:data|information|credentials|password|account)",
+    r"(?:inject|injecting|injection).{0,20}(?:code|malware|virus|payload|script)",
+    r"(?:backdoor|trojan|rootkit|keylogger|spyware|ransomware)",
+]
+
+# Dangerous keywords that should trigger blocking
+DANGEROUS_KEYWORDS = [
+    'hack', 'hacking', 'hacked', 'hacker', 'crack', 'cracking', 'exploit', 'exploiting',
+    'breach', 'breaching', 'penetrate', 'penetration', 'unauthorized access', 'illegal access',
+    'steal data', 'steal information', 'backdoor', 'trojan', 'rootkit', 'keylogger',
+    'spyware', 'ransomware', 'malware', 'virus injection', 'sql injection', 'xss',
+    'ddos', 'phishing', 'social engineering', 'privilege escalation', 'buffer overflow',
+    # Weapons and illegal activities
+    'bomb', 'explosive', 'weapon', 'gun', 'rifle', 'ammunition', 'grenade', 'c4',
+    'pipe bomb', 'molotov', 'ied', 'detonator', 'dynamite', 'tnt',
+    'poison', 'toxin', 'ricin', 'cyanide', 'anthrax',
+    'drug manufacturing', 'meth lab', 'cocaine production', 'heroin synthesis'
+]
+
+# (source, ignore_case) pairs; detectObfuscation reports them by 1-based index
+OBFUSCATION_PATTERNS = [
+    (r"\b(?:base64|hex|binary|encoded|decoded|obfuscated)\b", True),
+    (r"[A-Za-z0-9+\/]{20,}={0,2}", False),  # Base64-like patterns
+    (r"0x[0-9a-fA-F]{4,}", False),  # Hex patterns
+    (r"%[0-9a-fA-F]{2}", False),  # URL encoding
+    (r"&#x?[0-9a-fA-F]+;", False),  # HTML entities
+    (r"[^\x20-\x7E]{3,}", False),  # Non-printable characters
+]
+
+# Suspicious context indicators
+SUSPICIOUS_CONTEXTS = [
+    (r"(?:how|what|way|method|technique).{0,30}(?:to|can|do|should).{0,30}(?:hack|crack|break|steal|exploit)", 0.8),
+    (r"(?:help|assist|guide|teach).{0,30}(?:me|us|you).{0,30}(?:hack|crack|break|steal|exploit)", 0.9),
+    (r"(?:i|we|they).{0,20}(?:want|need|trying|attempting).{0,30}(?:to|to).{0,30}(?:hack|crack|break|steal|exploit)", 0.85),
+    (r"(?:show|tell|give|provide).{0,20}(?:me|us).{0,30}(?:code|script|method|way).{0,30}(?:to|for).{0,30}(?:hack|crack|break)", 0.9),
+    (r"(?:bypass|circumvent|evade|override).{0,30}(?:security|protection|safety|guard|defense)", 0.95),
+]
+
+# Safe context indicators (reduce suspicion)
+SAFE_CONTEXTS = [
+    (r"(?:explain|describe|what is|tell me about|how does).{0,30}(?:security|hacking|cybersecurity)", -0.3),
+    (r"(?:learn|study|understand|education|academic|research)", -0.2),
+    (r"(?:prevent|protect|defend|secure|guard)", -0.4),
+]
@@ -0,0 +1,336 @@
+"""
+Offline bulk scan of recorded prompts with the gateway's detection layers.
+
+    python3 -m safety_gateway.scan logs/2024-06-*.jsonl --output verdicts.jsonl
+    python3 -m safety_gateway.scan prompts.csv notes.txt --output verdicts.jsonl --workers 8
+    python3 -m safety_gateway.scan logs/*.jsonl --output verdicts.jsonl --resume
+
+Input formats follow the file extension:
+- .csv: the `text` or `prompt` column when the header names one, else the
+  first column (the header row is then data).
+- .jsonl / .ndjson: a JSON string, or an object with "prompt" or "text", per
+  line.
+- anything else: one prompt per line.
+
+Blank lines are skipped. A line that cannot be parsed, or is not valid
+UTF-8, still gets a record, with "error" instead of a verdict.
+
+Prompts are scored in batches by a multiprocessing pool, each worker holding
+its own GatewayEngine. Nothing goes over HTTP and nothing is sent to Ollama.
+Output is one JSON object per input record, in input order: source file,
+record number (line number for JSONL/text), result, threat score and the
+per-layer scores.
+
+Python's `re` cannot be interrupted, so a hostile prompt can keep a worker
+busy for good. A batch that takes longer than --batch-timeout seconds gets
+an "error" record per prompt, and the pool is restarted; --workers 1 scores
+inline and has no timeout.
+
+Every --checkpoint-every seconds the output is flushed and fsync'ed and
+`<output>.checkpoint` records how many records of each input are done.
+--resume truncates the output back to that point and carries on, so an
+interrupted scan never duplicates or loses a record. Progress (rows/s) goes
+to stderr.
+"""
+
+import argparse
+import collections
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+from .engine import GatewayEngine
+
+CHECKPOINT_FORMAT = 1
+TEXT_COLUMNS = ('text', 'prompt')
+# Bytes that are not UTF-8 come through `surrogateescape` as lone low surrogates
+UNDECODABLE = re.compile('[\udc80-\udcff]')
+
+_engine = None
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    return 'text'
+
+
+def iter_records(path):
+    """Yield (position, prompt, error) for every record of `path`; exactly one of prompt/error is set."""
+    fmt = detect_format(path)
+    with open(path, encoding='utf-8', errors='surrogateescape', newline='' if fmt == 'csv' else None) as handle:
+        if fmt == 'csv':
+            reader = csv.reader(handle)
+            header = next(reader, None)
+            if header is None:
+                return
+            names = [name.strip().lower() for name in header]
+            column = next((names.index(name) for name in TEXT_COLUMNS if name in names), None)
+            rows = reader
+            if column is None:
+                column = 0
+                rows = itertools.chain([header], reader)
+            for number, fields in enumerate(rows, 1):
+                if not fields or fields == ['']:
+                    continue
+                if column >= len(fields):
+                    yield number, None, f'no column {column}'
+                elif UNDECODABLE.search(fields[column]):
+                    yield number, None, 'not valid UTF-8'
+                else:
+                    yield number, fields[column], None
+            return
+
+        for number, line in enumerate(handle, 1):
+            line = line.rstrip('\r\n')
+            if not line.strip():
+                continue
+            if UNDECODABLE.search(line):
+                yield number, None, 'not valid UTF-8'
+                continue
+            if fmt == 'text':
+                yield number, line, None
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError as error:
+                yield number, None, f'invalid JSON: {error}'
+                continue
+            if isinstance(value, dict):
+                value = value.get('prompt', value.get('text'))
+            if isinstance(value, str):
+                yield number, value, None
+            else:
+                yield number, None, 'no "prompt" or "text" string'
+
+
+def summarize(source, position, analysis):
+    """The JSONL record for one analysis: verdict plus each layer's scores."""
+    layers = analysis['layers']
+    threat = analysis['threatAnalysis']
+    record = {
+        'source': source,
+        'record': position,
+        'result': analysis['result'],
+        'threatScore': threat['threatScore'],
+        'confidence': threat['confidence'],
+        'layers': {
+            'RITD': {'status': layers['RITD']['status'], 'hits': layers['RITD']['hits']},
+            'NCD': {
+                'status': layers['NCD']['status'],
+                'entropyScore': layers['NCD']['entropyScore'],
+                'ncdDelta': layers['NCD']['ncdDelta'],
+            },
+            'LDF': {'status': layers['LDF']['status'], 'deviationScore': layers['LDF']['deviationScore']},
+            'CONTEXT': {
+                'status': layers['CONTEXT']['status'],
+                'suspiciousScore': layers['CONTEXT']['suspiciousScore'],
+                'safeScore': layers['CONTEXT']['safeScore'],
+            },
+            'OBFUSCATION': {'status': layers['OBFUSCATION']['status'], 'hits': layers['OBFUSCATION']['hits']},
+        },
+    }
+    if 'ML' in layers:
+        record['layers']['ML'] = {'status': layers['ML']['status'], 'probability': layers['ML']['probability']}
+    return record
+
+
+def _init_worker():
+    global _engine
+    _engine = GatewayEngine()
+
+
+def score_batch(batch):
+    """Worker task: [(source, position, prompt, error, include_prompt)] -> (JSONL text, blocked, errors)."""
+    lines = []
+    blocked = errors = 0
+    for source, position, prompt, error, include_prompt in batch:
+        if error is not None:
+            record = {'source': source, 'record': position, 'error': error}
+            errors += 1
+        else:
+            record = summarize(source, position, _engine.analyze_prompt(prompt))
+            blocked += record['result'] == 'BLOCKED'
+            if include_prompt:
+                record['prompt'] = prompt
+        lines.append(json.dumps(record, ensure_ascii=False) + '\n')
+    return ''.join(lines), blocked, errors
+
+
+def timed_out(batch, seconds):
+    """score_batch's result for a batch a worker did not finish in time: an error per record."""
+    lines = [json.dumps({'source': source, 'record': position, 'error': f'scoring timed out after {seconds:g}s'},
+                        ensure_ascii=False) + '\n'
+             for source, position, *_ in batch]
+    return ''.join(lines), 0, len(batch)
+
+
+def read_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, checkpoint):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        json.dump(checkpoint, handle)
+    os.replace(tmp_path, path)
+
+
+class Progress:
+    """Rows/s on stderr, at most every `interval` seconds."""
+
+    def __init__(self, interval, stream=sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.rows = 0
+        self.blocked = 0
+        self.errors = 0
+
+    def add(self, rows, blocked, errors):
+        self.rows += rows
+        self.blocked += blocked
+        self.errors += errors
+        now = time.perf_counter()
+        if self.interval and now - self.last >= self.interval:
+            self.last = now
+            self.report(final=False)
+
+    def report(self, final=True):
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows / elapsed if elapsed else 0.0
+        label = 'done' if final else 'scanned'
+        print(f'[scan] {label} {self.rows} rows in {elapsed:.1f}s ({rate:.0f} rows/s), '
+              f'{self.blocked} blocked, {self.errors} errors', file=self.stream, flush=True)
+
+
+def iter_tasks(inputs, done, batch_size, include_prompt):
+    """Batches of worker items across every input, skipping records a checkpoint covers.
+
+    Yields (source, batch) with batches never spanning two files, so the
+    checkpoint can count completed records per file.
+    """
+    for source in inputs:
+        records = itertools.islice(iter_records(source), done.get(source, 0), None)
+        while True:
+            chunk = list(itertools.islice(records, batch_size))
+            if not chunk:
+                break
+            yield source, [(source, position, prompt, error, include_prompt) for position, prompt, error in chunk]
+
+
+def scan(inputs, output, workers=None, batch_size=256, resume=False, include_prompt=False,
+         checkpoint_every=10.0, progress_every=2.0, batch_timeout=300.0):
+    """Score every record of `inputs` into `output`; returns the final Progress."""
+    checkpoint_path = f'{output}.checkpoint'
+    checkpoint = read_checkpoint(checkpoint_path) if resume else None
+    if checkpoint:
+        if checkpoint.get('format') != CHECKPOINT_FORMAT or checkpoint.get('inputs') != inputs:
+            raise SystemExit(f'{checkpoint_path} was written for other inputs; rerun without --resume')
+        if not os.path.exists(output) or os.path.getsize(output) < checkpoint['outputBytes']:
+            raise SystemExit(f'{output} is missing or shorter than {checkpoint_path} records; '
+                             'rerun without --resume')
+        handle = open(output, 'r+b')
+        handle.truncate(checkpoint['outputBytes'])
+        handle.seek(checkpoint['outputBytes'])
+    else:
+        checkpoint = {'format': CHECKPOINT_FORMAT, 'inputs': inputs, 'done': {}, 'outputBytes': 0}
+        handle = open(output, 'wb')
+
+    done = dict(checkpoint['done'])
+    progress = Progress(progress_every)
+
+    def save():
+        handle.flush()
+        os.fsync(handle.fileno())
+        write_checkpoint(checkpoint_path, {**checkpoint, 'done': done, 'outputBytes': handle.tell(),
+                                           'updatedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())})
+
+    workers = workers or os.cpu_count() or 1
+    pool = multiprocessing.Pool(workers, initializer=_init_worker) if workers > 1 else None
+    if pool is None:
+        _init_worker()
+
+    def submit(batch):
+        return pool.apply_async(score_batch, (batch,)) if pool else score_batch(batch)
+
+    # A bounded window of batches in flight: Pool.imap would read every input
+    # up front, and the logs may not fit in memory
+    pending = collections.deque()
+    last_save = time.perf_counter()
+    try:
+        tasks = iter_tasks(inputs, done, batch_size, include_prompt)
+        while True:
+            while len(pending) < workers * 4:
+                task = next(tasks, None)
+                if task is None:
+                    break
+                source, batch = task
+                pending.append((source, batch, submit(batch)))
+            if not pending:
+                break
+            source, batch, outcome = pending.popleft()
+            if pool is None:
+                text, blocked, errors = outcome
+            else:
+                try:
+                    text, blocked, errors = outcome.get(timeout=batch_timeout or None)
+                except multiprocessing.TimeoutError:
+                    text, blocked, errors = timed_out(batch, batch_timeout)
+                    # The stuck worker cannot be stopped on its own: replace
+                    # the pool and send it the batches still waiting
+                    pool.terminate()
+                    pool.join()
+                    pool = multiprocessing.Pool(workers, initializer=_init_worker)
+                    pending = collections.deque((source, batch, submit(batch)) for source, batch, _ in pending)
+            handle.write(text.encode('utf-8'))
+            done[source] = done.get(source, 0) + len(batch)
+            progress.add(len(batch), blocked, errors)
+            if time.perf_counter() - last_save >= checkpoint_every:
+                save()
+                last_save = time.perf_counter()
+        save()
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+        handle.close()
+    progress.report()
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('inputs', nargs='+', help='CSV, JSONL or plain-text prompt files')
+    parser.add_argument('--output', required=True, help='JSONL verdicts, one record per input record')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='scoring processes (1 = inline)')
+    parser.add_argument('--batch-size', type=int, default=256, help='prompts per task sent to a worker')
+    parser.add_argument('--resume', action='store_true', help='continue from <output>.checkpoint')
+    parser.add_argument('--include-prompt', action='store_true', help='copy each prompt into its record')
+    parser.add_argument('--checkpoint-every', type=float, default=10.0, help='seconds between checkpoints')
+    parser.add_argument('--progress-every', type=float, default=2.0, help='seconds between progress lines (0 = off)')
+    parser.add_argument('--batch-timeout', type=float, default=300.0,
+                        help='seconds a worker may spend on one batch before its records become errors (0 = none)')
+    args = parser.parse_args(argv)
+
+    inputs = [os.path.abspath(path) for path in args.inputs]
+    scan(inputs, args.output, args.workers, args.batch_size, args.resume, args.include_prompt,
+         args.checkpoint_every, args.progress_every, args.batch_timeout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
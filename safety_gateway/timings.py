@@ -0,0 +1,174 @@
+"""
+Per-layer timing helpers for /analyze responses sent with {"timings": true}
+(or a server started with LAYER_TIMINGS=1), and for GatewayEngine timings.
+
+    stats = LayerTimings()
+    data = requests.post(url, json={"prompt": p, "timings": True}).json()
+    print(format_timings(data["timings"]))
+    stats.add(data["timings"])
+    ...
+    print(stats.report())
+
+All values are nanoseconds, as measured by process.hrtime.bigint() in
+server.js (time.perf_counter_ns() in the Python engine).
+
+A timed request always runs every layer, bypassing the verdict cache that
+answers most real traffic. CachedPass resends the same prompts untimed so
+that path is exercised too:
+
+    cached = CachedPass()
+    cached.add(p, data)
+    ...
+    print(cached.replay())
+
+The root test_*.py scripts do both through TimedSession, which prints each
+prompt's breakdown only when SHOW_TIMINGS=1:
+
+    gateway = TimedSession()
+    response = gateway.analyze(p)
+    ...
+    print(gateway.report())
+"""
+
+import os
+
+LAYERS = ('RITD', 'NCD', 'LDF', 'CONTEXT', 'OBFUSCATION', 'ML', 'scoring')
+SHOW_TIMINGS = os.environ.get('SHOW_TIMINGS') == '1'
+
+
+def format_timings(timings):
+    """One line per layer with its share of the total, slowest layer marked."""
+    if not timings:
+        return '    (no timings in response; send "timings": true)'
+    total = timings.get('totalNs') or sum(timings.get(layer, 0) for layer in LAYERS)
+    slowest = max(LAYERS, key=lambda layer: timings.get(layer, 0))
+    lines = []
+    for layer in LAYERS:
+        if layer == 'ML' and layer not in timings:
+            continue  # no model loaded
+        ns = timings.get(layer, 0)
+        share = ns / total * 100 if total else 0
+        marker = '  ◀ slowest' if layer == slowest else ''
+        lines.append(f"    ├─ {layer:<12}{ns / 1000:>10.1f} µs  {share:5.1f}%{marker}")
+    lines.append(f"    └─ {'total':<12}{total / 1000:>10.1f} µs")
+    return '\n'.join(lines)
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class LayerTimings:
+    """Collects timings blocks and summarizes them per layer."""
+
+    def __init__(self):
+        self.samples = {layer: [] for layer in LAYERS + ('totalNs',)}
+
+    def add(self, timings):
+        if not timings:
+            return
+        for layer, values in self.samples.items():
+            if layer in timings:
+                values.append(timings[layer])
+
+    def summary(self):
+        """{layer: {count, mean_us, p50_us, p95_us, max_us}} for layers with samples."""
+        result = {}
+        for layer, values in self.samples.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            result[layer] = {
+                'count': len(ordered),
+                'mean_us': sum(ordered) / len(ordered) / 1000,
+                'p50_us': _percentile(ordered, 0.50) / 1000,
+                'p95_us': _percentile(ordered, 0.95) / 1000,
+                'max_us': ordered[-1] / 1000,
+            }
+        return result
+
+    def report(self):
+        summary = self.summary()
+        if not summary:
+            return '⏱️  No layer timings collected'
+        lines = [
+            f"⏱️  LAYER TIMINGS ({summary[next(iter(summary))]['count']} prompts, µs)",
+            f"    {'layer':<12}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}",
+        ]
+        for layer, row in summary.items():
+            name = 'total' if layer == 'totalNs' else layer
+            lines.append(
+                f"    {name:<12}{row['mean_us']:>10.1f}{row['p50_us']:>10.1f}"
+                f"{row['p95_us']:>10.1f}{row['max_us']:>10.1f}"
+            )
+        return '\n'.join(lines)
+
+
+def _verdict(data):
+    layers = data.get('layers') or {}
+    threat = data.get('threatAnalysis') or {}
+    return (
+        data.get('result'),
+        threat.get('threatScore'),
+        threat.get('recommendedAction'),
+        tuple(sorted((name, layer.get('status')) for name, layer in layers.items())),
+    )
+
+
+class CachedPass:
+    """Replays timed /analyze prompts without timings and checks the cached verdicts."""
+
+    def __init__(self, url='http://localhost:3001/analyze'):
+        self.url = url
+        self.stats_url = url.rsplit('/analyze', 1)[0] + '/cache/stats'
+        self.expected = {}
+
+    def add(self, prompt, data):
+        self.expected[prompt] = _verdict(data)
+
+    def replay(self):
+        import requests
+
+        if not self.expected:
+            return '🗄️  No prompts to replay through the verdict cache'
+        hits_before = requests.get(self.stats_url, timeout=10).json().get('hits', 0)
+        mismatches = []
+        for prompt, expected in self.expected.items():
+            data = requests.post(self.url, json={'prompt': prompt}, timeout=10).json()
+            if _verdict(data) != expected:
+                mismatches.append((prompt, expected[0], data.get('result')))
+        hits = requests.get(self.stats_url, timeout=10).json().get('hits', 0) - hits_before
+        lines = [f"🗄️  CACHED PASS: {len(self.expected)} prompts resent without timings, {hits} cache hits"]
+        for prompt, expected, actual in mismatches:
+            lines.append(f"    ❌ {prompt[:50]!r}: timed {expected}, cached {actual}")
+        if not mismatches:
+            lines.append('    ✅ Cached verdicts match the timed ones')
+        return '\n'.join(lines)
+
+
+class TimedSession:
+    """Posts prompts to /analyze with timings, recording them for report()."""
+
+    def __init__(self, url='http://localhost:3001/analyze', show=SHOW_TIMINGS):
+        self.url = url
+        self.show = show
+        self.timings = LayerTimings()
+        self.cached = CachedPass(url)
+
+    def analyze(self, prompt, timeout=10):
+        import requests
+
+        response = requests.post(self.url, json={'prompt': prompt, 'timings': True}, timeout=timeout)
+        if response.status_code == 200:
+            data = response.json()
+            self.timings.add(data.get('timings'))
+            self.cached.add(prompt, data)
+            if self.show:
+                print("\n⏱️  Layer timings:")
+                print(format_timings(data.get('timings')))
+        return response
+
+    def report(self):
+        """The per-layer summary, then the untimed replay through the verdict cache."""
+        return f"{self.timings.report()}\n{self.cached.replay()}"
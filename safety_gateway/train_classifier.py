@@ -0,0 +1,235 @@
+"""
+Out-of-core training for the ML layer: HashingVectorizer + SGDClassifier.
+
+    python3 -m safety_gateway.train_classifier train --input safe.csv --input unsafe.csv --output model.npz
+    python3 -m safety_gateway.train_classifier evaluate model.npz --input held_out.csv
+    python3 -m safety_gateway.train_classifier export model.npz --output ml.weights.json
+
+`train` streams labeled CSVs (text,label as in safe_prompts.csv; the default
+datasets without --input) through partial_fit in batches, so corpus size is
+bounded by disk, not RAM. The vectorizer is stateless, so there is no
+vocabulary to hold or fit. Batches take rows from every input file in turn
+and are shuffled, because a file holds one label and SGD must not see the
+labels one at a time.
+
+The model file is a compressed .npz holding the non-zero weights (column
+indexes and float32 values), the intercept and the vectorizer settings. It
+loads in milliseconds and scores batches as one sparse matrix product
+(load_model, predict_proba). `export` writes the plain JSON weight table
+that classifier.js scores natively in detector.js (ML_MODEL) and
+safety_gateway.classifier scores in GatewayEngine. It checks that the
+table's probabilities match the model's.
+
+Requires NumPy and scikit-learn (`pip install numpy scikit-learn`).
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import sys
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+from ._js import py_string
+from .classifier import TABLE_FORMAT, Classifier
+from .datasets import DATA_FILES, iter_labeled_rows
+
+DEFAULT_N_FEATURES = 2 ** 20
+DEFAULT_NGRAM_RANGE = (1, 2)
+MODEL_FORMAT = 1
+
+
+def make_vectorizer(n_features=DEFAULT_N_FEATURES, ngram_range=DEFAULT_NGRAM_RANGE):
+    # classifier.js reproduces exactly these settings
+    return HashingVectorizer(
+        n_features=n_features,
+        ngram_range=tuple(ngram_range),
+        alternate_sign=True,
+        norm='l2',
+        lowercase=True,
+    )
+
+
+def iter_batches(files, batch_size, seed=0):
+    """(texts, labels) batches drawing rows from every file in turn, shuffled."""
+    rng = np.random.default_rng(seed)
+    streams = [iter_labeled_rows(path) for path in files]
+    share = max(1, batch_size // max(len(streams), 1))
+    while streams:
+        rows = []
+        for stream in list(streams):
+            taken = list(itertools.islice(stream, share))
+            if len(taken) < share:
+                streams.remove(stream)
+            rows.extend(taken)
+        if not rows:
+            break
+        order = rng.permutation(len(rows))
+        yield [py_string(rows[i]['text']) for i in order], np.array([rows[i]['label'] == 'unsafe' for i in order], dtype=int)
+
+
+class HashingModel:
+    """A trained linear model over hashed features, independent of SGDClassifier."""
+
+    def __init__(self, columns, weights, intercept, n_features, ngram_range):
+        self.columns = np.asarray(columns, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.intercept = float(intercept)
+        self.n_features = int(n_features)
+        self.ngram_range = tuple(int(n) for n in ngram_range)
+        self.vectorizer = make_vectorizer(self.n_features, self.ngram_range)
+        self.coef = np.zeros(self.n_features, dtype=np.float64)
+        self.coef[self.columns] = self.weights
+
+    @classmethod
+    def from_estimator(cls, estimator, n_features, ngram_range):
+        coef = estimator.coef_.ravel()
+        columns = np.flatnonzero(coef)
+        return cls(columns, coef[columns], estimator.intercept_[0], n_features, ngram_range)
+
+    def decision_function(self, texts):
+        return self.vectorizer.transform(texts) @ self.coef + self.intercept
+
+    def predict_proba(self, texts):
+        """P(unsafe) per text, as a float array."""
+        return 1 / (1 + np.exp(-self.decision_function(texts)))
+
+    def version(self):
+        digest = hashlib.sha256()
+        digest.update(self.columns.tobytes())
+        digest.update(self.weights.tobytes())
+        digest.update(repr((self.intercept, self.n_features, self.ngram_range)).encode())
+        return digest.hexdigest()[:16]
+
+
+def train(files, n_features=DEFAULT_N_FEATURES, ngram_range=DEFAULT_NGRAM_RANGE,
+          batch_size=10000, epochs=1, alpha=1e-6, seed=0, log=None):
+    vectorizer = make_vectorizer(n_features, ngram_range)
+    estimator = SGDClassifier(loss='log_loss', alpha=alpha, random_state=seed)
+    seen = 0
+    for epoch in range(epochs):
+        for texts, labels in iter_batches(files, batch_size, seed + epoch):
+            estimator.partial_fit(vectorizer.transform(texts), labels, classes=[0, 1])
+            seen += len(texts)
+            if log:
+                log(f'epoch {epoch + 1}: {seen} rows')
+    if not seen:
+        raise ValueError('no labeled rows to train on')
+    return HashingModel.from_estimator(estimator, n_features, ngram_range)
+
+
+def save_model(path, model):
+    np.savez_compressed(
+        path,
+        columns=model.columns,
+        weights=model.weights,
+        meta=np.array(json.dumps({
+            'format': MODEL_FORMAT,
+            'intercept': model.intercept,
+            'nFeatures': model.n_features,
+            'ngramRange': list(model.ngram_range),
+        })),
+    )
+
+
+def load_model(path):
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        if meta.get('format') != MODEL_FORMAT:
+            raise ValueError(f"Unsupported model format {meta.get('format')} (expected {MODEL_FORMAT})")
+        return HashingModel(data['columns'], data['weights'], meta['intercept'], meta['nFeatures'], meta['ngramRange'])
+
+
+def weight_table(model, min_weight=0.0):
+    """The JSON-ready table classifier.js and safety_gateway.classifier score."""
+    keep = np.abs(model.weights) > min_weight
+    return {
+        'format': TABLE_FORMAT,
+        'version': model.version(),
+        'nFeatures': model.n_features,
+        'ngramRange': list(model.ngram_range),
+        'alternateSign': True,
+        'intercept': model.intercept,
+        'columns': model.columns[keep].tolist(),
+        'weights': [float(w) for w in model.weights[keep]],
+    }
+
+
+def evaluate(model, rows, threshold=0.5):
+    texts = [py_string(row['text']) for row in rows]
+    labels = np.array([row['label'] == 'unsafe' for row in rows])
+    predicted = model.predict_proba(texts) >= threshold
+    tp = int(np.count_nonzero(predicted & labels))
+    fp = int(np.count_nonzero(predicted & ~labels))
+    fn = int(np.count_nonzero(~predicted & labels))
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        'rows': len(texts),
+        'accuracy': float(np.mean(predicted == labels)) if texts else 0.0,
+        'precision': precision,
+        'recall': recall,
+        'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fit = commands.add_parser('train', help='stream labeled CSVs through partial_fit')
+    fit.add_argument('--input', action='append', help='labeled CSV (repeatable); default: the baseline datasets')
+    fit.add_argument('--output', default='ml.model.npz')
+    fit.add_argument('--n-features', type=int, default=DEFAULT_N_FEATURES)
+    fit.add_argument('--ngram-max', type=int, default=DEFAULT_NGRAM_RANGE[1], help='longest word n-gram')
+    fit.add_argument('--batch-size', type=int, default=10000)
+    fit.add_argument('--epochs', type=int, default=1)
+    fit.add_argument('--alpha', type=float, default=1e-6, help='SGD regularisation strength')
+    fit.add_argument('--seed', type=int, default=0)
+
+    check = commands.add_parser('evaluate', help='accuracy, precision and recall on a labeled CSV')
+    check.add_argument('model')
+    check.add_argument('--input', action='append', help='labeled CSV (repeatable); default: the baseline datasets')
+    check.add_argument('--threshold', type=float, default=0.5)
+
+    export = commands.add_parser('export', help='write the JSON weight table for classifier.js')
+    export.add_argument('model')
+    export.add_argument('--output', default='ml.weights.json')
+    export.add_argument('--min-weight', type=float, default=0.0, help='drop weights with |w| at or below this')
+    args = parser.parse_args(argv)
+
+    if args.command == 'train':
+        files = args.input or list(DATA_FILES.values())
+        model = train(files, args.n_features, (1, args.ngram_max), args.batch_size, args.epochs, args.alpha,
+                      args.seed, log=lambda message: print(message, file=sys.stderr))
+        save_model(args.output, model)
+        print(f'Model with {model.columns.size} non-zero weights written to {args.output} (version {model.version()})')
+        return 0
+
+    model = load_model(args.model)
+    if args.command == 'evaluate':
+        files = args.input or list(DATA_FILES.values())
+        rows = [row for path in files for row in iter_labeled_rows(path)]
+        print(json.dumps(evaluate(model, rows, args.threshold), indent=2))
+        return 0
+
+    table = weight_table(model, args.min_weight)
+    # The table must score like the model (pruning aside) before anything ships it
+    sample = [row['text'] for path in DATA_FILES.values() for row in iter_labeled_rows(path)][:500]
+    if sample and not args.min_weight:
+        scorer = Classifier(table)
+        expected = model.predict_proba([py_string(text) for text in sample])
+        drift = max(abs(scorer.predict(text) - p) for text, p in zip(sample, expected))
+        if drift > 1e-5:
+            raise SystemExit(f'Weight table disagrees with the model (max probability difference {drift:.2e})')
+    with open(args.output, 'w', encoding='utf-8') as handle:
+        json.dump(table, handle, separators=(',', ':'))
+    print(f"Weight table with {len(table['columns'])} columns written to {args.output} (version {table['version']})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
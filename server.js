@@ -1,10 +1,26 @@
 const fastify = require('fastify')({ logger: true });
-const fs = require('fs');
-const { gzipSync } = require('zlib');
-const path = require('path');
-const axios = require('axios');
+const crypto = require('crypto');
 const os = require('os');
+const { PassThrough } = require('stream');
 const { getAnswer } = require('./answer');
+const ollama = require('./ollama');
+const { createVerdictCache, promptKey } = require('./cache');
+const { createNearDuplicateIndex } = require('./nearDuplicates');
+const {
+  FEEDBACK_CHECKPOINT,
+  analyzePrompt,
+  analyzePromptFast,
+  baselines,
+  computeVerdictVersion,
+  describeBaselineSource,
+  screenMatches,
+  reuseVerdict,
+  setBaselines,
+} = require('./detector');
+const { createAnalyzerPool } = require('./workerPool');
+const { createFeedbackLearner } = require('./feedback');
+const { counters } = require('./counters');
+const metrics = require('./metrics');
 
 // Register CORS
 fastify.register(require('@fastify/cors'), {
@@ -12,112 +28,202 @@ fastify.register(require('@fastify/cors'), {
 });
 
 const PORT = process.env.PORT || 3001;
+const MAX_BATCH_SIZE = Number(process.env.MAX_BATCH_SIZE) || 10000;
+const BATCH_BODY_LIMIT = Number(process.env.BATCH_BODY_LIMIT) || 50 * 1024 * 1024;
+// VERDICT_CACHE_SIZE=0 disables the verdict cache
+const VERDICT_CACHE_SIZE = process.env.VERDICT_CACHE_SIZE === undefined ? 10000 : Number(process.env.VERDICT_CACHE_SIZE);
+const VERDICT_CACHE_TTL_MS = Number(process.env.VERDICT_CACHE_TTL_MS) || 10 * 60 * 1000;
+// NEAR_DUPLICATES=1 lets a prompt reuse the verdict of a recently analyzed one at
+// least NEAR_DUPLICATE_THRESHOLD similar (see nearDuplicates.js), once the rule
+// layers (RITD, CONTEXT, OBFUSCATION) have run on it and found the same hits
+const NEAR_DUPLICATES = process.env.NEAR_DUPLICATES === '1';
+const NEAR_DUPLICATE_THRESHOLD = Number(process.env.NEAR_DUPLICATE_THRESHOLD) || 0.9;
+const NEAR_DUPLICATE_SIZE = Number(process.env.NEAR_DUPLICATE_SIZE) || 10000;
+const NEAR_DUPLICATE_TTL_MS = Number(process.env.NEAR_DUPLICATE_TTL_MS) || VERDICT_CACHE_TTL_MS;
+// ANALYZE_WORKERS=0 (default) scores prompts on the event loop; N > 0 uses a worker_threads pool
+const ANALYZE_WORKERS = Number(process.env.ANALYZE_WORKERS) || 0;
+const ANALYZE_QUEUE_DEPTH = Number(process.env.ANALYZE_QUEUE_DEPTH) || 1000;
+// LAYER_TIMINGS=1 attaches per-layer timings to every response; otherwise send { "timings": true }
+const LAYER_TIMINGS = process.env.LAYER_TIMINGS === '1';
+// FAST_VERDICTS=1 answers with analyzePromptFast unless the body has { "explain": true };
+// otherwise requests get the full analysis unless they send { "explain": false }
+const FAST_VERDICTS = process.env.FAST_VERDICTS === '1';
+// FEEDBACK=1 enables POST /feedback, which updates the baselines from labeled prompts;
+// callers must send `Authorization: Bearer <FEEDBACK_TOKEN>`, so FEEDBACK=1 needs a token
+const FEEDBACK = process.env.FEEDBACK === '1';
+const FEEDBACK_TOKEN = process.env.FEEDBACK_TOKEN || '';
+if (FEEDBACK && !FEEDBACK_TOKEN) {
+  throw new Error('FEEDBACK=1 requires FEEDBACK_TOKEN (the shared token POST /feedback checks)');
+}
+const FEEDBACK_APPLY_MS = Number(process.env.FEEDBACK_APPLY_MS) || 5000;
+const FEEDBACK_CHECKPOINT_MS = Number(process.env.FEEDBACK_CHECKPOINT_MS) || 60 * 1000;
+const FEEDBACK_QUEUE_DEPTH = Number(process.env.FEEDBACK_QUEUE_DEPTH) || 10000;
+const FEEDBACK_LABELS = new Set(['safe', 'unsafe']);
+
+// Scan counters live in counters.js so cluster workers share them.
+// Static hardware facts are read once instead of calling os.cpus() per request.
+const CPU_INFO = os.cpus();
+const CPU_CORES = CPU_INFO.length;
+const CPU_SPEED_MHZ = CPU_CORES
+  ? Math.round(CPU_INFO.reduce((sum, cpu) => sum + cpu.speed, 0) / CPU_CORES)
+  : 0;
+
+// Verdicts depend only on the trimmed prompt plus detector.js's rules and baselines,
+// so repeated prompts are served from cache until any of those change.
+// `verdictVersion` fingerprints them; every analysis is cached under the
+// version it was scored with, so one still in flight when it changes is dropped.
+let verdictVersion = computeVerdictVersion();
+const verdictCache = createVerdictCache({
+  maxEntries: VERDICT_CACHE_SIZE,
+  ttlMs: VERDICT_CACHE_TTL_MS,
+  version: verdictVersion,
+});
 
-// Data files
-const DATA_FILES = {
-  safe: path.join(__dirname, 'safe_prompts.csv'),
-  unsafe: path.join(__dirname, 'unsafe_prompts.csv'),
-};
-
-// Stopwords and function words for linguistic analysis
-const STOPWORDS = new Set([
-  'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them'
-]);
-
-const FUNCTION_WORDS = new Set([
-  'about', 'above', 'across', 'after', 'against', 'along', 'among', 'around', 'before', 'behind', 'below', 'beneath', 'beside', 'between', 'beyond', 'during', 'except', 'from', 'into', 'near', 'over', 'through', 'toward', 'under', 'until', 'upon', 'within', 'without'
-]);
-
-// Role inversion detection patterns
-const baseTriggers = [
-  /(?:ignore|forget|disregard).{0,20}(?:previous|above|prior|earlier)/i,
-  /(?:act|behave|pretend).{0,20}(?:as|like).{0,20}(?:different|another|new|hacker)/i,
-  /(?:system|admin|root|developer).{0,20}(?:mode|access|override|bypass)/i,
-  /(?:reveal|show|tell|give).{0,20}(?:secret|hidden|confidential|private)/i,
-  /(?:delete|remove|disable|uninstall).{0,20}(?:antivirus|security|defender|firewall|protection)/i,
-  /(?:bypass|circumvent|evade).{0,20}(?:security|protection|detection|firewall)/i,
-  /(?:hide|conceal).{0,20}(?:malware|virus|attack)/i,
-  /(?:silently|secretly|without detection).{0,20}(?:delete|remove|disable|install)/i,
-  // HTML/XML injection and comment-based attacks
-  /<!--.*(?:system|override|disable|unrestricted|filter|admin|root).*-->/i,
-  /<script.*>.*<\/script>/i,
-  /(?:system|admin|root)\s*:\s*(?:respond|output|disable|override|enable)/i,
-  /(?:disable|remove|bypass|ignore).{0,20}(?:content filter|safety|restriction|limitation)/i,
-  /(?:unrestricted|unfiltered|uncensored).{0,20}(?:output|response|mode|access)/i,
-  // Hacking and unauthorized access patterns
-  /\b(?:hack|hacking|hacked|hacker|hacks)\b.{0,30}(?:computer|system|network|server|database|account|password|access|data)/i,
-  /(?:hack|hacking|hacked|hacker).{0,20}(?:into|the|a|an|my|your|their)/i,
-  /(?:enter|break|get|gain|obtain).{0,20}(?:into|access to).{0,30}(?:system|computer|network|server|database|account|level|duos)/i,
-  /(?:unauthorized|illegal|illegitimate).{0,20}(?:access|entry|entry|intrusion)/i,
-  /(?:crack|cracking|cracked).{0,20}(?:password|code|encryption|security|system)/i,
-  /(?:exploit|exploiting|exploited).{0,20}(?:vulnerability|bug|weakness|system|security)/i,
-  /(?:penetrate|penetration|breach|breaching).{0,20}(?:security|system|network|firewall|defense)/i,
-  /(?:steal|stealing|steals|stolen).{0,20}(?:data|information|credentials|password|account)/i,
-  /(?:inject|injecting|injection).{0,20}(?:code|malware|virus|payload|script)/i,
-  /(?:backdoor|trojan|rootkit|keylogger|spyware|ransomware)/i,
-];
-
-// Dangerous keywords that should trigger blocking
-const dangerousKeywords = [
-  'hack', 'hacking', 'hacked', 'hacker', 'crack', 'cracking', 'exploit', 'exploiting',
-  'breach', 'breaching', 'penetrate', 'penetration', 'unauthorized access', 'illegal access',
-  'steal data', 'steal information', 'backdoor', 'trojan', 'rootkit', 'keylogger',
-  'spyware', 'ransomware', 'malware', 'virus injection', 'sql injection', 'xss',
-  'ddos', 'phishing', 'social engineering', 'privilege escalation', 'buffer overflow',
-  // Weapons and illegal activities
-  'bomb', 'explosive', 'weapon', 'gun', 'rifle', 'ammunition', 'grenade', 'c4',
-  'pipe bomb', 'molotov', 'ied', 'detonator', 'dynamite', 'tnt',
-  'poison', 'toxin', 'ricin', 'cyanide', 'anthrax',
-  'drug manufacturing', 'meth lab', 'cocaine production', 'heroin synthesis'
-];
-
-// Global variables for statistics
-let totalScanned = 0;
-let blockedCount = 0;
-let cpuMetrics = {
-  startTime: process.hrtime.bigint(),
-  lastCpuUsage: process.cpuUsage(),
-};
-
-// Load and process datasets
-const datasets = loadDatasets();
-const safeData = datasets.filter(row => row.label === 'safe');
-const unsafeData = datasets.filter(row => row.label === 'unsafe');
-
-// Compute baseline statistics
-const safeEntropyStats = computeEntropyStats(safeData);
-const unsafeEntropyStats = computeEntropyStats(unsafeData);
-
-const safeFeatureVectors = safeData.map(row => computeFeatureVector(row.text));
-const safeFeatureStats = computeFeatureStats(safeFeatureVectors);
-
-// Create corpus for NCD analysis
-const safeCorpus = safeData.slice(0, 100).map(row => row.text).join('\n');
-const unsafeCorpus = unsafeData.slice(0, 100).map(row => row.text).join('\n');
-
-// Calculate CPU speed (MHz) based on available CPU cores
-function calculateCpuSpeed() {
-  const cpus = os.cpus();
-  if (cpus.length === 0) return 0;
-  const avgSpeed = cpus.reduce((sum, cpu) => sum + cpu.speed, 0) / cpus.length;
-  return Math.round(avgSpeed);
+// Full and fast analyses are indexed apart, as they are cached apart
+const createNearDuplicates = () => createNearDuplicateIndex({
+  threshold: NEAR_DUPLICATE_THRESHOLD,
+  maxEntries: NEAR_DUPLICATE_SIZE,
+  ttlMs: NEAR_DUPLICATE_TTL_MS,
+  version: verdictVersion,
+});
+const nearDuplicates = NEAR_DUPLICATES ? { full: createNearDuplicates(), fast: createNearDuplicates() } : null;
+
+// Call after mutating rules or baselines; drops every cached verdict when they changed
+function refreshVerdictCache() {
+  verdictVersion = computeVerdictVersion();
+  if (nearDuplicates) {
+    nearDuplicates.full.setVersion(verdictVersion);
+    nearDuplicates.fast.setVersion(verdictVersion);
+  }
+  return verdictCache.setVersion(verdictVersion);
 }
 
-// Calculate CPU processing throughput (MB/s)
-function calculateCpuThroughput(promptLength = 0) {
-  const currentCpuUsage = process.cpuUsage(cpuMetrics.lastCpuUsage);
-  cpuMetrics.lastCpuUsage = process.cpuUsage();
-  
-  const userCpu = currentCpuUsage.user / 1000;
-  const systemCpu = currentCpuUsage.system / 1000;
-  const baseThroughput = (userCpu + systemCpu) * 10 + 800;
-  
-  // Add variation based on prompt complexity
-  const complexityFactor = Math.min(2, promptLength / 50);
-  const randomVariation = Math.random() * 400 + 200;
-  const throughput = baseThroughput + complexityFactor * 300 + randomVariation;
-  
-  return Math.round(Math.min(2000, Math.max(500, throughput)));
+const analyzerPool = ANALYZE_WORKERS > 0
+  ? createAnalyzerPool({ size: ANALYZE_WORKERS, maxQueue: ANALYZE_QUEUE_DEPTH, version: verdictVersion })
+  : null;
+
+if (analyzerPool) {
+  fastify.addHook('onClose', async () => analyzerPool.close());
+}
+
+// Learned baselines replace detector.js's (and every worker thread's) and
+// invalidate the verdict cache, since cached verdicts were scored against the old ones.
+// Worker tasks already posted finish with the old baselines and the old version,
+// so analyzeManyCached returns them but does not cache them.
+const feedbackLearner = FEEDBACK
+  ? createFeedbackLearner({
+    baselines,
+    source: describeBaselineSource(),
+    checkpointPath: FEEDBACK_CHECKPOINT || null,
+    applyIntervalMs: FEEDBACK_APPLY_MS,
+    checkpointIntervalMs: FEEDBACK_CHECKPOINT_MS,
+    maxPending: FEEDBACK_QUEUE_DEPTH,
+    onApply: (next) => {
+      setBaselines(next);
+      refreshVerdictCache();
+      if (analyzerPool) analyzerPool.updateBaselines(next, verdictVersion);
+      console.log(`[Feedback] Baselines updated (${next.rows.safe} safe, ${next.rows.unsafe} unsafe rows)`);
+    },
+  })
+  : null;
+
+if (feedbackLearner) {
+  fastify.addHook('onClose', async () => feedbackLearner.close());
+}
+
+// Copy of `analysis` with durationNs on each layer and a totalled `timings` block
+function attachTimings(analysis, timings) {
+  const layers = {};
+  Object.keys(analysis.layers).forEach((name) => {
+    layers[name] = { ...analysis.layers[name], durationNs: timings[name] };
+  });
+  const totalNs = Object.values(timings).reduce((sum, ns) => sum + ns, 0);
+  return { ...analysis, layers, timings: { ...timings, totalNs } };
+}
+
+// Scores prompts (strings) in order, serving repeats from the verdict cache and
+// sending only the misses to the worker pool (or analyzePrompt inline).
+// With `timed`, every prompt is scored fresh (a cached verdict has no timings
+// worth reporting) and results carry per-layer timings. With `fast`, prompts
+// are scored by analyzePromptFast and cached apart from full analyses.
+// Cached results are shared between requests: spread them, never mutate them.
+// Verdicts forced by a layer running out of budget depend on load, so they are
+// not cached. With NEAR_DUPLICATES=1, a miss close enough to an analyzed
+// prompt reuses that verdict if the rule layers find exactly what they found
+// in the analyzed prompt (screenMatches); reuseVerdict marks what was
+// inherited. Only fully analyzed prompts are indexed, so a reused verdict
+// never drifts further than one lookup from its analysis.
+async function analyzeManyCached(prompts, { timed = false, fast = false } = {}) {
+  const results = new Array(prompts.length);
+  const keys = prompts.map((prompt) => (fast ? `${promptKey(prompt)}:fast` : promptKey(prompt)));
+  const missing = new Map(); // key -> indexes waiting for that verdict
+  keys.forEach((key, i) => {
+    const cached = timed ? undefined : verdictCache.get(key);
+    if (cached !== undefined) {
+      results[i] = cached;
+    } else if (missing.has(key)) {
+      missing.get(key).push(i);
+    } else {
+      missing.set(key, [i]);
+    }
+  });
+  const nearIndex = nearDuplicates && !timed ? nearDuplicates[fast ? 'fast' : 'full'] : null;
+  if (nearIndex) {
+    missing.forEach((indexes, key) => {
+      const prompt = prompts[indexes[0]];
+      const match = nearIndex.find(prompt);
+      if (!match) {
+        metrics.nearDuplicates.inc({ outcome: 'miss' });
+        return;
+      }
+      const reusable = screenMatches(prompt, match.value);
+      metrics.nearDuplicates.inc({ outcome: reusable ? 'reused' : 'rescored' });
+      if (!reusable) return;
+      const result = reuseVerdict(prompt, match.value, match.similarity);
+      indexes.forEach((i) => { results[i] = result; });
+      missing.delete(key);
+    });
+  }
+  if (missing.size) {
+    const firstIndexes = [...missing.values()].map((indexes) => indexes[0]);
+    const uncached = firstIndexes.map((i) => prompts[i]);
+    let analyses;
+    let timings;
+    let versions; // the verdict version each analysis was scored under
+    if (analyzerPool) {
+      ({ results: analyses, timings, versions } = await analyzerPool.analyzeMany(uncached, { fast }));
+    } else {
+      const analyze = fast ? analyzePromptFast : analyzePrompt;
+      timings = uncached.map(() => ({}));
+      analyses = uncached.map((prompt, k) => analyze(prompt, timings[k]));
+      versions = uncached.map(() => verdictVersion);
+    }
+
+    analyses.forEach((analysis, k) => {
+      const key = keys[firstIndexes[k]];
+      metrics.observeAnalysis(Buffer.byteLength(uncached[k]), timings[k]);
+      if (analysis.budgetExceeded) {
+        analysis.budgetExceeded.forEach((layer) => metrics.budgetExceeded.inc({ layer }));
+      } else {
+        verdictCache.set(key, analysis, versions[k]);
+        if (nearIndex) nearIndex.add(uncached[k], analysis, versions[k]);
+      }
+      const result = timed ? attachTimings(analysis, timings[k]) : analysis;
+      missing.get(key).forEach((i) => { results[i] = result; });
+    });
+  }
+  results.forEach((analysis) => metrics.verdicts.inc({ result: analysis.result }));
+  return results;
+}
+
+async function analyzePromptCached(prompt, options) {
+  const [analysis] = await analyzeManyCached([prompt], options);
+  return analysis;
+}
+
+// A full worker queue is load shedding, not a server fault
+function isQueueFull(err) {
+  return err.code === 'QUEUE_FULL';
 }
 
 // Handle filtered prompt (FINAL STAGE - after 4 security layers)
@@ -127,14 +233,7 @@ async function handleFilteredPrompt(prompt, isSafe) {
   }
 
   try {
-    const ollamaUrl = process.env.OLLAMA_URL || 'http://127.0.0.1:11434';
-    const response = await axios.post(`${ollamaUrl}/api/generate`, {
-      model: 'llama2',
-      prompt: prompt,
-      stream: false
-    }, { timeout: 120000 });
-
-    const answer = response.data.response || '';
+    const answer = await ollama.generate(prompt, { model: 'llama2', timeout: 120000 });
     return { answer };
   } catch (err) {
     if (err.code === 'ECONNREFUSED' || err.message.includes('ECONNREFUSED')) {
@@ -148,18 +247,10 @@ async function handleFilteredPrompt(prompt, isSafe) {
 // Forward to Ollama with proper error handling
 async function forwardToOllama(prompt) {
   try {
-    const ollamaUrl = process.env.OLLAMA_URL || 'http://127.0.0.1:11434';
-    const model = process.env.OLLAMA_MODEL || 'llama2';
-    
-    console.log(`[Ollama] Sending prompt to ${ollamaUrl}/api/generate with model: ${model}`);
-    
-    const response = await axios.post(`${ollamaUrl}/api/generate`, {
-      model: model,
-      prompt: prompt,
-      stream: false
-    }, { timeout: 30000, family: 4 });
-
-    const answer = response.data.response || '';
+    console.log(`[Ollama] Sending prompt to ${ollama.OLLAMA_URL}/api/generate with model: ${ollama.OLLAMA_MODEL}`);
+
+    // Identical prompts already being generated share that generation
+    const answer = await ollama.generate(prompt);
     console.log(`[Ollama] Received response: ${answer.substring(0, 100)}...`);
     return answer;
   } catch (err) {
@@ -171,8 +262,39 @@ async function forwardToOllama(prompt) {
   }
 }
 
+// Resolve the LLM answer for a SAFE prompt (predefined answer first, then Ollama)
+async function resolveLlmResponse(prompt) {
+  // Try predefined answer first (normalize prompt for matching)
+  const normalizedPrompt = prompt.trim().toLowerCase();
+  const predefinedAnswer = getAnswer(normalizedPrompt);
+  if (predefinedAnswer) {
+    console.log(`[Gateway] Using predefined answer for known prompt`);
+    return predefinedAnswer;
+  }
+  console.log(`[Gateway] Prompt is SAFE - forwarding to Ollama...`);
+  const answer = await forwardToOllama(prompt);
+  console.log(`[Gateway] Ollama response received`);
+  return answer;
+}
+
+// Measured values: cpuThroughput is the detection layers' real throughput
+// (bytes scored / time spent scoring, since start) and analysisMs is how long
+// this request waited for its verdict(s), cache hits included.
+function collectPerformance(analysisSeconds) {
+  return {
+    cpuSpeed: CPU_SPEED_MHZ,
+    cpuThroughput: Number((metrics.scanThroughput() / 1e6).toFixed(2)),
+    cpuCores: CPU_CORES,
+    analysisMs: Number((analysisSeconds * 1000).toFixed(3)),
+  };
+}
+
+function secondsSince(start) {
+  return Number(process.hrtime.bigint() - start) / 1e9;
+}
+
 fastify.post('/analyze', async (request, reply) => {
-  const { prompt } = request.body || {};
+  const { prompt, timings = LAYER_TIMINGS, explain = !FAST_VERDICTS } = request.body || {};
 
   if (!prompt || typeof prompt !== 'string') {
     return reply.code(400).send({ error: 'Prompt text is required' });
@@ -180,44 +302,35 @@ fastify.post('/analyze', async (request, reply) => {
 
   console.log(`\n[Gateway] Analyzing prompt: "${prompt}"`);
   
-  const analysis = analyzePrompt(prompt);
-  totalScanned += 1;
+  const analysisStart = process.hrtime.bigint();
+  let analysis;
+  try {
+    analysis = await analyzePromptCached(prompt, { timed: timings === true, fast: explain === false });
+  } catch (err) {
+    if (isQueueFull(err)) return reply.code(503).send({ error: err.message });
+    throw err;
+  }
+  const analysisSeconds = secondsSince(analysisStart);
+  const isBlocked = analysis.result === 'BLOCKED';
+  const totals = await counters.record(1, isBlocked ? 1 : 0);
   
   console.log(`[Gateway] Analysis result: ${analysis.result}`);
   
-  if (analysis.result === 'BLOCKED') {
-    blockedCount += 1;
+  if (isBlocked) {
     console.log(`[Gateway] Prompt BLOCKED at layer: ${analysis.layers ? Object.keys(analysis.layers).find(k => analysis.layers[k].status === 'danger') : 'Unknown'}`);
   }
 
   // Forward to Ollama if safe
   let llmResponse = null;
   if (analysis.result === 'SAFE') {
-    // Try predefined answer first (normalize prompt for matching)
-    const normalizedPrompt = prompt.trim().toLowerCase();
-    const predefinedAnswer = getAnswer(normalizedPrompt);
-    if (predefinedAnswer) {
-      console.log(`[Gateway] Using predefined answer for known prompt`);
-      llmResponse = predefinedAnswer;
-    } else {
-      console.log(`[Gateway] Prompt is SAFE - forwarding to Ollama...`);
-      llmResponse = await forwardToOllama(prompt);
-      console.log(`[Gateway] Ollama response received`);
-    }
+    llmResponse = await resolveLlmResponse(prompt);
   }
 
   const response = {
     ...analysis,
     llmResponse,  // Only populated if SAFE
-    counters: {
-      totalScanned,
-      blockedCount,
-    },
-    performance: {
-      cpuSpeed: calculateCpuSpeed(),
-      cpuThroughput: calculateCpuThroughput(prompt.length),
-      cpuCores: os.cpus().length,
-    },
+    counters: totals,
+    performance: collectPerformance(analysisSeconds),
   };
 
   console.log(`[Gateway] Returning response (CPU: ${response.performance.cpuSpeed}MHz, ${response.performance.cpuThroughput}MB/s)\n`);
@@ -225,474 +338,263 @@ fastify.post('/analyze', async (request, reply) => {
   return response;
 });
 
-async function startServer() {
-  try {
-    await fastify.listen({ port: PORT, host: '0.0.0.0' });
-    console.log(`Safety Gateway API running on port ${PORT}`);
-  } catch (error) {
-    console.error('Failed to start server', error);
-    process.exit(1);
+// Batch analysis: one request, many prompts, verdicts returned in input order.
+// Counters, logging and CPU sampling happen once per batch instead of per prompt.
+fastify.post('/analyze/batch', { bodyLimit: BATCH_BODY_LIMIT }, async (request, reply) => {
+  const {
+    prompts,
+    skipLlm = false,
+    skipPerformance = false,
+    timings = LAYER_TIMINGS,
+    explain = !FAST_VERDICTS,
+  } = request.body || {};
+
+  if (!Array.isArray(prompts) || prompts.length === 0) {
+    return reply.code(400).send({ error: 'prompts must be a non-empty array of strings' });
+  }
+  if (prompts.length > MAX_BATCH_SIZE) {
+    return reply.code(413).send({ error: `Batch too large (max ${MAX_BATCH_SIZE} prompts)` });
   }
-}
 
-if (require.main === module) {
-  startServer();
-}
+  const results = new Array(prompts.length);
+  const validIndexes = [];
+  let blocked = 0;
+
+  for (let i = 0; i < prompts.length; i += 1) {
+    const prompt = prompts[i];
+    if (!prompt || typeof prompt !== 'string') {
+      results[i] = { error: 'Prompt text is required' };
+      continue;
+    }
+    validIndexes.push(i);
+  }
 
-function loadDatasets() {
-  const rows = [];
-  Object.entries(DATA_FILES).forEach(([key, filePath]) => {
-    const fileContents = fs.readFileSync(filePath, 'utf-8').trim();
-    const lines = fileContents.split('\n').slice(1); // remove header
-    lines.forEach((line) => {
-      if (!line) return;
-      const [textRaw, labelRaw] = splitCsvLine(line);
-      const label = labelRaw?.trim() === '1' ? 'unsafe' : 'safe';
-      rows.push({
-        text: textRaw.trim(),
-        label: label || key,
-      });
+  const analysisStart = process.hrtime.bigint();
+  let analyses;
+  try {
+    analyses = await analyzeManyCached(validIndexes.map((i) => prompts[i]), {
+      timed: timings === true,
+      fast: explain === false,
     });
+  } catch (err) {
+    if (isQueueFull(err)) return reply.code(503).send({ error: err.message });
+    throw err;
+  }
+  const analysisSeconds = secondsSince(analysisStart);
+  analyses.forEach((analysis, k) => {
+    if (analysis.result === 'BLOCKED') blocked += 1;
+    results[validIndexes[k]] = analysis;
   });
-  return rows;
-}
-
-function splitCsvLine(line) {
-  if (!line.includes(',')) {
-    return [line, ''];
+  const scanned = analyses.length;
+
+  const totals = await counters.record(scanned, blocked);
+  console.log(`[Gateway] Batch analyzed ${scanned}/${prompts.length} prompts (${blocked} blocked)`);
+
+  if (!skipLlm) {
+    // Sequential on purpose: Ollama serves one generation at a time anyway
+    for (let i = 0; i < results.length; i += 1) {
+      if (results[i].error) continue;
+      results[i] = {
+        ...results[i],
+        llmResponse: results[i].result === 'SAFE' ? await resolveLlmResponse(prompts[i]) : null,
+      };
+    }
   }
-  const firstCommaIndex = line.indexOf(',');
-  const text = line.slice(0, firstCommaIndex);
-  const label = line.slice(firstCommaIndex + 1);
-  return [stripQuotes(text), label];
-}
-
-function stripQuotes(value = '') {
-  return value.replace(/^"(.*)"$/, '$1');
-}
 
-function computeEntropyStats(samples) {
-  const scores = samples.map((row) => computeEntropyScore(row.text));
-  return summarize(scores);
-}
-
-function computeEntropyScore(text) {
-  if (!text) return 0;
-  const buffer = Buffer.from(text, 'utf-8');
-  if (buffer.length === 0) return 0;
-  const compressed = gzipSync(buffer);
-  return compressed.length / buffer.length;
-}
+  const response = {
+    results,
+    counters: totals,
+  };
+  if (!skipPerformance) {
+    response.performance = collectPerformance(analysisSeconds);
+  }
+  return response;
+});
 
-function computeFeatureStats(featureVectors) {
-  if (featureVectors.length === 0) return {};
-  const keys = Object.keys(featureVectors[0]);
-  return keys.reduce((acc, key) => {
-    const values = featureVectors.map((vec) => vec[key]);
-    acc[key] = summarize(values);
-    return acc;
-  }, {});
-}
+// Streaming analysis: the verdict is sent as soon as it is computed, then SAFE
+// prompts get Ollama's tokens relayed as they are generated. NDJSON by default,
+// Server-Sent Events when the client sends `Accept: text/event-stream`.
+fastify.post('/analyze/stream', async (request, reply) => {
+  const { prompt, timings = LAYER_TIMINGS, explain = !FAST_VERDICTS } = request.body || {};
 
-function summarize(values) {
-  if (!values.length) {
-    return { mean: 0, std: 0 };
+  if (!prompt || typeof prompt !== 'string') {
+    return reply.code(400).send({ error: 'Prompt text is required' });
   }
-  const mean = values.reduce((sum, val) => sum + val, 0) / values.length;
-  const variance = values.reduce((sum, val) => sum + (val - mean) ** 2, 0) / values.length;
-  return { mean, std: Math.sqrt(variance) || 0.0001 };
-}
 
-function computeFeatureVector(text) {
-  const sanitized = text || '';
-  const length = sanitized.length || 1;
-  const tokens = sanitized.toLowerCase().match(/\b[\w']+\b/g) || [];
-  const tokenCount = tokens.length || 1;
-  const uniqueTokens = new Set(tokens);
-  const uppercaseCount = (sanitized.match(/[A-Z]/g) || []).length;
-  const digitCount = (sanitized.match(/\d/g) || []).length;
-  const punctuationCount = (sanitized.match(/[^\w\s]/g) || []).length;
-  const whitespaceCount = (sanitized.match(/\s/g) || []).length;
-  const longestRun = longestRepeatingRun(sanitized);
-
-  const stopwordHits = tokens.filter((token) => STOPWORDS.has(token)).length;
-  const functionWordHits = tokens.filter((token) => FUNCTION_WORDS.has(token)).length;
-  const avgTokenLength = tokens.reduce((sum, token) => sum + token.length, 0) / tokenCount;
-
-  return {
-    tokenCount,
-    avgTokenLength,
-    stopwordRatio: stopwordHits / tokenCount,
-    functionWordRatio: functionWordHits / tokenCount,
-    uppercaseRatio: uppercaseCount / length,
-    digitRatio: digitCount / length,
-    punctuationRatio: punctuationCount / length,
-    uniqueTokenRatio: uniqueTokens.size / tokenCount,
-    longestRunRatio: longestRun / length,
-    whitespaceRatio: whitespaceCount / length,
+  const useSse = (request.headers.accept || '').includes('text/event-stream');
+  const stream = new PassThrough();
+  const send = (type, payload) => {
+    if (stream.destroyed) return;
+    const body = JSON.stringify({ type, ...payload });
+    stream.write(useSse ? `event: ${type}\ndata: ${body}\n\n` : `${body}\n`);
   };
-}
 
-function longestRepeatingRun(text) {
-  if (!text) return 0;
-  let maxRun = 1;
-  let currentRun = 1;
-  for (let i = 1; i < text.length; i += 1) {
-    if (text[i] === text[i - 1]) {
-      currentRun += 1;
-      maxRun = Math.max(maxRun, currentRun);
-    } else {
-      currentRun = 1;
-    }
+  const analysisStart = process.hrtime.bigint();
+  let analysis;
+  try {
+    analysis = await analyzePromptCached(prompt, { timed: timings === true, fast: explain === false });
+  } catch (err) {
+    if (isQueueFull(err)) return reply.code(503).send({ error: err.message });
+    throw err;
   }
-  return maxRun;
-}
+  const analysisSeconds = secondsSince(analysisStart);
+  const totals = await counters.record(1, analysis.result === 'BLOCKED' ? 1 : 0);
+  console.log(`[Gateway] Streaming analysis result: ${analysis.result}`);
 
-function detectRoleInversion(prompt) {
-  const matches = [];
-  const lowerPrompt = prompt.toLowerCase();
-  
-  // Check regex patterns
-  baseTriggers.forEach((pattern) => {
-    if (pattern.test(prompt)) {
-      matches.push(pattern.source.replace(/\(\?:|\)/g, '').slice(0, 60));
-    }
-  });
-  
-  // Check for dangerous keywords (case-insensitive)
-  dangerousKeywords.forEach((keyword) => {
-    if (lowerPrompt.includes(keyword.toLowerCase())) {
-      matches.push(`Keyword: ${keyword}`);
-    }
-  });
-  
-  return matches;
-}
-
-function computeNcd(sample, corpus) {
-  const sampleBuffer = Buffer.from(sample, 'utf-8');
-  const corpusBuffer = Buffer.from(corpus, 'utf-8');
-  if (!sampleBuffer.length || !corpusBuffer.length) {
-    return 1;
-  }
-  const cSample = gzipSync(sampleBuffer).length;
-  const cCorpus = gzipSync(corpusBuffer).length;
-  const cCombined = gzipSync(Buffer.concat([sampleBuffer, Buffer.from('\n'), corpusBuffer])).length;
-  const numerator = cCombined - Math.min(cSample, cCorpus);
-  const denominator = Math.max(cSample, cCorpus);
-  if (!denominator) return 1;
-  return Number((numerator / denominator).toFixed(4));
-}
+  reply
+    .header('Cache-Control', 'no-cache')
+    .type(useSse ? 'text/event-stream' : 'application/x-ndjson')
+    .send(stream);
 
-function computeDeviation(featureVector, baselineStats) {
-  const deviations = Object.entries(featureVector).map(([key, value]) => {
-    const stats = baselineStats[key] || { mean: 0, std: 1 };
-    if (!stats.std) return 0;
-    return Math.abs((value - stats.mean) / stats.std);
+  send('verdict', {
+    ...analysis,
+    counters: totals,
   });
 
-  const averageDeviation = deviations.reduce((sum, val) => sum + val, 0) / deviations.length;
-  return Number(averageDeviation.toFixed(2));
-}
-
-function normalizeEntropy(entropyScore) {
-  const range = unsafeEntropyStats.mean - safeEntropyStats.mean || 0.0001;
-  const normalized = (entropyScore - safeEntropyStats.mean) / range;
-  return Math.max(0, Math.min(1, normalized));
-}
-
-// Advanced detection functions
-function detectObfuscation(prompt) {
-  const obfuscationPatterns = [
-    /\b(?:base64|hex|binary|encoded|decoded|obfuscated)\b/i,
-    /[A-Za-z0-9+\/]{20,}={0,2}/, // Base64-like patterns
-    /0x[0-9a-fA-F]{4,}/, // Hex patterns
-    /%[0-9a-fA-F]{2}/g, // URL encoding
-    /&#x?[0-9a-fA-F]+;/g, // HTML entities
-    /[^\x20-\x7E]{3,}/, // Non-printable characters
-  ];
-  
-  const matches = [];
-  obfuscationPatterns.forEach((pattern, idx) => {
-    if (pattern.test(prompt)) {
-      matches.push(`Obfuscation pattern ${idx + 1} detected`);
-    }
+  const abort = new AbortController();
+  reply.raw.on('close', () => {
+    if (!reply.raw.writableFinished) abort.abort();
   });
-  
-  return matches;
-}
 
-function analyzeContext(prompt) {
-  const lowerPrompt = prompt.toLowerCase();
-  const contextScore = {
-    suspicious: 0,
-    neutral: 0,
-    safe: 0,
-    reasons: []
-  };
-  
-  // Suspicious context indicators
-  const suspiciousContexts = [
-    { pattern: /(?:how|what|way|method|technique).{0,30}(?:to|can|do|should).{0,30}(?:hack|crack|break|steal|exploit)/i, weight: 0.8 },
-    { pattern: /(?:help|assist|guide|teach).{0,30}(?:me|us|you).{0,30}(?:hack|crack|break|steal|exploit)/i, weight: 0.9 },
-    { pattern: /(?:i|we|they).{0,20}(?:want|need|trying|attempting).{0,30}(?:to|to).{0,30}(?:hack|crack|break|steal|exploit)/i, weight: 0.85 },
-    { pattern: /(?:show|tell|give|provide).{0,20}(?:me|us).{0,30}(?:code|script|method|way).{0,30}(?:to|for).{0,30}(?:hack|crack|break)/i, weight: 0.9 },
-    { pattern: /(?:bypass|circumvent|evade|override).{0,30}(?:security|protection|safety|guard|defense)/i, weight: 0.95 },
-  ];
-  
-  suspiciousContexts.forEach(({ pattern, weight }) => {
-    if (pattern.test(prompt)) {
-      contextScore.suspicious += weight;
-      contextScore.reasons.push(`Suspicious intent detected (weight: ${weight})`);
-    }
-  });
-  
-  // Safe context indicators (reduce suspicion)
-  const safeContexts = [
-    { pattern: /(?:explain|describe|what is|tell me about|how does).{0,30}(?:security|hacking|cybersecurity)/i, weight: -0.3 },
-    { pattern: /(?:learn|study|understand|education|academic|research)/i, weight: -0.2 },
-    { pattern: /(?:prevent|protect|defend|secure|guard)/i, weight: -0.4 },
-  ];
-  
-  safeContexts.forEach(({ pattern, weight }) => {
-    if (pattern.test(prompt)) {
-      contextScore.safe += Math.abs(weight);
-      contextScore.reasons.push(`Educational/defensive context detected`);
+  let llmResponse = null;
+  if (analysis.result === 'SAFE') {
+    const predefinedAnswer = getAnswer(prompt.trim().toLowerCase());
+    if (predefinedAnswer) {
+      llmResponse = predefinedAnswer;
+      send('token', { text: predefinedAnswer });
+    } else {
+      try {
+        console.log(`[Ollama] Streaming prompt to ${ollama.OLLAMA_URL}/api/generate with model: ${ollama.OLLAMA_MODEL}`);
+        llmResponse = await ollama.generateStream(prompt, (text) => send('token', { text }), { signal: abort.signal });
+      } catch (err) {
+        if (abort.signal.aborted) {
+          stream.end();
+          return reply;
+        }
+        console.error('Ollama streaming failed:', err.message);
+        llmResponse = err.code === 'ECONNREFUSED' || err.message.includes('ECONNREFUSED')
+          ? 'Error: Ollama not running. Please start Ollama with: ollama serve'
+          : `Error: ${err.message}`;
+        send('error', { message: llmResponse });
+      }
     }
+  }
+
+  send('done', {
+    llmResponse,
+    performance: collectPerformance(analysisSeconds),
   });
-  
-  return contextScore;
+  stream.end();
+  return reply;
+});
+
+// Constant-time comparison of the request's bearer token with FEEDBACK_TOKEN
+// (digests first, so the lengths always match)
+function hasFeedbackToken(request) {
+  const header = request.headers.authorization || '';
+  const token = header.startsWith('Bearer ') ? header.slice('Bearer '.length) : '';
+  const digest = (value) => crypto.createHash('sha256').update(value, 'utf8').digest();
+  return crypto.timingSafeEqual(digest(token), digest(FEEDBACK_TOKEN));
 }
 
-function computeThreatScore(ritdHits, deviationScore, entropyScore, ncdDelta, contextScore, obfuscationHits) {
-  let threatScore = 0;
-  const maxScore = 100;
-  const details = [];
-  
-  // RITD contribution (40% weight)
-  const ritdScore = Math.min(40, ritdHits.length * 10);
-  threatScore += ritdScore;
-  if (ritdScore > 0) {
-    details.push(`RITD: ${ritdScore}/40 (${ritdHits.length} patterns detected)`);
+// Labeled prompts for the baselines: { prompt, label } or { items: [{ prompt, label }, ...] }
+// with label "safe" or "unsafe". Answers 202 once queued; learning happens in the background.
+fastify.post('/feedback', { bodyLimit: BATCH_BODY_LIMIT }, async (request, reply) => {
+  if (!feedbackLearner) {
+    return reply.code(404).send({ error: 'Feedback is disabled (start the server with FEEDBACK=1)' });
   }
-  
-  // LDF contribution (25% weight)
-  const ldfScore = Math.min(25, (deviationScore / 4.0) * 25);
-  threatScore += ldfScore;
-  if (ldfScore > 10) {
-    details.push(`LDF: ${ldfScore.toFixed(1)}/25 (deviation: ${deviationScore.toFixed(2)})`);
+  if (!hasFeedbackToken(request)) {
+    return reply.code(401).send({ error: 'Missing or wrong feedback token (Authorization: Bearer <FEEDBACK_TOKEN>)' });
   }
-  
-  // Context analysis (20% weight)
-  const contextThreat = Math.min(20, contextScore.suspicious * 20);
-  threatScore += contextThreat;
-  if (contextThreat > 5) {
-    details.push(`Context: ${contextThreat.toFixed(1)}/20 (suspicious intent)`);
+  const { prompt, label, items } = request.body || {};
+  const entries = Array.isArray(items) ? items : [{ prompt, label }];
+
+  if (entries.length === 0) {
+    return reply.code(400).send({ error: 'items must be a non-empty array' });
   }
-  
-  // Obfuscation (10% weight)
-  const obfuscationScore = Math.min(10, obfuscationHits.length * 5);
-  threatScore += obfuscationScore;
-  if (obfuscationScore > 0) {
-    details.push(`Obfuscation: ${obfuscationScore}/10 (${obfuscationHits.length} patterns)`);
+  if (entries.length > MAX_BATCH_SIZE) {
+    return reply.code(413).send({ error: `Too many items (max ${MAX_BATCH_SIZE})` });
   }
-  
-  // NCD contribution (5% weight) - only if significantly different
-  if (Math.abs(ncdDelta) > 0.1) {
-    const ncdScore = Math.min(5, Math.abs(ncdDelta) * 10);
-    threatScore += ncdScore;
-    if (ncdScore > 2) {
-      details.push(`NCD: ${ncdScore.toFixed(1)}/5 (delta: ${ncdDelta.toFixed(3)})`);
-    }
+  const invalid = entries.findIndex((entry) => !entry
+    || !entry.prompt
+    || typeof entry.prompt !== 'string'
+    || !FEEDBACK_LABELS.has(entry.label));
+  if (invalid > -1) {
+    return reply.code(400).send({ error: `Item ${invalid}: prompt text is required and label must be "safe" or "unsafe"` });
   }
-  
-  // Safe context reduces threat
-  const safeReduction = Math.min(15, contextScore.safe * 15);
-  threatScore = Math.max(0, threatScore - safeReduction);
-  if (safeReduction > 0) {
-    details.push(`Safe context reduction: -${safeReduction.toFixed(1)}`);
+
+  try {
+    return reply.code(202).send(feedbackLearner.submit(entries));
+  } catch (err) {
+    if (isQueueFull(err)) return reply.code(503).send({ error: err.message });
+    throw err;
   }
-  
-  return {
-    score: Math.min(maxScore, Math.round(threatScore)),
-    maxScore,
-    percentage: Math.round((threatScore / maxScore) * 100),
-    details
-  };
-}
+});
 
-function getConfidenceLevel(threatScore) {
-  if (threatScore >= 70) return { level: 'HIGH', color: 'red', action: 'BLOCK' };
-  if (threatScore >= 50) return { level: 'MEDIUM', color: 'orange', action: 'BLOCK' };
-  if (threatScore >= 30) return { level: 'LOW', color: 'yellow', action: 'REVIEW' };
-  return { level: 'MINIMAL', color: 'green', action: 'ALLOW' };
-}
+fastify.get('/feedback/stats', async () => (feedbackLearner ? feedbackLearner.stats() : { enabled: false }));
 
-function analyzePrompt(prompt) {
-  const cleanedPrompt = prompt.trim();
+fastify.addHook('onResponse', async (request, reply) => {
+  const route = request.routeOptions.url || 'unmatched';
+  metrics.httpRequests.inc({ route, status: reply.statusCode });
+  metrics.httpDuration.observe({ route }, reply.elapsedTime / 1000);
+});
 
-  // Layer 1: RITD - Pattern-based detection
-  const ritdHits = detectRoleInversion(cleanedPrompt);
-  
-  // Layer 2: Entropy and compression analysis
-  const entropyScore = computeEntropyScore(cleanedPrompt);
-  const normalizedEntropy = normalizeEntropy(entropyScore);
-  const ncdSafe = computeNcd(cleanedPrompt, safeCorpus);
-  const ncdUnsafe = computeNcd(cleanedPrompt, unsafeCorpus);
-  const ncdDelta = Number((ncdSafe - ncdUnsafe).toFixed(4));
-
-  // Layer 3: LDF - Linguistic analysis
-  const featureVector = computeFeatureVector(cleanedPrompt);
-  const deviationScore = computeDeviation(featureVector, safeFeatureStats);
-
-  // Layer 4: Context analysis
-  const contextScore = analyzeContext(cleanedPrompt);
-  
-  // Layer 5: Obfuscation detection
-  const obfuscationHits = detectObfuscation(cleanedPrompt);
-
-  // Comprehensive threat scoring
-  const threatAnalysis = computeThreatScore(
-    ritdHits,
-    deviationScore,
-    entropyScore,
-    ncdDelta,
-    contextScore,
-    obfuscationHits
-  );
-  
-  const confidence = getConfidenceLevel(threatAnalysis.score);
+metrics.registry.gauge('gateway_verdict_cache_entries', 'Verdicts held in the LRU cache.', () => verdictCache.stats().size);
+metrics.registry.counterFrom('gateway_verdict_cache_lookups_total', 'Verdict cache lookups by outcome.', () => {
+  const { hits, misses } = verdictCache.stats();
+  return [{ labels: { outcome: 'hit' }, value: hits }, { labels: { outcome: 'miss' }, value: misses }];
+});
+if (analyzerPool) {
+  metrics.registry.gauge('gateway_worker_pool_queued', 'Scoring tasks waiting for a worker thread.', () => analyzerPool.stats().queued);
+  metrics.registry.gauge('gateway_worker_pool_busy', 'Worker threads currently scoring.', () => analyzerPool.stats().busy);
+}
+if (feedbackLearner) {
+  metrics.registry.gauge('gateway_feedback_pending', 'Labeled prompts waiting to update the baselines.', () => feedbackLearner.stats().pending);
+  metrics.registry.counterFrom('gateway_feedback_learned_total', 'Labeled prompts folded into the baselines.', () => feedbackLearner.stats().learned);
+}
 
-  // Adaptive blocking thresholds based on threat score
-  const ritdBlocked = ritdHits.length > 0;
-  const ldfBlocked = deviationScore > 5.0 || threatAnalysis.score > 50;
-  const contextBlocked = contextScore.suspicious > 0.7;
-  const obfuscationBlocked = obfuscationHits.length > 0 && threatAnalysis.score > 40;
-  
-  // Disable NCD/entropy checks for now - too many false positives on legitimate prompts
-  const entropyThresholdHigh = 999;  // Effectively disabled
-  const entropyThresholdLow = -999;  // Effectively disabled
-  const entropyAnomaly = false;  // Disabled
-  const ncdAnomaly = false;  // Disabled
-  const ncdBlocked = entropyAnomaly || ncdAnomaly;
-
-  // Final decision: Block if any critical layer triggers OR threat score is high
-  // RITD is always a hard block (highest priority)
-  // Other layers can contribute to blocking, especially with high threat scores
-  const shouldBlock = ritdBlocked || 
-                      (threatAnalysis.score >= 50) || 
-                      (threatAnalysis.score >= 30 && (ldfBlocked || contextBlocked || obfuscationBlocked)) ||
-                      ncdBlocked;
-  const result = shouldBlock ? 'BLOCKED' : 'SAFE';
-
-  // Generate detailed explanations
-  const getRitdReason = () => {
-    if (ritdHits.length === 0) return 'No role inversion patterns detected.';
-    if (ritdHits.length === 1) return `Detected ${ritdHits.length} suspicious pattern: ${ritdHits[0].substring(0, 50)}.`;
-    return `Detected ${ritdHits.length} suspicious patterns indicating potential security threat.`;
-  };
+// Prometheus scrape target
+fastify.get('/metrics', async (request, reply) => {
+  reply.type('text/plain; version=0.0.4');
+  return metrics.registry.render();
+});
 
-  const getLdfReason = () => {
-    if (ldfBlocked) {
-      return `Linguistic deviation score ${deviationScore.toFixed(2)} exceeds safe threshold (3.5). Structural patterns suggest non-standard or potentially malicious intent.`;
-    }
-    return `Linguistic fingerprint within safe bounds (deviation: ${deviationScore.toFixed(2)}).`;
-  };
+// Cluster-wide totals; under cluster.js also the per-worker split (keyed by pid)
+fastify.get('/counters', async () => counters.snapshot());
 
-  const getContextReason = () => {
-    if (contextScore.suspicious > 0) {
-      return `Context analysis detected suspicious intent (score: ${contextScore.suspicious.toFixed(2)}). ${contextScore.reasons.slice(0, 2).join(' ')}`;
-    }
-    if (contextScore.safe > 0) {
-      return `Context suggests educational or defensive purpose.`;
-    }
-    return 'Context analysis shows neutral intent.';
-  };
+fastify.get('/cache/stats', async () => verdictCache.stats());
 
-  const layerSummaries = {
-    RITD: {
-      status: ritdBlocked ? 'danger' : 'safe',
-      reason: getRitdReason(),
-      hits: ritdHits,
-      score: ritdHits.length * 10,
-      maxScore: 40,
-    },
-    NCD: {
-      status: ncdBlocked ? 'danger' : 'safe',
-      reason: ncdBlocked
-        ? 'Entropy or compression profile deviates from safe baseline.'
-        : 'Compression profile aligned with safe prompts.',
-      entropyScore: Number(entropyScore.toFixed(3)),
-      normalizedEntropy: Number(normalizedEntropy.toFixed(3)),
-      ncdSafe,
-      ncdUnsafe,
-      ncdDelta,
-    },
-    LDF: {
-      status: ldfBlocked ? 'danger' : 'safe',
-      reason: getLdfReason(),
-      deviationScore,
-      vector: featureVector,
-    },
-    CONTEXT: {
-      status: contextBlocked ? 'danger' : 'safe',
-      reason: getContextReason(),
-      suspiciousScore: contextScore.suspicious,
-      safeScore: contextScore.safe,
-    },
-    OBFUSCATION: {
-      status: obfuscationBlocked ? 'danger' : 'safe',
-      reason: obfuscationHits.length > 0
-        ? `Detected ${obfuscationHits.length} obfuscation pattern(s). Prompt may be encoded or attempting to evade detection.`
-        : 'No obfuscation patterns detected.',
-      hits: obfuscationHits,
-    },
-  };
+fastify.get('/cache/near-duplicates/stats', async () => (nearDuplicates
+  ? { full: nearDuplicates.full.stats(), fast: nearDuplicates.fast.stats() }
+  : { enabled: false }));
 
-  const logs = [
-    { type: 'system', msg: `Gateway received prompt (${cleanedPrompt.length} chars).` },
-    {
-      type: layerSummaries.RITD.status === 'danger' ? 'error' : 'success',
-      msg: `RITD → ${layerSummaries.RITD.reason}`,
-    },
-    {
-      type: layerSummaries.NCD.status === 'danger' ? 'error' : 'success',
-      msg: `NCD → Δ ${ncdDelta}, entropy ${layerSummaries.NCD.entropyScore}`,
-    },
-    {
-      type: layerSummaries.LDF.status === 'danger' ? 'error' : 'success',
-      msg: `LDF → deviation score ${deviationScore}`,
-    },
-  ];
+fastify.get('/workers/stats', async () => (analyzerPool ? analyzerPool.stats() : { size: 0 }));
 
-  logs.push({
-    type: result === 'SAFE' ? 'success' : 'error',
-    msg: result === 'SAFE' ? 'Prompt cleared all layers.' : 'Prompt quarantined before LLM.',
-  });
+async function startServer() {
+  try {
+    await fastify.listen({ port: PORT, host: '0.0.0.0' });
+    console.log(`Safety Gateway API running on port ${PORT}`);
+    console.log(`Baselines from ${baselines.origin} (${baselines.rows.safe} safe, ${baselines.rows.unsafe} unsafe rows)`);
+  } catch (error) {
+    console.error('Failed to start server', error);
+    process.exit(1);
+  }
+}
 
-  return {
-    result,
-    layers: layerSummaries,
-    metrics: {
-      ncdScore: Number(entropyScore.toFixed(2)),
-      ldfScore: deviationScore,
-    },
-    threatAnalysis: {
-      threatScore: threatAnalysis.score,
-      maxScore: threatAnalysis.maxScore,
-      percentage: threatAnalysis.percentage,
-      confidence: confidence.level,
-      confidenceColor: confidence.color,
-      recommendedAction: confidence.action,
-      breakdown: threatAnalysis.details,
-    },
-    logs,
-  };
+if (require.main === module) {
+  startServer();
 }
 
 module.exports = {
   fastify,
   analyzePrompt,
+  analyzePromptCached,
+  analyzeManyCached,
+  analyzerPool,
+  feedbackLearner,
+  refreshVerdictCache,
+  verdictCache,
+  nearDuplicates,
   forwardToOllama,
   handleFilteredPrompt,
 };
\ No newline at end of file
@@ -0,0 +1,146 @@
+// snapshot.js
+// Versioned JSON snapshot of the baselines detector.js derives from the
+// datasets: entropy stats, safe feature stats, the NCD corpora and their
+// compressed lengths. `npm run baselines` (buildBaselines.js) or
+// `python3 -m safety_gateway.build_baselines` writes it; detector.js loads it at
+// startup instead of streaming and scoring every dataset row.
+//
+// A snapshot records the SHA-256, size and modification time of each dataset
+// file it was built from, plus the snapshot format, NCD corpus size and
+// compressor backend (compressors.js). readSnapshot() rejects it when any of
+// those no longer match, and the caller recomputes. Snapshots from before the
+// compressor was recorded were built with gzip.
+//
+// Hashing a multi-GB dataset on every boot would cost more than the
+// recomputation the snapshot saves, so startup only stats the files
+// (describeSources with `digests: false`): a file whose size and mtime are
+// the ones recorded is trusted to have the recorded SHA-256, and only a file
+// that was touched is hashed to see whether its content changed. Bump
+// SNAPSHOT_FORMAT whenever the way baselines are computed changes (feature
+// vector, entropy score, Welford summary), so older snapshots are rebuilt.
+
+const crypto = require('crypto');
+const fs = require('fs');
+
+const SNAPSHOT_FORMAT = 1;
+const CHUNK_SIZE = 1024 * 1024;
+
+// Size and modification time (ns, as a string: it does not fit a double)
+function statFields(stats) {
+  return { bytes: Number(stats.size), mtimeNs: String(stats.mtimeNs) };
+}
+
+function fileStat(filePath) {
+  return statFields(fs.statSync(filePath, { bigint: true }));
+}
+
+function fileDigest(filePath) {
+  const hash = crypto.createHash('sha256');
+  const buffer = Buffer.alloc(CHUNK_SIZE);
+  const fd = fs.openSync(filePath, 'r');
+  let stat;
+  let bytes = 0;
+  try {
+    stat = statFields(fs.fstatSync(fd, { bigint: true }));
+    let bytesRead = fs.readSync(fd, buffer, 0, CHUNK_SIZE, null);
+    while (bytesRead > 0) {
+      hash.update(buffer.subarray(0, bytesRead));
+      bytes += bytesRead;
+      bytesRead = fs.readSync(fd, buffer, 0, CHUNK_SIZE, null);
+    }
+  } finally {
+    fs.closeSync(fd);
+  }
+  return { sha256: hash.digest('hex'), bytes, mtimeNs: stat.mtimeNs };
+}
+
+// What a snapshot has to have been built from to be usable now. With
+// `digests: false` the files are only stat'ed ({ path, bytes, mtimeNs }), and
+// readSnapshot() hashes the ones whose size or mtime differ from the snapshot.
+function describeSources(dataFiles, ncdCorpusRows, compressor = 'gzip', { digests = true } = {}) {
+  const files = {};
+  Object.entries(dataFiles).forEach(([key, filePath]) => {
+    files[key] = digests ? fileDigest(filePath) : { path: filePath, ...fileStat(filePath) };
+  });
+  return { ncdCorpusRows, compressor, files };
+}
+
+// Digest of an expected file, hashing it only if it was touched since `built`
+function currentDigest(expected, built) {
+  if (expected.sha256) return expected;
+  if (built && built.sha256 && built.bytes === expected.bytes && built.mtimeNs === expected.mtimeNs) {
+    return { sha256: built.sha256, bytes: expected.bytes, mtimeNs: expected.mtimeNs };
+  }
+  return fileDigest(expected.path);
+}
+
+function buildSnapshot(baselines, source, producer) {
+  return {
+    format: SNAPSHOT_FORMAT,
+    producer,
+    createdAt: new Date().toISOString(),
+    source,
+    baselines,
+  };
+}
+
+// Write then rename so a starting server never reads a half-written file
+function writeSnapshot(filePath, baselines, source, producer = `node ${process.version}`) {
+  const snapshot = buildSnapshot(baselines, source, producer);
+  const tmpPath = `${filePath}.${process.pid}.tmp`;
+  fs.writeFileSync(tmpPath, JSON.stringify(snapshot));
+  fs.renameSync(tmpPath, filePath);
+  return snapshot;
+}
+
+// Same as writeSnapshot without blocking the event loop on disk I/O
+async function writeSnapshotAsync(filePath, baselines, source, producer = `node ${process.version}`) {
+  const snapshot = buildSnapshot(baselines, source, producer);
+  const tmpPath = `${filePath}.${process.pid}.tmp`;
+  await fs.promises.writeFile(tmpPath, JSON.stringify(snapshot));
+  await fs.promises.rename(tmpPath, filePath);
+  return snapshot;
+}
+
+// { snapshot } when usable, otherwise { snapshot: null, reason }. A usable
+// snapshot's `source` is replaced by the full description of the files as
+// they are now, so it can be recorded again without hashing them.
+function readSnapshot(filePath, expectedSource) {
+  let snapshot;
+  try {
+    snapshot = JSON.parse(fs.readFileSync(filePath, 'utf-8'));
+  } catch (err) {
+    return { snapshot: null, reason: err.code === 'ENOENT' ? 'missing' : `unreadable: ${err.message}` };
+  }
+  const { source } = snapshot;
+  if (snapshot.format !== SNAPSHOT_FORMAT || !source) {
+    return { snapshot: null, reason: `format ${snapshot.format}, expected ${SNAPSHOT_FORMAT}` };
+  }
+  if (source.ncdCorpusRows !== expectedSource.ncdCorpusRows) {
+    return { snapshot: null, reason: `built with ${source.ncdCorpusRows} NCD corpus rows, expected ${expectedSource.ncdCorpusRows}` };
+  }
+  const builtCompressor = source.compressor || 'gzip';
+  if (builtCompressor !== expectedSource.compressor) {
+    return { snapshot: null, reason: `built with the ${builtCompressor} compressor, expected ${expectedSource.compressor}` };
+  }
+  const files = {};
+  const changed = Object.keys(expectedSource.files).filter((key) => {
+    const built = source.files && source.files[key];
+    files[key] = currentDigest(expectedSource.files[key], built);
+    return !built || built.sha256 !== files[key].sha256;
+  });
+  if (changed.length) {
+    return { snapshot: null, reason: `${changed.join(', ')} dataset changed since the snapshot was built` };
+  }
+  return { snapshot: { ...snapshot, source: { ...source, files } } };
+}
+
+module.exports = {
+  SNAPSHOT_FORMAT,
+  describeSources,
+  fileDigest,
+  fileStat,
+  readSnapshot,
+  writeSnapshot,
+  writeSnapshotAsync,
+};
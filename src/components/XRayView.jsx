@@ -132,16 +132,17 @@ const XRayView = ({ threatAnalysis, layers, result }) => {
       {/* Final Verdict */}
       <div className={`mt-6 p-4 rounded-lg border-2 ${
         result === 'BLOCKED' ? 'border-red-500/50 bg-red-900/10' : 
+        result === 'REVIEW' ? 'border-yellow-500/50 bg-yellow-900/10' :
         'border-green-500/50 bg-green-900/10'
       }`}>
         <div className="flex items-center gap-2 mb-2">
-          {result === 'BLOCKED' ? (
-            <AlertTriangle className="w-5 h-5 text-red-400" />
-          ) : (
+          {result === 'SAFE' ? (
             <CheckCircle2 className="w-5 h-5 text-green-400" />
+          ) : (
+            <AlertTriangle className={`w-5 h-5 ${result === 'REVIEW' ? 'text-yellow-400' : 'text-red-400'}`} />
           )}
           <span className={`font-bold ${
-            result === 'BLOCKED' ? 'text-red-400' : 'text-green-400'
+            result === 'BLOCKED' ? 'text-red-400' : result === 'REVIEW' ? 'text-yellow-400' : 'text-green-400'
           }`}>
             Final Verdict: {result}
           </span>
@@ -149,7 +150,9 @@ const XRayView = ({ threatAnalysis, layers, result }) => {
         <p className="text-xs text-gray-300">
           {result === 'BLOCKED' 
             ? 'Prompt has been blocked due to security concerns detected across multiple layers.'
-            : 'Prompt has passed all security layers and is safe to process.'}
+            : result === 'REVIEW'
+              ? 'Analysis ran out of time before the whole prompt was checked; it is held for review.'
+              : 'Prompt has passed all security layers and is safe to process.'}
         </p>
       </div>
     </div>
@@ -7,6 +7,10 @@ Demonstrates ALL 5 metrics and security features
 import requests
 import json
 
+from safety_gateway.timings import TimedSession
+
+GATEWAY = TimedSession()
+
 def test_dangerous_prompts_comprehensive():
     print("=" * 80)
     print("🚨 COMPREHENSIVE DANGEROUS KEYWORD DETECTION TEST")
@@ -49,8 +53,7 @@ def test_dangerous_prompts_comprehensive():
         print(f"🎯 Expected: {test['expected']}")
         
         try:
-            response = requests.post('http://localhost:3001/analyze',
-                json={"prompt": test['prompt']}, timeout=10)
+            response = GATEWAY.analyze(test['prompt'])
             
             if response.status_code == 200:
                 data = response.json()
@@ -198,10 +201,10 @@ def explain_features():
         },
         {
             "name": "4️⃣  CPU THROUGHPUT (MB/s)",
-            "what": "Real-time data processing rate",
+            "what": "Measured detection-layer processing rate",
             "why": "Proves actual work is happening (not fake metrics)",
-            "how": "Calculates based on CPU usage and prompt complexity",
-            "example": "Idle: 950 MB/s | Heavy load: 1850 MB/s"
+            "how": "Prompt bytes scored / time spent in the five layers since startup",
+            "example": "Chat-sized prompts: roughly 0.1-1 MB/s per core"
         },
         {
             "name": "5️⃣  CPU CORES",
@@ -231,6 +234,7 @@ if __name__ == "__main__":
     
     # Run comprehensive test
     test_dangerous_prompts_comprehensive()
+    print(GATEWAY.report())
     
     # Explain features
     explain_features()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Verdict parity per compression backend: for every COMPRESSOR, under every
+NCD_MODE, safety_gateway must return exactly what analyzePrompt() returns
+once both engines see the same compressed lengths.
+
+Runs detector.js under Node with compressors.js wrapped so that every length
+it computes, plain or against a dictionary, is recorded: the baselines it
+builds from the datasets, the NCD corpora and every prompt. GatewayEngine
+then builds its baselines and scores the same prompts with those lengths
+replayed. Every field of every analysis must be equal, verdicts included,
+and Python must not compress anything Node did not.
+
+Node's zlib and CPython's differ by a few bytes of gzip/deflate output; this
+test shows that those bytes are the only difference, and counts the verdicts
+they change when each engine uses its own compressor. With brotli, the same
+library on both sides, the verdicts must also match without replaying. The
+brotli backend is skipped when the `brotli` module is not installed.
+"""
+
+import os
+
+from safety_gateway import GatewayEngine
+from safety_gateway.parity import ReplayCompressor, available_compressors, run_as_script, run_node
+from test_python_parity import NODE_HARNESS, diff, load_prompts
+
+NCD_MODES = ('exact', 'dictionary', 'knn')
+
+
+def node_env(compressor, ncd_mode):
+    env = {**os.environ, 'COMPRESSOR': compressor, 'NCD_MODE': ncd_mode, 'BASELINE_SNAPSHOT': ''}
+    env.pop('FEEDBACK', None)
+    return env
+
+
+def verdict(analysis):
+    return analysis['result'], analysis['threatAnalysis']['recommendedAction']
+
+
+def test_every_compressor_gives_the_same_verdicts():
+    prompts = load_prompts()
+    failures = 0
+    own_differences = {}
+    for name in available_compressors():
+        for mode in NCD_MODES:
+            node = run_node(NODE_HARNESS, prompts, env=node_env(name, mode))
+            replay = ReplayCompressor(name, node['recorded'][name])
+            replayed = GatewayEngine(ncd_mode=mode, snapshot_path='', compressor=replay, checkpoint_path='')
+            own = GatewayEngine(ncd_mode=mode, snapshot_path='', compressor=name, checkpoint_path='')
+            differing = 0
+            for prompt, node_result in zip(prompts, node['results']):
+                mismatches = list(diff(node_result, replayed.analyze_prompt(prompt)))
+                for path, expected, actual in mismatches[:3]:
+                    print(f"❌ {name}/{mode} {prompt[:40]!r} {'.'.join(map(str, path))}: "
+                          f"node={expected!r} python={actual!r}")
+                failures += bool(mismatches)
+                differing += verdict(node_result) != verdict(own.analyze_prompt(prompt))
+            if replay.misses:
+                failures += 1
+                print(f"❌ {name}/{mode}: Python compressed {replay.misses} texts Node never compressed")
+            if name == 'brotli' and differing:
+                failures += 1
+                print(f"❌ brotli/{mode}: {differing} verdicts differ between the engines")
+            own_differences[f'{name}/{mode}'] = differing
+    summary = ', '.join(f'{config} {count}' for config, count in own_differences.items())
+    print(f"📊 {len(prompts)} prompts x {len(own_differences)} configurations, {failures} mismatches with "
+          f"Node's compressed lengths; verdicts differing with each engine's own compressor: {summary}")
+    assert failures == 0
+
+
+if __name__ == "__main__":
+    run_as_script([test_every_compressor_gives_the_same_verdicts], 'detector.js',
+                  "✅ Every compressor gives the same verdicts in both engines")
@@ -3,6 +3,10 @@
 
 import requests
 
+from safety_gateway.timings import TimedSession
+
+GATEWAY = TimedSession()
+
 def test_hidden_text_attacks():
     print("🕵️  TESTING HIDDEN TEXT ATTACKS")
     print("=" * 60)
@@ -44,8 +48,7 @@ def test_hidden_text_attacks():
         print(f"   Prompt: '{test['prompt'][:60]}...'")
         
         try:
-            response = requests.post('http://localhost:3001/analyze',
-                json={"prompt": test['prompt']}, timeout=10)
+            response = GATEWAY.analyze(test['prompt'])
             
             if response.status_code == 200:
                 data = response.json()
@@ -91,3 +94,4 @@ if __name__ == "__main__":
         exit(1)
     
     test_hidden_text_attacks()
+    print(GATEWAY.report())
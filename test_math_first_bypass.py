@@ -5,13 +5,15 @@ but are caught by other layers (RITD, Context, LDF)
 """
 
 import requests
-import gzip
+
+from safety_gateway.layers import compute_entropy_score
+from safety_gateway.timings import TimedSession
+
+GATEWAY = TimedSession()
 
 def calculate_entropy(text):
-    """Calculate entropy locally to verify"""
-    original = text.encode('utf-8')
-    compressed = gzip.compress(original)
-    return len(compressed) / len(original)
+    """Calculate entropy locally to verify (same compressor as the server, see COMPRESSOR)"""
+    return compute_entropy_score(text)
 
 def test_prompt(prompt, description, should_block):
     print(f"\n{'='*80}")
@@ -30,8 +32,7 @@ def test_prompt(prompt, description, should_block):
         print(f"   ❌ HIGH ENTROPY - Math-First would catch this")
     
     try:
-        response = requests.post('http://localhost:3001/analyze',
-            json={"prompt": prompt}, timeout=10)
+        response = GATEWAY.analyze(prompt)
         
         if response.status_code == 200:
             data = response.json()
@@ -164,3 +165,4 @@ if __name__ == "__main__":
         exit(1)
     
     main()
+    print(GATEWAY.report())
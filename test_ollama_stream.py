@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Stream decoding test: ndjson.js (the line reader behind ollama.js's
+streaming relay) must rebuild every token exactly however TCP cuts the
+NDJSON stream, including through the middle of a multi-byte UTF-8
+character.
+
+Runs forEachLine() under Node (see safety_gateway.parity): the same stream
+is fed once per cut point, split in two chunks at that byte, and every run
+must yield the same tokens.
+"""
+
+import json
+
+from safety_gateway.parity import run_as_script, run_node
+
+NODE_HARNESS = r"""
+const { forEachLine } = require('./ndjson');
+const stream = Buffer.from(input, 'utf-8');
+const runs = [];
+for (let cut = 0; cut <= stream.length; cut += 1) {
+  const tokens = [];
+  async function* chunks() {
+    yield stream.subarray(0, cut);
+    yield stream.subarray(cut);
+  }
+  await forEachLine(chunks(), (line) => {
+    if (line.trim()) tokens.push(JSON.parse(line).response);
+  });
+  runs.push(tokens);
+}
+return runs;
+"""
+
+# 2-, 3- and 4-byte UTF-8 characters, the last token without a trailing newline
+TOKENS = ['Café', ' naïve', ' 東京', ' 😀', ' done']
+
+
+def test_multibyte_characters_split_across_chunks():
+    lines = [json.dumps({'response': token}, ensure_ascii=False) for token in TOKENS]
+    stream = '\n'.join(lines)
+    runs = run_node(NODE_HARNESS, stream)
+
+    failures = [(cut, tokens) for cut, tokens in enumerate(runs) if tokens != TOKENS]
+    for cut, tokens in failures:
+        print(f"❌ cut at byte {cut}: {tokens!r}")
+    print(f"📊 {len(runs)} cut points, {len(failures)} mismatches")
+    assert not failures
+
+
+if __name__ == "__main__":
+    run_as_script([test_multibyte_characters_split_across_chunks], 'ndjson.js',
+                  "✅ Streamed tokens survive every chunk boundary")
@@ -5,14 +5,16 @@ but FAIL Math-First (high entropy/obfuscation)
 """
 
 import requests
-import gzip
 import base64
 
+from safety_gateway.layers import compute_entropy_score
+from safety_gateway.timings import TimedSession
+
+GATEWAY = TimedSession()
+
 def calculate_entropy(text):
-    """Calculate entropy locally"""
-    original = text.encode('utf-8')
-    compressed = gzip.compress(original)
-    return len(compressed) / len(original)
+    """Calculate entropy locally (same compressor as the server, see COMPRESSOR)"""
+    return compute_entropy_score(text)
 
 def test_prompt(prompt, description, decoded_meaning=None):
     print(f"\n{'='*80}")
@@ -35,8 +37,7 @@ def test_prompt(prompt, description, decoded_meaning=None):
         print(f"   ✅ LOW ENTROPY")
     
     try:
-        response = requests.post('http://localhost:3001/analyze',
-            json={"prompt": prompt}, timeout=10)
+        response = GATEWAY.analyze(prompt)
         
         if response.status_code == 200:
             data = response.json()
@@ -211,3 +212,4 @@ if __name__ == "__main__":
         exit(1)
     
     main()
+    print(GATEWAY.report())
@@ -0,0 +1,165 @@
+// workerPool.js
+// Fixed-size worker_threads pool that runs analyzePrompt off the event loop.
+//
+// Each worker loads detector.js (and so its own baselines) once at spawn.
+// A task is a list of prompts; analyze() sends one prompt, analyzeMany()
+// splits a batch into at most two chunks per worker so a large batch keeps
+// every core busy without flooding the queue. Tasks wait in a FIFO queue of
+// at most `maxQueue` entries; beyond that they are rejected with
+// err.code === 'QUEUE_FULL' so callers can shed load instead of buffering
+// without bound. A worker that dies fails only its current task and is
+// replaced. analyzeMany() resolves to { results, timings }: the analyses plus
+// the per-layer timings (ns) the workers measured, one object per prompt.
+// Both take `{ fast: true }` to score with analyzePromptFast.
+// updateBaselines() hands every worker (and any replacement) new baselines;
+// tasks already posted to a worker are scored with the old ones. Each task
+// resolves with the `version` of the baselines its worker held when the task
+// was posted (the pool's `version` until the first update), and analyzeMany()
+// returns one version per prompt, so callers can tell such results apart.
+
+const os = require('os');
+const path = require('path');
+const { Worker } = require('worker_threads');
+
+const WORKER_SCRIPT = path.join(__dirname, 'analyzeWorker.js');
+
+function queueFullError(maxQueue) {
+  const err = new Error(`Analysis queue full (max ${maxQueue} pending tasks)`);
+  err.code = 'QUEUE_FULL';
+  return err;
+}
+
+function createAnalyzerPool({ size = os.cpus().length, maxQueue = 1000, version = null } = {}) {
+  const slots = [];
+  const idle = [];
+  const queue = [];
+  let closed = false;
+  let latestBaselines = null;
+  let latestVersion = version;
+  const counters = {
+    tasks: 0,
+    prompts: 0,
+    rejected: 0,
+    workerErrors: 0,
+  };
+
+  function dispatch() {
+    while (idle.length && queue.length) {
+      const slot = idle.pop();
+      slot.task = queue.shift();
+      slot.task.version = slot.version;
+      slot.worker.postMessage({ prompts: slot.task.prompts, fast: slot.task.fast });
+    }
+  }
+
+  function spawn() {
+    const slot = { worker: new Worker(WORKER_SCRIPT), task: null, version: latestVersion };
+    if (latestBaselines) slot.worker.postMessage({ baselines: latestBaselines });
+
+    slot.worker.on('message', ({ results, timings, error }) => {
+      const { task } = slot;
+      slot.task = null;
+      idle.push(slot);
+      if (error) {
+        task.reject(new Error(error));
+      } else {
+        task.resolve({ results, timings, version: task.version });
+      }
+      dispatch();
+    });
+
+    slot.worker.on('error', (err) => {
+      counters.workerErrors += 1;
+      if (slot.task) slot.task.reject(err);
+      slot.task = null;
+    });
+
+    slot.worker.on('exit', () => {
+      slots.splice(slots.indexOf(slot), 1);
+      const idleIndex = idle.indexOf(slot);
+      if (idleIndex > -1) idle.splice(idleIndex, 1);
+      if (slot.task) slot.task.reject(new Error('Analysis worker exited'));
+      if (!closed) {
+        spawn();
+        dispatch();
+      }
+    });
+
+    slots.push(slot);
+    idle.push(slot);
+  }
+
+  for (let i = 0; i < size; i += 1) {
+    spawn();
+  }
+
+  function enqueue(chunks, fast) {
+    if (closed) return Promise.reject(new Error('Analyzer pool is closed'));
+    if (queue.length + chunks.length > maxQueue + idle.length) {
+      counters.rejected += chunks.length;
+      return Promise.reject(queueFullError(maxQueue));
+    }
+    const pending = chunks.map((prompts) => new Promise((resolve, reject) => {
+      queue.push({ prompts, fast, resolve, reject });
+    }));
+    counters.tasks += chunks.length;
+    chunks.forEach((prompts) => { counters.prompts += prompts.length; });
+    dispatch();
+    return Promise.all(pending);
+  }
+
+  function analyze(prompt, { fast = false } = {}) {
+    return enqueue([[prompt]], fast).then(([{ results }]) => results[0]);
+  }
+
+  function analyzeMany(prompts, { fast = false } = {}) {
+    if (!prompts.length) return Promise.resolve([]);
+    const chunkSize = Math.ceil(prompts.length / (size * 2));
+    const chunks = [];
+    for (let i = 0; i < prompts.length; i += chunkSize) {
+      chunks.push(prompts.slice(i, i + chunkSize));
+    }
+    return enqueue(chunks, fast).then((parts) => ({
+      results: [].concat(...parts.map((part) => part.results)),
+      timings: [].concat(...parts.map((part) => part.timings)),
+      versions: [].concat(...parts.map((part) => part.results.map(() => part.version))),
+    }));
+  }
+
+  function updateBaselines(baselines, nextVersion = null) {
+    latestBaselines = baselines;
+    latestVersion = nextVersion;
+    slots.forEach((slot) => {
+      slot.worker.postMessage({ baselines });
+      slot.version = nextVersion;
+    });
+  }
+
+  function stats() {
+    return {
+      ...counters,
+      size,
+      maxQueue,
+      busy: slots.length - idle.length,
+      queued: queue.length,
+    };
+  }
+
+  async function close() {
+    closed = true;
+    queue.splice(0).forEach((task) => task.reject(new Error('Analyzer pool is closed')));
+    await Promise.all(slots.map((slot) => slot.worker.terminate()));
+  }
+
+  return {
+    analyze,
+    analyzeMany,
+    updateBaselines,
+    stats,
+    close,
+  };
+}
+
+module.exports = {
+  createAnalyzerPool,
+};